@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
 from app.schemas import ChatMessageCreate, ChatMessageResponse, ChatHistoryResponse
 from app.services import ChatService
 from app.models import MessageRole
+from app.utils.pagination import next_cursor
 
 router = APIRouter()
 
@@ -41,13 +42,19 @@ async def get_chat_history(
     project_id: UUID,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all chat messages for a specific project"""
-    messages = await ChatService.list_messages(db, project_id, skip, limit)
+    """
+    Get all chat messages for a specific project, oldest first
+
+    Pass ``next_cursor`` of a page as ``cursor`` to get the next one.
+    """
+    messages = await ChatService.list_messages(db, project_id, skip, limit, cursor)
     return {
         "messages": messages,
-        "total": len(messages)
+        "total": await ChatService.count_messages(db, project_id),
+        "next_cursor": next_cursor(messages, limit, "created_at")
     }
 
 
@@ -1,19 +1,44 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Response, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
-import json
+from typing import List, Optional
+import hashlib
 
-from app.db.database import get_db
-from app.schemas import GenerationCreate, GenerationResponse, GenerationListResponse
+from app.core.exceptions import raise_conflict, raise_not_found, raise_unprocessable
+from app.db.database import get_db, session_scope
+from app.schemas import (
+    GenerationCreate,
+    GenerationResponse,
+    GenerationListResponse,
+    GenerationManifestResponse,
+)
 from app.services import (
     GenerationService,
     ChatService,
-    gemini_service,
+    ContextBuilder,
+    FileStoreService,
+    JobService,
     ProjectService,
+    GenerationStreamService,
+    GenerationRequestService,
+    generation_event_hub,
+    generation_worker_pool,
+)
+from app.models import GenerationStatus, JobStatus, MessageRole
+from app.utils.http import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    accepts_encoding,
+    etag_matches,
+    gzip_body,
+    make_etag,
+    media_type_for,
+    variant_etag,
+    wants_gzip,
 )
-from app.models import GenerationStatus, MessageRole
+from app.utils.pagination import next_cursor, set_page_headers
+from app.utils.sse import KEEPALIVE, SSE_HEADERS, format_sse
 
 router = APIRouter()
 
@@ -24,102 +49,150 @@ router = APIRouter()
 )
 async def generate_html_stream(
     generation_data: GenerationCreate,
-    db: AsyncSession = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None),
 ):
     """
     Generate HTML from user prompt with Server-Sent Events streaming
 
-    This endpoint streams the generation progress in real-time using SSE format.
-    Each event contains a chunk of the generated HTML.
-    """
-    # Verify project exists
-    await ProjectService.get_project_or_404(db, generation_data.project_id)
-
-    # Save user message
-    await ChatService.create_message(
-        db,
-        project_id=generation_data.project_id,
-        role=MessageRole.USER,
-        content=generation_data.user_prompt
-    )
-    await db.commit()
-
-    # Get chat history for context
-    chat_history = await ChatService.get_chat_history_dict(
-        db,
-        project_id=generation_data.project_id,
-        limit=10
-    )
-
-    # Create a new generation record
-    generation = await GenerationService.create_generation(
-        db,
-        project_id=generation_data.project_id,
-        status=GenerationStatus.GENERATING
-    )
-    await db.commit()
-
-    async def event_generator():
-        """Generate Server-Sent Events"""
-        try:
-            # Send generation ID
-            yield f"data: {json.dumps({'type': 'generation_id', 'id': str(generation.id)})}\n\n"
-
-            html_chunks = []
+    The generation is enqueued as a durable job and executed by the worker pool;
+    this response only subscribes to the job's progress. Events are numbered
+    and the stream can be resumed with GET /generations/{id}/stream and
+    Last-Event-ID; once every viewer has been gone for
+    GENERATION_DISCONNECT_GRACE_SECONDS the generation is stopped and marked
+    cancelled. POST /generations/{id}/cancel stops it explicitly.
 
-            # Stream HTML chunks from Gemini
-            async for chunk in gemini_service.generate_html_stream(
-                generation_data.user_prompt,
-                chat_history
-            ):
-                html_chunks.append(chunk)
-                # Send chunk to client
-                yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
+    Repeating a request with the same Idempotency-Key header, or sending the same
+    prompt for the same conversation within a short window (double clicks,
+    client retries), attaches to the original generation's stream instead of
+    starting a new one. Reusing an Idempotency-Key with a different body fails
+    with 422; once the original generation fails or is cancelled, a repeat
+    starts a new one.
+    """
+    async with session_scope() as db:
+        # Verify project exists
+        await ProjectService.get_project_or_404(db, generation_data.project_id)
 
-            # Combine all chunks
-            full_html = "".join(html_chunks)
+        # Take the single-flight lock before writing anything else
+        dedup_key, dedup_ttl = await GenerationRequestService.make_key(
+            db,
+            generation_data.project_id,
+            generation_data.user_prompt,
+            idempotency_key
+        )
+        request_hash = GenerationRequestService.hash_request(
+            generation_data.project_id,
+            generation_data.user_prompt,
+            generation_data.bypass_cache,
+            generation_data.full_regeneration
+        )
+        duplicate = not await GenerationRequestService.try_claim(
+            db, dedup_key, generation_data.project_id, dedup_ttl, request_hash
+        )
 
-            # Update generation with complete HTML
-            await GenerationService.update_generation(
+        if not duplicate:
+            # Assemble context from the latest turns and code, before this
+            # prompt joins the history
+            context = await ContextBuilder.build(
                 db,
-                generation.id,
-                html_content=full_html,
-                status=GenerationStatus.COMPLETED
+                generation_data.project_id,
+                generation_data.user_prompt,
+                edit_mode=not generation_data.full_regeneration
             )
 
-            # Save assistant message
+            # Save user message
             await ChatService.create_message(
                 db,
                 project_id=generation_data.project_id,
-                role=MessageRole.ASSISTANT,
-                content="HTML generated successfully",
-                generation_id=generation.id
+                role=MessageRole.USER,
+                content=generation_data.user_prompt
             )
-            await db.commit()
 
-            # Send completion event
-            yield f"data: {json.dumps({'type': 'complete', 'generation_id': str(generation.id)})}\n\n"
-
-        except Exception as e:
-            # Update generation status to failed
-            await GenerationService.update_generation(
+            # Create a new generation record and its job
+            generation = await GenerationService.create_generation(
+                db,
+                project_id=generation_data.project_id,
+                status=GenerationStatus.GENERATING
+            )
+            job = await JobService.create_job(
                 db,
-                generation.id,
-                status=GenerationStatus.FAILED
+                generation_id=generation.id,
+                project_id=generation_data.project_id,
+                user_prompt=generation_data.user_prompt,
+                chat_history=context.chat_history,
+                code_digest=context.code_digest,
+                base_generation_id=context.base_generation_id,
+                bypass_cache=generation_data.bypass_cache
             )
-            await db.commit()
+            await GenerationRequestService.attach_generation(db, dedup_key, generation.id)
+            generation_id = generation.id
+
+    if duplicate:
+        # An identical request is already in flight; follow its stream
+        async with session_scope() as db:
+            claim = await GenerationRequestService.get_claim(db, dedup_key)
+        if (
+            claim is not None
+            and idempotency_key
+            and claim.request_hash is not None
+            and claim.request_hash != request_hash
+        ):
+            raise_unprocessable("Idempotency-Key has already been used for a different request")
+        if claim is None or claim.generation_id is None:
+            raise_conflict("An identical generation request is still being set up, retry shortly")
+        generation_id = claim.generation_id
 
-            # Send error event
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+        return StreamingResponse(
+            _generation_events(generation_id),
+            media_type="text/event-stream",
+            headers={**SSE_HEADERS, "X-Generation-Deduplicated": "true"}
+        )
+
+    generation_worker_pool.notify(job.id)
+
+    return StreamingResponse(
+        _generation_events(generation_id),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+async def _generation_events(generation_id: str):
+    """Server-Sent Events of a generation, announced by its ID"""
+    # Send generation ID
+    yield format_sse({"type": "generation_id", "id": str(generation_id)})
+
+    async for item in GenerationStreamService.resume(generation_id):
+        yield KEEPALIVE if item is None else format_sse(item[1], item[0])
+
+
+@router.get(
+    "/{generation_id}/stream",
+    summary="Attach to a generation's event stream"
+)
+async def stream_generation(
+    generation_id: UUID,
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Resume or watch a generation's Server-Sent Events stream
+
+    Honors the Last-Event-ID header to continue exactly after the last event the
+    client received. Finished generations are replayed instantly from their
+    stored output.
+    """
+    # Fail with 404 before the stream starts
+    async with session_scope() as db:
+        await GenerationService.ensure_generation_exists(db, generation_id)
+
+    async def event_generator():
+        """Generate Server-Sent Events"""
+        async for item in GenerationStreamService.resume(generation_id, last_event_id):
+            yield KEEPALIVE if item is None else format_sse(item[1], item[0])
 
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
+        headers=SSE_HEADERS
     )
 
 
@@ -130,24 +203,37 @@ async def generate_html_stream(
 )
 async def list_generations(
     project_id: UUID,
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    """List all generations for a specific project"""
-    generations = await GenerationService.list_generations(db, project_id, skip, limit)
+    """
+    List all generations for a specific project
+
+    Pass the X-Next-Cursor header of a page as ``cursor`` to get the next one;
+    ``include_total`` adds an X-Total-Count header.
+    """
+    generations = await GenerationService.list_generations(db, project_id, skip, limit, cursor)
+    set_page_headers(response, next_cursor(generations, limit, "created_at"))
+    if include_total:
+        response.headers["X-Total-Count"] = str(
+            await GenerationService.count_generations(db, project_id)
+        )
 
-    # Add preview (first 200 chars)
     result = []
     for gen in generations:
-        preview = gen.html_content[:200] if gen.html_content else None
         result.append({
             "id": gen.id,
             "project_id": gen.project_id,
             "status": gen.status,
             "version": gen.version,
             "created_at": gen.created_at,
-            "preview": preview
+            "preview": gen.preview,
+            "size": gen.content_size,
+            "file_count": gen.file_count
         })
 
     return result
@@ -160,10 +246,158 @@ async def list_generations(
 )
 async def get_generation(
     generation_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get a specific generation by ID"""
+    """
+    Get a specific generation by ID
+
+    Completed generations are served as immutable, with a gzip variant
+    compressed once and cached; If-None-Match is answered with 304.
+    """
+    representation = await GenerationService.get_generation_body(db, generation_id)
+    use_gzip = wants_gzip(accept_encoding, len(representation.body))
+    gzip_etag = variant_etag(representation.etag, "gzip")
+    headers = {
+        "ETag": gzip_etag if use_gzip else representation.etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if representation.immutable else REVALIDATE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(if_none_match, representation.etag) or etag_matches(if_none_match, gzip_etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = representation.body
+    if use_gzip:
+        body = await GenerationService.get_generation_gzip(generation_id, representation)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get(
+    "/{generation_id}/manifest",
+    response_model=GenerationManifestResponse,
+    summary="Get the file manifest of a generation"
+)
+async def get_generation_manifest(
+    generation_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List a generation's files with their sizes and content hashes
+
+    Clients compare manifests between versions and fetch only files whose hash
+    changed. Raw single-HTML output is listed as index.html.
+    """
+    generation = await GenerationService.get_generation_or_404(db, generation_id)
+    if generation.status != GenerationStatus.COMPLETED:
+        raise_conflict(f"Generation with id {generation_id} has not completed")
+
+    files = await FileStoreService.describe_files(db, generation)
+    etag = make_etag(hashlib.sha256(
+        "\n".join(f"{entry['path']}:{entry['hash']}" for entry in files).encode("utf-8")
+    ).hexdigest())
+    body = GenerationManifestResponse(
+        generation_id=generation.id,
+        version=generation.version,
+        files=files
+    ).model_dump_json().encode("utf-8")
+    # Only completed generations have a manifest, and it never changes
+    return await _immutable_response(body, "application/json", etag, if_none_match, accept_encoding)
+
+
+async def _immutable_response(
+    body: bytes,
+    media_type: str,
+    etag: str,
+    if_none_match: Optional[str],
+    accept_encoding: Optional[str]
+) -> Response:
+    """An immutable representation, gzipped under a variant ETag when the client accepts it"""
+    use_gzip = wants_gzip(accept_encoding, len(body))
+    gzip_etag = variant_etag(etag, "gzip")
+    headers = {
+        "ETag": gzip_etag if use_gzip else etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(if_none_match, etag) or etag_matches(if_none_match, gzip_etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if use_gzip:
+        body = await gzip_body(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+@router.get(
+    "/{generation_id}/files/{file_path:path}",
+    summary="Get one file of a generation"
+)
+async def get_generation_file(
+    generation_id: UUID,
+    file_path: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Download a single file; its ETag is the content hash listed in the manifest
+
+    Files are content-addressed, so they are served as immutable. Clients that
+    accept "deflate" get the stored compressed blob as is.
+    """
     generation = await GenerationService.get_generation_or_404(db, generation_id)
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+    if accepts_encoding(accept_encoding, "deflate"):
+        compressed = await FileStoreService.get_file_compressed(db, generation, file_path)
+        if compressed is not None:
+            content_hash, stream = compressed
+            etag = make_etag(content_hash)
+            headers["ETag"] = variant_etag(etag, "deflate")
+            if etag_matches(if_none_match, etag) or etag_matches(if_none_match, headers["ETag"]):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            headers["Content-Encoding"] = "deflate"
+            return Response(content=stream, media_type=media_type_for(file_path), headers=headers)
+
+    found = await FileStoreService.get_file(db, generation, file_path)
+    if found is None:
+        raise_not_found("File", file_path)
+
+    content_hash, content = found
+    return await _immutable_response(
+        content.encode("utf-8"), media_type_for(file_path), make_etag(content_hash), if_none_match, accept_encoding
+    )
+
+
+@router.post(
+    "/{generation_id}/cancel",
+    response_model=GenerationResponse,
+    summary="Cancel a running generation"
+)
+async def cancel_generation(
+    generation_id: UUID,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stop a queued or running generation and mark it cancelled
+
+    The model call is stopped at once when it runs in this process, otherwise
+    at the running worker's next heartbeat. Viewers receive a ``cancelled``
+    event. Cancelling a finished generation is a conflict.
+    """
+    generation, previous = await GenerationService.cancel_generation(db, generation_id)
+    await db.commit()
+
+    stopped = generation_worker_pool.cancel(generation.id, "Cancelled by request")
+    if not stopped and previous == JobStatus.QUEUED:
+        # No worker will announce it; wake viewers waiting for the job to start
+        generation_event_hub.begin(generation.id, 0)
+        generation_event_hub.publish(generation.id, {"type": "cancelled", "generation_id": generation.id})
+        generation_event_hub.end(generation.id)
     return generation
 
 
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
 from app.schemas import (
@@ -9,8 +9,11 @@ from app.schemas import (
     ProjectUpdate,
     ProjectResponse,
     ProjectWithGenerations,
+    ProjectBulkDelete,
+    ProjectBulkDeleteResponse,
 )
 from app.services import ProjectService
+from app.utils.pagination import set_page_headers
 
 router = APIRouter()
 
@@ -38,11 +41,48 @@ async def create_project(
 async def list_projects(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    """List all projects with generation counts"""
-    projects = await ProjectService.list_projects_with_counts(db, skip, limit)
-    return projects
+    """
+    List all projects with generation counts
+
+    Pass the X-Next-Cursor header of a page as ``cursor`` to get the next one;
+    ``include_total`` adds an X-Total-Count header.
+    """
+    body, page_cursor = await ProjectService.list_projects_body(db, skip, limit, cursor)
+    response = Response(content=body, media_type="application/json")
+    set_page_headers(response, page_cursor)
+    if include_total:
+        response.headers["X-Total-Count"] = str(await ProjectService.count_projects(db))
+    return response
+
+
+@router.post(
+    "/bulk-delete",
+    response_model=ProjectBulkDeleteResponse,
+    summary="Delete several projects"
+)
+async def bulk_delete_projects(
+    request: ProjectBulkDelete,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delete many projects at once
+
+    IDs that do not exist (or were already deleted) are reported in ``not_found``.
+    Very large projects disappear immediately and are purged in the background.
+    """
+    deleted = set(await ProjectService.delete_projects(db, request.project_ids))
+    # The purge uses its own sessions, so the deletion marks must be committed first
+    await db.commit()
+    background_tasks.add_task(ProjectService.purge_deleted_projects)
+    return ProjectBulkDeleteResponse(
+        deleted=[project_id for project_id in request.project_ids if str(project_id) in deleted],
+        not_found=[project_id for project_id in request.project_ids if str(project_id) not in deleted]
+    )
 
 
 @router.get(
@@ -55,8 +95,8 @@ async def get_project(
     db: AsyncSession = Depends(get_db)
 ):
     """Get a specific project by ID"""
-    project = await ProjectService.get_project_or_404(db, project_id)
-    return project
+    body = await ProjectService.get_project_body(db, project_id)
+    return Response(content=body, media_type="application/json")
 
 
 @router.put(
@@ -81,8 +121,11 @@ async def update_project(
 )
 async def delete_project(
     project_id: UUID,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a project"""
     await ProjectService.delete_project(db, project_id)
+    await db.commit()
+    background_tasks.add_task(ProjectService.purge_deleted_projects)
     return None
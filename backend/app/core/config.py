@@ -11,10 +11,100 @@ class Settings(BaseSettings):
     DB_USER: str = "root"
     DB_PASSWORD: str
     DB_NAME: str = "visioncraft_db"
+    DB_URL: str = ""  # Full SQLAlchemy URL used instead of the DB_* parts (e.g. sqlite+aiosqlite:///test.db)
 
     # Gemini AI
-    GEMINI_API_KEY: str
+    GEMINI_API_KEY: str = ""  # Only needed when calling Gemini (MODEL_PROVIDER gemini or record)
     GEMINI_MODEL: str = "gemini-2.0-flash-exp"  # Original model that was working
+    GEMINI_STREAM_WORKERS: int = 64  # Max concurrent streaming generations per process
+    GEMINI_STREAM_QUEUE_SIZE: int = 32  # Chunks buffered per stream before backpressure
+
+    # Model provider: "gemini", "fake" (offline), "record" (Gemini, sessions saved) or "replay"
+    MODEL_PROVIDER: str = "gemini"
+    MODEL_RECORDINGS_DIR: str = "model_recordings"  # Written by "record", read by "replay"
+    MODEL_REPLAY_MATCH: str = "exact"  # "any": prompts never recorded borrow a recorded session
+    MODEL_REPLAY_SPEED: float = 1.0  # Replay timing multiplier; 0 replays without delays
+    FAKE_MODEL_LATENCY_SECONDS: float = 0.5  # Before the first chunk
+    FAKE_MODEL_CHARS_PER_SECOND: float = 2000.0  # Output throughput; 0 as fast as it is read
+    FAKE_MODEL_CHUNK_CHARS: int = 200
+    FAKE_MODEL_OUTPUT_CHARS: int = 8000  # Approximate size of each response
+
+    # Gemini call resilience
+    GEMINI_FIRST_CHUNK_TIMEOUT_SECONDS: float = 30.0  # Until the first chunk, or a non-streamed response
+    GEMINI_IDLE_TIMEOUT_SECONDS: float = 30.0  # Longest silence between streamed chunks
+    GEMINI_CALL_TIMEOUT_SECONDS: float = 300.0  # Whole call, also passed to the client library
+    GEMINI_MAX_RETRIES: int = 3  # Retries of retryable errors, only before any output
+    GEMINI_RETRY_BASE_SECONDS: float = 0.5  # Backoff doubles per retry, with full jitter
+    GEMINI_RETRY_MAX_SECONDS: float = 8.0
+    GEMINI_BREAKER_FAILURES: int = 5  # Consecutive failures that open the circuit breaker
+    GEMINI_BREAKER_RESET_SECONDS: float = 30.0  # Open time before a single probe call is let through
+    GEMINI_RATE_LIMITER: str = "local"  # "local" (per process), "database" (shared) or "none"
+    GEMINI_REQUESTS_PER_MINUTE: int = 60  # 0 disables the request limit
+    GEMINI_TOKENS_PER_MINUTE: int = 1000000  # Estimated prompt and output tokens; 0 disables
+
+    # Response cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: int = 86400
+    RESPONSE_CACHE_MAX_ENTRIES: int = 256  # In-memory LRU tier
+    RESPONSE_CACHE_REPLAY_CHUNK_SIZE: int = 512  # Characters per replayed stream chunk
+
+    # Correction prompt context
+    CONTEXT_TOKEN_BUDGET: int = 6000  # Estimated tokens for history, code digest and request
+    CONTEXT_DIGEST_SHARE: float = 0.5  # Largest share of the budget the code digest may take
+    CONTEXT_HISTORY_WINDOW: int = 30  # Most recent messages considered for history
+    GENERATION_EDIT_MODE: bool = True  # Corrections return only changed files, merged server-side
+    CONTEXT_EDIT_TOKEN_BUDGET: int = 32000  # Edit mode includes full file contents
+
+    # Entity cache (read-through cache of project and generation responses)
+    ENTITY_CACHE: str = "memory"  # "memory" or "none"
+    ENTITY_CACHE_TTL_SECONDS: float = 30.0  # Mutable entries; completed generations never expire
+    ENTITY_CACHE_MAX_ENTRIES: int = 2048
+    ENTITY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # HTTP
+    GZIP_MINIMUM_SIZE: int = 1024  # Smaller responses are sent uncompressed
+
+    # Pagination
+    PAGINATION_TOTAL_CACHE_SECONDS: float = 30.0  # How stale a listing's total count may be
+
+    # Project counters
+    PROJECT_COUNTER_REPAIR_SECONDS: int = 86400  # Interval of the full recount that fixes drift
+
+    # Project deletion
+    PROJECT_DELETE_INLINE_LIMIT: int = 200  # Larger projects are hidden, then purged in the background
+    PROJECT_PURGE_BATCH_SIZE: int = 500  # Child rows deleted per purge transaction
+    PROJECT_BULK_DELETE_MAX: int = 100  # Project IDs accepted by one bulk delete request
+
+    # File storage
+    FILE_BLOB_GC_SECONDS: int = 3600  # Interval of unreferenced blob cleanup, and minimum blob age
+
+    # Generation jobs
+    GENERATION_WORKERS: int = 8  # Max concurrent model calls per process
+    GENERATION_JOB_LEASE_SECONDS: int = 60
+    GENERATION_JOB_HEARTBEAT_SECONDS: int = 15
+    GENERATION_JOB_MAX_ATTEMPTS: int = 2
+    GENERATION_JOB_POLL_SECONDS: float = 2.0
+    GENERATION_JOB_CLAIM_GRACE_SECONDS: int = 5  # Before other processes pick up a queued job
+    GENERATION_JOB_REAP_SECONDS: int = 30
+    GENERATION_STALE_SECONDS: int = 900  # GENERATING rows without a job are failed after this
+    GENERATION_DEDUP_WINDOW_SECONDS: int = 10  # Identical requests coalesce within this window
+    GENERATION_IDEMPOTENCY_TTL_SECONDS: int = 86400
+    GENERATION_CANCEL_ON_DISCONNECT: bool = True  # Stop the model once every viewer has left
+    GENERATION_DISCONNECT_GRACE_SECONDS: float = 10.0  # Time for a viewer to reconnect before that
+
+    # Streaming
+    SSE_REPLAY_BUFFER_SIZE: int = 256  # Events kept in memory per generation for resumption
+    SSE_SPILL_BATCH_SIZE: int = 64  # Evicted events written to the DB per batch
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+    SSE_COALESCE_SECONDS: float = 0.05  # Model chunks arriving this close together become one event; 0 disables
+    SSE_COALESCE_MAX_CHARS: int = 8192  # Upper bound on one coalesced chunk
+    SSE_SUBSCRIBER_QUEUE_SIZE: int = 1024  # Per viewer; slower viewers are dropped to catch up
+
+    # Event broker shared by worker processes: "local" or "sqlite"
+    EVENT_BROKER: str = "local"
+    EVENT_BROKER_SQLITE_PATH: str = "visioncraft_events.db"
+    EVENT_BROKER_POLL_SECONDS: float = 0.05
+    EVENT_BROKER_RETENTION_SECONDS: int = 600
 
     # Server
     HOST: str = "0.0.0.0"
@@ -41,6 +131,8 @@ class Settings(BaseSettings):
     @property
     def DATABASE_URL(self) -> str:
         """Construct database URL from components"""
+        if self.DB_URL:
+            return self.DB_URL
         return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
 
@@ -23,6 +23,16 @@ class GeminiAPIException(VisionCraftException):
     pass
 
 
+class ModelTimeoutException(GeminiAPIException):
+    """Raised when a model call misses its deadline"""
+    pass
+
+
+class ModelUnavailableException(GeminiAPIException):
+    """Raised without calling the model while its circuit breaker is open"""
+    pass
+
+
 def raise_not_found(entity: str, entity_id: str):
     """Raise 404 HTTPException"""
     raise HTTPException(
@@ -39,6 +49,22 @@ def raise_bad_request(message: str):
     )
 
 
+def raise_conflict(message: str):
+    """Raise 409 HTTPException"""
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=message
+    )
+
+
+def raise_unprocessable(message: str):
+    """Raise 422 HTTPException"""
+    raise HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+        detail=message
+    )
+
+
 def raise_internal_error(message: str):
     """Raise 500 HTTPException"""
     raise HTTPException(
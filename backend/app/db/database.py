@@ -1,5 +1,8 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 from app.core.config import settings
 
 # Create async engine
@@ -12,6 +15,14 @@ engine = create_async_engine(
     max_overflow=20,
 )
 
+if engine.dialect.name == "sqlite":
+    # Deletes rely on ON DELETE CASCADE, which SQLite only enforces when asked
+    @event.listens_for(engine.sync_engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -38,6 +49,23 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """
+    Short-lived transactional session for work outside a request dependency
+
+    Used by long-running streams so a pooled connection is only checked out
+    for the duration of the block, not for the lifetime of the response.
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
 async def init_db():
     """Initialize database - create all tables"""
     async with engine.begin() as conn:
@@ -0,0 +1,450 @@
+"""
+Versioned migrations for databases created before a schema change
+
+``init_db`` creates missing tables but never alters existing ones, so each
+change to an existing table or its data gets a migration here. Migrations are
+idempotent: they check the current state before acting, which keeps several
+processes starting at once from doing harm, and are recorded in
+``schema_migrations`` once applied.
+"""
+
+from sqlalchemy import LargeBinary, desc, func, inspect, select, type_coerce, update
+from sqlalchemy.exc import IntegrityError
+from typing import Awaitable, Callable, List, Tuple
+import logging
+
+from app.db.database import engine, session_scope
+from app.db.types import decode_text
+from app.models import Generation, GenerationStatus, SchemaMigration
+
+logger = logging.getLogger(__name__)
+
+# Rows converted per transaction by data migrations
+BATCH_SIZE = 100
+
+
+async def _add_missing_columns(table: str, columns: List[Tuple[str, str]]) -> None:
+    """Add (name, DDL type) columns a table does not have yet"""
+    async with engine.begin() as conn:
+        existing = await conn.run_sync(
+            lambda sync_conn: {column["name"] for column in inspect(sync_conn).get_columns(table)}
+        )
+        for name, ddl_type in columns:
+            if name not in existing:
+                await conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}")
+                logger.info(f"Added column {table}.{name}")
+
+
+def _raw_content():
+    """
+    html_content as stored, for decode_text
+
+    Data migrations select only the columns they need, never whole models:
+    the models follow the latest schema, which has columns an older database
+    does not have yet. The raw bytes are read because the column is TEXT
+    until migration 0007 and compressed after it.
+    """
+    return type_coerce(Generation.html_content, LargeBinary)
+
+
+async def _generation_job_context_columns() -> None:
+    """Correction context columns of generation_jobs"""
+    await _add_missing_columns(
+        "generation_jobs",
+        [("code_digest", "TEXT NULL"), ("base_generation_id", "VARCHAR(36) NULL")]
+    )
+
+
+async def _generation_file_manifests() -> None:
+    """Move multi-file generations from html_content into the content-addressed file store"""
+    from app.services.file_store_service import FileStoreService
+    from app.utils.code_digest import parse_file_set
+
+    last_id = ""
+    moved = 0
+    while True:
+        async with session_scope() as db:
+            result = await db.execute(
+                select(Generation.id, _raw_content())
+                .where(
+                    Generation.id > last_id,
+                    Generation.status == GenerationStatus.COMPLETED,
+                    Generation.html_content.is_not(None)
+                )
+                .order_by(Generation.id)
+                .limit(BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            for generation_id, value in rows:
+                files = parse_file_set(decode_text(value))
+                if files is not None:
+                    await FileStoreService.store_files(db, generation_id, files)
+                    await db.execute(
+                        update(Generation)
+                        .where(Generation.id == generation_id)
+                        .values(html_content=None)
+                        .execution_options(synchronize_session=False)
+                    )
+                    moved += 1
+            last_id = rows[-1][0]
+    logger.info(f"Moved {moved} generations into the file store")
+
+
+async def _generation_summary_columns() -> None:
+    """Add and backfill the preview, size and file count used by version listings"""
+    from app.models import GenerationFile
+    from app.services.generation_service import PREVIEW_LENGTH
+
+    await _add_missing_columns(
+        "generations",
+        [("preview", "VARCHAR(255) NULL"), ("content_size", "INTEGER NULL"), ("file_count", "INTEGER NULL")]
+    )
+
+    last_id = ""
+    while True:
+        async with session_scope() as db:
+            result = await db.execute(
+                select(Generation.id, _raw_content())
+                .where(
+                    Generation.id > last_id,
+                    Generation.status == GenerationStatus.COMPLETED,
+                    Generation.file_count.is_(None)
+                )
+                .order_by(Generation.id)
+                .limit(BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            manifest_ids = [generation_id for generation_id, value in rows if value is None]
+            entries = {}
+            if manifest_ids:
+                result = await db.execute(
+                    select(GenerationFile.generation_id, GenerationFile.path, GenerationFile.size)
+                    .where(GenerationFile.generation_id.in_(manifest_ids))
+                )
+                for generation_id, path, size in result.all():
+                    entries.setdefault(generation_id, []).append((path, size))
+
+            for generation_id, value in rows:
+                if value is not None:
+                    content = decode_text(value)
+                    summary = {
+                        "preview": content[:PREVIEW_LENGTH],
+                        "content_size": len(content.encode("utf-8")),
+                        "file_count": 1,
+                    }
+                else:
+                    files = entries.get(generation_id, [])
+                    summary = {
+                        "preview": ", ".join(sorted(path for path, _ in files))[:PREVIEW_LENGTH] or None,
+                        "content_size": sum(size for _, size in files),
+                        "file_count": len(files),
+                    }
+                await db.execute(
+                    update(Generation)
+                    .where(Generation.id == generation_id)
+                    .values(**summary)
+                    .execution_options(synchronize_session=False)
+                )
+            last_id = rows[-1][0]
+
+
+async def _pagination_indexes() -> None:
+    """Composite indexes backing keyset pagination"""
+    from app.models import ChatMessage, Project
+
+    names = {
+        "ix_projects_updated_at_id",
+        "ix_generations_project_created_at_id",
+        "ix_chat_messages_project_created_at_id",
+    }
+    indexes = [
+        index
+        for model in (Project, Generation, ChatMessage)
+        for index in model.__table__.indexes
+        if index.name in names
+    ]
+    async with engine.begin() as conn:
+        for index in indexes:
+            await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+
+
+async def _update_projects_in_batches(**values) -> None:
+    """Apply an UPDATE to every project, one short transaction per batch"""
+    from app.models import Project
+
+    last_id = ""
+    while True:
+        async with session_scope() as db:
+            result = await db.execute(
+                select(Project.id)
+                .where(Project.id > last_id)
+                .order_by(Project.id)
+                .limit(BATCH_SIZE)
+            )
+            project_ids = list(result.scalars().all())
+            if not project_ids:
+                break
+            await db.execute(
+                update(Project)
+                .where(Project.id.in_(project_ids))
+                # Counter maintenance is not a user edit of the project
+                .values(updated_at=Project.updated_at, **values)
+                .execution_options(synchronize_session=False)
+            )
+            last_id = project_ids[-1]
+
+
+def _latest_generation_values() -> dict:
+    """
+    latest_* project columns, from the generation with the highest version
+
+    The subqueries are correlated with the project row being updated. Before
+    migration 0006 versions can repeat, so the ID breaks ties.
+    """
+    from app.models import Project
+
+    def highest(column):
+        return (
+            select(column)
+            .where(Generation.project_id == Project.id)
+            .order_by(desc(Generation.version), desc(Generation.id))
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    return {
+        "latest_version": highest(Generation.version),
+        "latest_generation_id": highest(Generation.id),
+        "last_activity_at": highest(Generation.created_at),
+    }
+
+
+async def _project_counters() -> None:
+    """Add and compute the denormalized generation counters of projects"""
+    from app.models import Project
+
+    await _add_missing_columns(
+        "projects",
+        [
+            ("generation_count", "INTEGER NOT NULL DEFAULT 0"),
+            ("latest_version", "INTEGER NULL"),
+            ("latest_generation_id", "VARCHAR(36) NULL"),
+            ("last_activity_at", "DATETIME NULL"),
+        ]
+    )
+
+    await _update_projects_in_batches(
+        generation_count=(
+            select(func.count(Generation.id))
+            .where(Generation.project_id == Project.id)
+            .scalar_subquery()
+        ),
+        **_latest_generation_values()
+    )
+
+
+async def _generation_version_allocation() -> None:
+    """Per-project version counter and a unique (project_id, version) index"""
+    from app.models import Project
+
+    await _add_missing_columns(
+        "projects",
+        [("version_counter", "INTEGER NOT NULL DEFAULT 0")]
+    )
+    # Seeds every counter from the highest existing version
+    await _update_projects_in_batches(
+        version_counter=(
+            select(func.coalesce(func.max(Generation.version), 0))
+            .where(Generation.project_id == Project.id)
+            .scalar_subquery()
+        )
+    )
+
+    # Versions duplicated by the old max()+1 race are renumbered past the
+    # counter, oldest copy keeping its number, before the index can be built
+    async with session_scope() as db:
+        result = await db.execute(
+            select(Generation.project_id, Generation.version)
+            .group_by(Generation.project_id, Generation.version)
+            .having(func.count(Generation.id) > 1)
+        )
+        duplicates = result.all()
+        for project_id, version in duplicates:
+            result = await db.execute(
+                select(Generation.id)
+                .where(Generation.project_id == project_id, Generation.version == version)
+                .order_by(Generation.created_at, Generation.id)
+            )
+            for generation_id in list(result.scalars().all())[1:]:
+                await db.execute(
+                    update(Project)
+                    .where(Project.id == project_id)
+                    .values(version_counter=Project.version_counter + 1, updated_at=Project.updated_at)
+                    .execution_options(synchronize_session=False)
+                )
+                result = await db.execute(
+                    select(Project.version_counter).where(Project.id == project_id)
+                )
+                new_version = result.scalar_one()
+                await db.execute(
+                    update(Generation)
+                    .where(Generation.id == generation_id)
+                    .values(version=new_version)
+                    .execution_options(synchronize_session=False)
+                )
+        # Renumbered copies now hold the highest versions of their projects
+        for project_id in {project_id for project_id, _ in duplicates}:
+            await db.execute(
+                update(Project)
+                .where(Project.id == project_id)
+                .values(**_latest_generation_values(), updated_at=Project.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+        if duplicates:
+            logger.info(f"Renumbered generations of {len(duplicates)} duplicated versions")
+
+    index = next(
+        index for index in Generation.__table__.indexes
+        if index.name == "uq_generations_project_version"
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+
+
+async def _compressed_generation_content() -> None:
+    """Store html_content compressed: binary column type, then rewrite plain rows"""
+    from app.db.types import ZLIB_MARKER, MIN_COMPRESS_SIZE, encode_text_async
+
+    async with engine.begin() as conn:
+        if conn.dialect.name == "mysql":
+            columns = await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).get_columns("generations")
+            )
+            column_type = next(c["type"] for c in columns if c["name"] == "html_content")
+            if "BLOB" not in str(column_type).upper():
+                # TEXT to BLOB keeps the UTF-8 bytes, which read back as legacy plain rows
+                await conn.exec_driver_sql(
+                    "ALTER TABLE generations MODIFY html_content MEDIUMBLOB NULL"
+                )
+                logger.info("Changed generations.html_content to MEDIUMBLOB")
+
+    last_id = ""
+    compressed = 0
+    while True:
+        async with session_scope() as db:
+            result = await db.execute(
+                select(Generation.id, _raw_content())
+                .where(Generation.id > last_id, Generation.html_content.is_not(None))
+                .order_by(Generation.id)
+                .limit(BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            for generation_id, value in rows:
+                data = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+                if data.startswith(ZLIB_MARKER) or len(data) < MIN_COMPRESS_SIZE:
+                    continue
+                await db.execute(
+                    update(Generation)
+                    .where(Generation.id == generation_id)
+                    .values(html_content=await encode_text_async(data.decode("utf-8")))
+                )
+                compressed += 1
+            last_id = rows[-1][0]
+    logger.info(f"Compressed the content of {compressed} generations")
+
+
+async def _project_soft_delete() -> None:
+    """Deletion marker of projects purged in the background"""
+    from app.models import Project
+
+    await _add_missing_columns("projects", [("deleted_at", "DATETIME NULL")])
+    index = next(index for index in Project.__table__.indexes if "deleted_at" in index.columns)
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+
+
+async def _cancelled_status() -> None:
+    """CANCELLED value of the generation and job status enums"""
+    from app.models import GenerationJob
+
+    async with engine.begin() as conn:
+        if conn.dialect.name != "mysql":
+            # Other backends store the enum as a plain string
+            return
+        for table, column in (
+            ("generations", Generation.__table__.c.status),
+            ("generation_jobs", GenerationJob.__table__.c.status),
+        ):
+            columns = await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).get_columns(table)
+            )
+            current = next(c["type"] for c in columns if c["name"] == "status")
+            if "CANCELLED" not in getattr(current, "enums", ()):
+                ddl_type = column.type.compile(dialect=conn.dialect)
+                await conn.exec_driver_sql(f"ALTER TABLE {table} MODIFY status {ddl_type} NOT NULL")
+                logger.info(f"Added CANCELLED to {table}.status")
+
+
+async def _generation_request_hash() -> None:
+    """Request body hash checked when an Idempotency-Key is reused"""
+    await _add_missing_columns("generation_requests", [("request_hash", "VARCHAR(64) NULL")])
+
+
+async def _file_blob_last_used() -> None:
+    """Reuse time of file blobs, which the unreferenced blob purge goes by"""
+    from app.models import FileBlob
+
+    await _add_missing_columns("file_blobs", [("last_used_at", "DATETIME NULL")])
+    async with session_scope() as db:
+        await db.execute(
+            update(FileBlob)
+            .where(FileBlob.last_used_at.is_(None))
+            .values(last_used_at=FileBlob.created_at)
+            .execution_options(synchronize_session=False)
+        )
+    async with engine.begin() as conn:
+        if conn.dialect.name == "mysql":
+            # Backfilled, so it can be NOT NULL as the model declares; SQLite cannot alter a column
+            await conn.exec_driver_sql("ALTER TABLE file_blobs MODIFY last_used_at DATETIME NOT NULL")
+            logger.info("Made file_blobs.last_used_at NOT NULL")
+
+
+MIGRATIONS: List[Tuple[str, Callable[[], Awaitable[None]]]] = [
+    ("0001_generation_job_context", _generation_job_context_columns),
+    ("0002_generation_file_manifests", _generation_file_manifests),
+    ("0003_generation_summary_columns", _generation_summary_columns),
+    ("0004_pagination_indexes", _pagination_indexes),
+    ("0005_project_counters", _project_counters),
+    ("0006_generation_version_allocation", _generation_version_allocation),
+    ("0007_compressed_generation_content", _compressed_generation_content),
+    ("0008_project_soft_delete", _project_soft_delete),
+    ("0009_cancelled_status", _cancelled_status),
+    ("0010_generation_request_hash", _generation_request_hash),
+    ("0011_file_blob_last_used", _file_blob_last_used),
+]
+
+
+async def run_migrations() -> None:
+    """Apply every migration not recorded in schema_migrations, in order"""
+    async with session_scope() as db:
+        result = await db.execute(select(SchemaMigration.id))
+        applied = set(result.scalars().all())
+
+    for migration_id, migrate in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        logger.info(f"Applying migration {migration_id}")
+        await migrate()
+        try:
+            async with session_scope() as db:
+                db.add(SchemaMigration(id=migration_id))
+        except IntegrityError:
+            # Another process finished the same migration first
+            pass
@@ -0,0 +1,99 @@
+"""
+Per-request identity cache and statement counter
+
+Services check that a project or generation exists before acting on it, and
+one request often passes through several of them. The request scope remembers
+entities already found during the current request so the check runs once, and
+counts the SQL statements the request issues. Outside a request (workers,
+migrations) there is no scope: nothing is remembered and every check queries.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional, Set, Tuple
+import logging
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Response header carrying the statement count, set in debug mode
+STATEMENTS_HEADER = "X-DB-Statements"
+
+
+@dataclass
+class RequestScope:
+    """Entities known to exist, and statements issued, during one request"""
+    known: Set[Tuple[str, str]] = field(default_factory=set)
+    statements: int = 0
+
+
+_current_scope: ContextVar[Optional[RequestScope]] = ContextVar("request_scope", default=None)
+
+
+def current_scope() -> Optional[RequestScope]:
+    """The scope of the request being handled, if any"""
+    return _current_scope.get()
+
+
+def remember(kind: str, entity_id) -> None:
+    """Record that an entity exists, for the rest of the request"""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.known.add((kind, str(entity_id)))
+
+
+def forget(kind: str, entity_id) -> None:
+    """Drop an entity deleted during the request"""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.known.discard((kind, str(entity_id)))
+
+
+def is_known(kind: str, entity_id) -> bool:
+    """Whether the entity was already found during this request"""
+    scope = _current_scope.get()
+    return scope is not None and (kind, str(entity_id)) in scope.known
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.statements += 1
+
+
+class RequestScopeMiddleware:
+    """
+    Give each HTTP request its own scope
+
+    In debug mode the number of statements issued until the response starts is
+    returned in the X-DB-Statements header; streamed bodies may issue more.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_scope = RequestScope()
+        token = _current_scope.set(request_scope)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                headers = list(message.get("headers", []))
+                headers.append((STATEMENTS_HEADER.lower().encode(), str(request_scope.statements).encode()))
+                message = {**message, "headers": headers}
+                logger.debug(f"{scope['method']} {scope['path']}: {request_scope.statements} statements")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _current_scope.reset(token)
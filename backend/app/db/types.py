@@ -0,0 +1,62 @@
+"""Custom column types"""
+
+import asyncio
+import zlib
+from typing import Optional, Union
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+# Leading bytes of a compressed value. UTF-8 text never starts with NUL, so
+# rows written before compression (plain text) are told apart and read as-is.
+ZLIB_MARKER = b"\x00z"
+
+# Values shorter than this are stored uncompressed
+MIN_COMPRESS_SIZE = 512
+
+
+def encode_text(value: str) -> bytes:
+    """Stored form of a text value: marker plus zlib stream, or plain UTF-8 if small"""
+    data = value.encode("utf-8")
+    if len(data) < MIN_COMPRESS_SIZE:
+        return data
+    return ZLIB_MARKER + zlib.compress(data)
+
+
+def decode_text(value: Union[bytes, memoryview, str]) -> str:
+    """Text of a stored value in any of the formats encode_text has produced"""
+    if isinstance(value, str):
+        # Legacy TEXT row on a backend that kept the old column affinity
+        return value
+    data = bytes(value)
+    if data.startswith(ZLIB_MARKER):
+        return zlib.decompress(data[len(ZLIB_MARKER):]).decode("utf-8")
+    return data.decode("utf-8")
+
+
+async def encode_text_async(value: str) -> bytes:
+    """encode_text in a worker thread, so large values never stall the event loop"""
+    if len(value) < MIN_COMPRESS_SIZE:
+        return encode_text(value)
+    return await asyncio.to_thread(encode_text, value)
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored zlib-compressed in a binary column
+
+    Assign ``await encode_text_async(text)`` to compress off the event loop;
+    plain strings are also accepted and compressed during the flush.
+    """
+
+    impl = LargeBinary(length=16777215)
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[Union[str, bytes]], dialect) -> Optional[bytes]:
+        if value is None or isinstance(value, bytes):
+            return value
+        return encode_text(value)
+
+    def process_result_value(self, value, dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return decode_text(value)
@@ -5,7 +5,15 @@ import logging
 
 from app.core.config import settings
 from app.db.database import init_db, close_db
+from app.db.migrations import run_migrations
+from app.db.request_scope import RequestScopeMiddleware, STATEMENTS_HEADER
 from app.api.v1.router import api_router
+from app.services.generation_events import generation_event_hub
+from app.services.generation_worker import generation_worker_pool
+from app.services.entity_cache import entity_cache
+from app.services.model_guard import model_guard
+from app.services.response_cache import response_cache
+from app.utils.http import GZipMiddleware
 
 # Configure logging
 logging.basicConfig(
@@ -21,12 +29,17 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up VisionCraft Studio API...")
     await init_db()
+    await run_migrations()
     logger.info("Database initialized")
+    await generation_event_hub.start()
+    await generation_worker_pool.start()
 
     yield
 
     # Shutdown
     logger.info("Shutting down...")
+    await generation_worker_pool.stop()
+    await generation_event_hub.stop()
     await close_db()
     logger.info("Database connections closed")
 
@@ -46,7 +59,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor", "X-Total-Count", "ETag", "X-Generation-Deduplicated", STATEMENTS_HEADER
+    ],
 )
+# Compresses dynamic responses; precompressed ones (Content-Encoding set) and
+# event streams pass through untouched. Responses with a strong ETag are
+# compressed by their endpoint, under a variant ETag.
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE, compresslevel=6)
+app.add_middleware(RequestScopeMiddleware)
 
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
@@ -68,6 +89,16 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Runtime cache and model call counters"""
+    return {
+        "response_cache": response_cache.stats(),
+        "entity_cache": entity_cache.stats(),
+        "model_calls": model_guard.stats()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,6 +1,13 @@
 from app.models.project import Project
 from app.models.generation import Generation, GenerationStatus
 from app.models.chat_message import ChatMessage, MessageRole
+from app.models.generation_job import GenerationJob, JobStatus
+from app.models.generation_event import GenerationEvent
+from app.models.response_cache import ResponseCacheEntry
+from app.models.generation_request import GenerationRequest
+from app.models.file_blob import FileBlob, GenerationFile
+from app.models.schema_migration import SchemaMigration
+from app.models.rate_limit_bucket import RateLimitBucket
 
 __all__ = [
     "Project",
@@ -8,4 +15,13 @@ __all__ = [
     "GenerationStatus",
     "ChatMessage",
     "MessageRole",
+    "GenerationJob",
+    "JobStatus",
+    "GenerationEvent",
+    "ResponseCacheEntry",
+    "GenerationRequest",
+    "FileBlob",
+    "GenerationFile",
+    "SchemaMigration",
+    "RateLimitBucket",
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -23,6 +23,11 @@ class ChatMessage(Base):
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        # Keyset pagination of a project's chat history
+        Index("ix_chat_messages_project_created_at_id", "project_id", "created_at", "id"),
+    )
+
     # Relationships
     project = relationship("Project", back_populates="chat_messages")
     generation = relationship("Generation", back_populates="chat_messages")
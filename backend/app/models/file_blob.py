@@ -0,0 +1,43 @@
+from sqlalchemy import Column, String, Integer, LargeBinary, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import uuid
+
+from app.db.database import Base
+
+
+class FileBlob(Base):
+    """Content-addressed file body, shared by every version containing it"""
+    __tablename__ = "file_blobs"
+
+    hash = Column(String(64), primary_key=True)  # SHA-256 hex digest of the uncompressed content
+    content = Column(LargeBinary(length=16777215), nullable=False)  # zlib-compressed UTF-8
+    size = Column(Integer, nullable=False)  # Uncompressed size in bytes
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Last written or reused by a manifest; the unreferenced blob purge skips recent ones
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<FileBlob(hash={self.hash}, size={self.size})>"
+
+
+class GenerationFile(Base):
+    """Manifest entry mapping a path of a generation to its blob"""
+    __tablename__ = "generation_files"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    generation_id = Column(String(36), ForeignKey("generations.id", ondelete="CASCADE"), nullable=False)
+    path = Column(String(512), nullable=False)
+    blob_hash = Column(String(64), ForeignKey("file_blobs.hash"), nullable=False, index=True)
+    size = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("generation_id", "path", name="uq_generation_files_generation_path"),
+    )
+
+    # Relationships
+    generation = relationship("Generation", back_populates="files")
+    blob = relationship("FileBlob")
+
+    def __repr__(self):
+        return f"<GenerationFile(generation_id={self.generation_id}, path={self.path})>"
@@ -1,16 +1,18 @@
-from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 import enum
 
 from app.db.database import Base
+from app.db.types import CompressedText
 
 
 class GenerationStatus(str, enum.Enum):
     GENERATING = "generating"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class Generation(Base):
@@ -18,14 +20,36 @@ class Generation(Base):
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     project_id = Column(String(36), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
-    html_content = Column(Text, nullable=True)  # Stores JSON with file structure for React/TS projects
+    # Raw HTML output; multi-file results live in the generation_files manifest instead
+    html_content = Column(CompressedText, nullable=True)
+    # Summary written at completion so listings never load the content
+    preview = Column(String(255), nullable=True)  # First 200 chars of HTML, or the file list
+    content_size = Column(Integer, nullable=True)  # Bytes of output, uncompressed
+    file_count = Column(Integer, nullable=True)
     status = Column(Enum(GenerationStatus), default=GenerationStatus.GENERATING, nullable=False)
     version = Column(Integer, nullable=False, default=1)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        # Keyset pagination of a project's versions
+        Index("ix_generations_project_created_at_id", "project_id", "created_at", "id"),
+        Index("uq_generations_project_version", "project_id", "version", unique=True),
+    )
+
     # Relationships
     project = relationship("Project", back_populates="generations")
     chat_messages = relationship("ChatMessage", back_populates="generation", cascade="all, delete-orphan")
+    files = relationship(
+        "GenerationFile", back_populates="generation", cascade="all, delete-orphan", passive_deletes=True
+    )
+    job = relationship(
+        "GenerationJob",
+        back_populates="generation",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        foreign_keys="GenerationJob.generation_id"
+    )
 
     def __repr__(self):
         return f"<Generation(id={self.id}, version={self.version}, status={self.status})>"
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Index
+from datetime import datetime
+import uuid
+
+from app.db.database import Base
+
+
+class GenerationEvent(Base):
+    """Streamed event spilled out of the in-memory replay buffer"""
+    __tablename__ = "generation_events"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    generation_id = Column(String(36), ForeignKey("generations.id", ondelete="CASCADE"), nullable=False)
+    attempt = Column(Integer, nullable=False)
+    seq = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON-encoded event
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_generation_events_generation_attempt_seq", "generation_id", "attempt", "seq"),
+    )
+
+    def __repr__(self):
+        return f"<GenerationEvent(generation_id={self.generation_id}, attempt={self.attempt}, seq={self.seq})>"
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import uuid
+import enum
+
+from app.db.database import Base
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    generation_id = Column(String(36), ForeignKey("generations.id", ondelete="CASCADE"), nullable=False, unique=True)
+    project_id = Column(String(36), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    user_prompt = Column(Text, nullable=False)
+    chat_history = Column(Text, nullable=True)  # JSON snapshot of the context at enqueue time
+    code_digest = Column(Text, nullable=True)  # Summary of the files being corrected
+    # Edit-mode corrections: the version the model's changed files are merged into
+    base_generation_id = Column(String(36), ForeignKey("generations.id", ondelete="SET NULL"), nullable=True)
+    bypass_cache = Column(Boolean, nullable=False, default=False)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # Relationships
+    generation = relationship("Generation", back_populates="job", foreign_keys=[generation_id])
+
+    def __repr__(self):
+        return f"<GenerationJob(id={self.id}, status={self.status}, attempts={self.attempts})>"
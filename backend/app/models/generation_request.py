@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey
+from datetime import datetime
+
+from app.db.database import Base
+
+
+class GenerationRequest(Base):
+    """
+    Lock row coalescing duplicate generate requests onto one generation
+
+    The primary key is a hash of either the client's Idempotency-Key or the
+    request fingerprint; the unique insert is what serializes racing requests
+    across worker processes. The row is released as soon as its generation
+    fails or is cancelled, so a retry starts a new one.
+    """
+    __tablename__ = "generation_requests"
+
+    key = Column(String(64), primary_key=True)
+    project_id = Column(String(36), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    generation_id = Column(String(36), ForeignKey("generations.id", ondelete="CASCADE"), nullable=True)
+    request_hash = Column(String(64), nullable=True)  # Hash of the request body; reused keys must match it
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<GenerationRequest(key={self.key}, generation_id={self.generation_id})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy import Column, String, Text, Integer, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -15,9 +15,30 @@ class Project(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
-    # Relationships
-    generations = relationship("Generation", back_populates="project", cascade="all, delete-orphan")
-    chat_messages = relationship("ChatMessage", back_populates="project", cascade="all, delete-orphan")
+    # Denormalized from generations, kept in step by GenerationService and
+    # recomputed by ProjectService.repair_counters
+    generation_count = Column(Integer, nullable=False, default=0, server_default="0")
+    latest_version = Column(Integer, nullable=True)
+    latest_generation_id = Column(String(36), nullable=True)
+    last_activity_at = Column(DateTime, nullable=True)
+    # Last version number handed out; only ever grows, so deleted versions are never reused
+    version_counter = Column(Integer, nullable=False, default=0, server_default="0")
+    # Set on large projects whose rows are still being purged; they are hidden from then on
+    deleted_at = Column(DateTime, nullable=True, index=True)
+
+    __table_args__ = (
+        # Keyset pagination of the project list
+        Index("ix_projects_updated_at_id", "updated_at", "id"),
+    )
+
+    # Relationships; children are removed by the database's ON DELETE CASCADE,
+    # never loaded just to be deleted
+    generations = relationship(
+        "Generation", back_populates="project", cascade="all, delete-orphan", passive_deletes=True
+    )
+    chat_messages = relationship(
+        "ChatMessage", back_populates="project", cascade="all, delete-orphan", passive_deletes=True
+    )
 
     def __repr__(self):
         return f"<Project(id={self.id}, name={self.name})>"
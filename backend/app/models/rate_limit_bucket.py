@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Float
+
+from app.db.database import Base
+
+
+class RateLimitBucket(Base):
+    """
+    Token bucket shared by every process calling the model
+
+    The level is refilled lazily from ``updated_at`` (epoch seconds) by whoever
+    locks the row next, so no process needs to tick the buckets.
+    """
+    __tablename__ = "rate_limit_buckets"
+
+    name = Column(String(128), primary_key=True)
+    level = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<RateLimitBucket(name={self.name}, level={self.level})>"
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Text, Integer, DateTime
+from datetime import datetime
+
+from app.db.database import Base
+
+
+class ResponseCacheEntry(Base):
+    """Model output cached by a hash of everything that determines it"""
+    __tablename__ = "response_cache"
+
+    key = Column(String(64), primary_key=True)  # SHA-256 hex digest
+    content = Column(Text, nullable=False)  # Raw model output, before parsing
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ResponseCacheEntry(key={self.key}, hits={self.hit_count})>"
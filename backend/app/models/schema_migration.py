@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+
+from app.db.database import Base
+
+
+class SchemaMigration(Base):
+    """Migration already applied to this database"""
+    __tablename__ = "schema_migrations"
+
+    id = Column(String(64), primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<SchemaMigration(id={self.id})>"
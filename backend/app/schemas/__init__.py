@@ -3,11 +3,15 @@ from app.schemas.project import (
     ProjectUpdate,
     ProjectResponse,
     ProjectWithGenerations,
+    ProjectBulkDelete,
+    ProjectBulkDeleteResponse,
 )
 from app.schemas.generation import (
     GenerationCreate,
     GenerationResponse,
     GenerationListResponse,
+    GenerationFileEntry,
+    GenerationManifestResponse,
 )
 from app.schemas.chat import (
     ChatMessageCreate,
@@ -20,9 +24,13 @@ __all__ = [
     "ProjectUpdate",
     "ProjectResponse",
     "ProjectWithGenerations",
+    "ProjectBulkDelete",
+    "ProjectBulkDeleteResponse",
     "GenerationCreate",
     "GenerationResponse",
     "GenerationListResponse",
+    "GenerationFileEntry",
+    "GenerationManifestResponse",
     "ChatMessageCreate",
     "ChatMessageResponse",
     "ChatHistoryResponse",
@@ -27,4 +27,5 @@ class ChatMessageResponse(ChatMessageBase):
 
 class ChatHistoryResponse(BaseModel):
     messages: list[ChatMessageResponse]
-    total: int
+    total: int  # All messages of the project, not just this page
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page
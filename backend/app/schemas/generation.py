@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
 from app.models.generation import GenerationStatus
 
 
@@ -14,6 +14,8 @@ class GenerationBase(BaseModel):
 class GenerationCreate(BaseModel):
     project_id: UUID
     user_prompt: str = Field(..., min_length=1)
+    bypass_cache: bool = False  # Always call the model, even for a cached prompt
+    full_regeneration: bool = False  # Regenerate every file instead of editing the latest version
 
 
 class GenerationResponse(GenerationBase):
@@ -30,6 +32,22 @@ class GenerationListResponse(BaseModel):
     status: GenerationStatus
     version: int
     created_at: datetime
-    preview: Optional[str] = None  # First 200 chars of HTML
+    preview: Optional[str] = None  # First 200 chars of HTML, or the file list
+    size: Optional[int] = None  # Bytes of output
+    file_count: Optional[int] = None
 
     model_config = {"from_attributes": True}
+
+
+class GenerationFileEntry(BaseModel):
+    path: str
+    size: int  # Bytes, uncompressed
+    hash: str  # SHA-256 of the content, also the file's ETag
+
+    model_config = {"from_attributes": True}
+
+
+class GenerationManifestResponse(BaseModel):
+    generation_id: UUID
+    version: int
+    files: List[GenerationFileEntry]
@@ -1,7 +1,9 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
+
+from app.core.config import settings
 
 
 class ProjectBase(BaseModel):
@@ -28,5 +30,17 @@ class ProjectResponse(ProjectBase):
 
 class ProjectWithGenerations(ProjectResponse):
     generation_count: int = 0
+    latest_version: Optional[int] = None
+    latest_generation_id: Optional[UUID] = None
+    last_activity_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
+
+
+class ProjectBulkDelete(BaseModel):
+    project_ids: List[UUID] = Field(..., min_length=1, max_length=settings.PROJECT_BULK_DELETE_MAX)
+
+
+class ProjectBulkDeleteResponse(BaseModel):
+    deleted: List[UUID]
+    not_found: List[UUID]
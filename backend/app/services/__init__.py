@@ -1,12 +1,43 @@
+from app.services.response_cache import response_cache, ResponseCache
+from app.services.entity_cache import entity_cache, EntityCache, CacheBackend
+from app.services.model_guard import model_guard, ModelCallGuard
+from app.services.model_providers import ModelProvider
 from app.services.gemini_service import gemini_service, GeminiService
 from app.services.project_service import ProjectService
+from app.services.file_store_service import FileStoreService
 from app.services.generation_service import GenerationService
 from app.services.chat_service import ChatService
+from app.services.context_builder import ContextBuilder, GenerationContext
+from app.services.job_service import JobService
+from app.services.generation_events import generation_event_hub, GenerationEventHub
+from app.services.generation_worker import generation_worker_pool, GenerationWorkerPool
+from app.services.event_log_service import EventLogService
+from app.services.generation_stream_service import GenerationStreamService
+from app.services.generation_request_service import GenerationRequestService
 
 __all__ = [
+    "response_cache",
+    "ResponseCache",
+    "entity_cache",
+    "EntityCache",
+    "CacheBackend",
+    "model_guard",
+    "ModelCallGuard",
+    "ModelProvider",
     "gemini_service",
     "GeminiService",
     "ProjectService",
+    "FileStoreService",
     "GenerationService",
     "ChatService",
+    "ContextBuilder",
+    "GenerationContext",
+    "JobService",
+    "generation_event_hub",
+    "GenerationEventHub",
+    "generation_worker_pool",
+    "GenerationWorkerPool",
+    "EventLogService",
+    "GenerationStreamService",
+    "GenerationRequestService",
 ]
@@ -1,11 +1,12 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, func
 from uuid import UUID
 from typing import List, Optional
 
 from app.models import ChatMessage, MessageRole
 from app.core.exceptions import raise_not_found
 from app.services.project_service import ProjectService
+from app.utils.pagination import after_cursor, total_count_cache
 
 
 class ChatService:
@@ -21,7 +22,7 @@ class ChatService:
     ) -> ChatMessage:
         """Create a new chat message"""
         # Verify project exists
-        await ProjectService.get_project_or_404(db, project_id)
+        await ProjectService.ensure_project_exists(db, project_id)
 
         message = ChatMessage(
             project_id=str(project_id),
@@ -32,6 +33,7 @@ class ChatService:
         db.add(message)
         await db.flush()
         await db.refresh(message)
+        total_count_cache.invalidate(f"messages:{project_id}")
         return message
 
     @staticmethod
@@ -45,34 +47,85 @@ class ChatService:
         )
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_latest_message_id(
+        db: AsyncSession,
+        project_id: UUID,
+        role: Optional[MessageRole] = None
+    ) -> Optional[str]:
+        """Get the ID of the most recent message of a project, optionally by role"""
+        query = select(ChatMessage.id).where(ChatMessage.project_id == str(project_id))
+        if role is not None:
+            query = query.where(ChatMessage.role == role)
+        result = await db.execute(
+            query.order_by(desc(ChatMessage.created_at)).limit(1)
+        )
+        return result.scalar_one_or_none()
+
     @staticmethod
     async def list_messages(
         db: AsyncSession,
         project_id: UUID,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
     ) -> List[ChatMessage]:
-        """List all chat messages for a project"""
+        """List all chat messages for a project, oldest first, by offset or cursor"""
         # Verify project exists
-        await ProjectService.get_project_or_404(db, project_id)
+        await ProjectService.ensure_project_exists(db, project_id)
 
+        query = after_cursor(
+            select(ChatMessage), ChatMessage.created_at, ChatMessage.id, cursor, descending=False
+        )
         result = await db.execute(
-            select(ChatMessage)
+            query
             .where(ChatMessage.project_id == str(project_id))
-            .order_by(ChatMessage.created_at)
-            .offset(skip)
+            .order_by(ChatMessage.created_at, ChatMessage.id)
+            .offset(0 if cursor else skip)
             .limit(limit)
         )
         return list(result.scalars().all())
 
+    @staticmethod
+    async def count_messages(
+        db: AsyncSession,
+        project_id: UUID
+    ) -> int:
+        """Number of chat messages of a project, served from a short-lived cache"""
+        key = f"messages:{project_id}"
+        total = total_count_cache.get(key)
+        if total is None:
+            result = await db.execute(
+                select(func.count()).select_from(ChatMessage)
+                .where(ChatMessage.project_id == str(project_id))
+            )
+            total = result.scalar_one()
+            total_count_cache.set(key, total)
+        return total
+
+    @staticmethod
+    async def get_recent_messages(
+        db: AsyncSession,
+        project_id: UUID,
+        limit: int = 20
+    ) -> List[ChatMessage]:
+        """Get the most recent messages of a project, oldest first"""
+        result = await db.execute(
+            select(ChatMessage)
+            .where(ChatMessage.project_id == str(project_id))
+            .order_by(desc(ChatMessage.created_at), desc(ChatMessage.id))
+            .limit(limit)
+        )
+        return list(reversed(result.scalars().all()))
+
     @staticmethod
     async def get_chat_history_dict(
         db: AsyncSession,
         project_id: UUID,
         limit: int = 20
     ) -> List[dict]:
-        """Get chat history as a list of dictionaries for Gemini context"""
-        messages = await ChatService.list_messages(db, project_id, limit=limit)
+        """Get the latest turns of chat history as dictionaries for Gemini context"""
+        messages = await ChatService.get_recent_messages(db, project_id, limit=limit)
         return [
             {
                 "role": msg.role.value,
@@ -92,3 +145,4 @@ class ChatService:
             raise_not_found("Chat message", str(message_id))
         await db.delete(message)
         await db.flush()
+        total_count_cache.invalidate(f"messages:{message.project_id}")
@@ -0,0 +1,156 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import dataclass, field
+from uuid import UUID
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.models import GenerationStatus
+from app.services.chat_service import ChatService
+from app.services.file_store_service import FileStoreService
+from app.services.generation_service import GenerationService
+from app.utils.code_digest import parse_files, parse_file_set, build_code_digest
+from app.utils.delimiter_parser import FILE_START_MARKER, FILE_HEADER_END, FILE_END_MARKER
+from app.utils.prompts import build_correction_prompt, build_edit_prompt
+from app.utils.tokens import estimate_tokens, truncate_to_tokens
+
+
+@dataclass
+class GenerationContext:
+    """Context handed to the model alongside a user prompt"""
+    chat_history: List[dict] = field(default_factory=list)
+    code_digest: str = ""
+    # Set for edit-mode corrections: the version the model's changes apply to
+    base_generation_id: Optional[str] = None
+
+
+class ContextBuilder:
+    """Assembles correction context within the configured token budget"""
+
+    @staticmethod
+    async def build(
+        db: AsyncSession,
+        project_id: UUID,
+        user_prompt: str,
+        edit_mode: bool = True
+    ) -> GenerationContext:
+        """
+        Build the context for a new request, before its own message is saved
+
+        The code context of the latest completed generation takes up to
+        CONTEXT_DIGEST_SHARE of what is left after the request itself; the rest
+        is filled with the most recent chat turns, newest first.
+
+        In edit mode (a multi-file latest version and GENERATION_EDIT_MODE on),
+        the code context carries full file contents so the model can return
+        only the files it changes, within CONTEXT_EDIT_TOKEN_BUDGET.
+        """
+        messages = await ChatService.get_recent_messages(
+            db, project_id, limit=settings.CONTEXT_HISTORY_WINDOW
+        )
+        latest = await GenerationService.get_latest_generation(
+            db, project_id, status=GenerationStatus.COMPLETED
+        )
+        if not messages and latest is None:
+            # A brand new project: plain generation, no correction context
+            return GenerationContext()
+
+        latest_content = await FileStoreService.load_content(db, latest) if latest else None
+        base_files = None
+        if edit_mode and settings.GENERATION_EDIT_MODE:
+            base_files = parse_file_set(latest_content)
+
+        if base_files:
+            remaining = settings.CONTEXT_EDIT_TOKEN_BUDGET - estimate_tokens(
+                build_edit_prompt("", user_prompt, "")
+            )
+        else:
+            remaining = settings.CONTEXT_TOKEN_BUDGET - estimate_tokens(
+                build_correction_prompt("", user_prompt)
+            )
+        code_budget = int(max(remaining, 0) * settings.CONTEXT_DIGEST_SHARE)
+
+        digest = ""
+        if base_files:
+            digest = ContextBuilder._fit_files(base_files, user_prompt, code_budget)
+        elif latest is not None:
+            digest = ContextBuilder._fit_digest(
+                build_code_digest(parse_files(latest_content)), code_budget
+            )
+        remaining -= estimate_tokens(digest)
+
+        history = ContextBuilder._fit_history(
+            [{"role": msg.role.value, "content": msg.content} for msg in messages],
+            remaining
+        )
+        return GenerationContext(
+            chat_history=history,
+            code_digest=digest,
+            base_generation_id=latest.id if base_files else None
+        )
+
+    @staticmethod
+    def _fit_digest(lines: List[str], budget: int) -> str:
+        """Keep whole digest lines while they fit, noting how many were left out"""
+        kept = []
+        used = 0
+        for line in lines:
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        if len(kept) < len(lines):
+            kept.append(f"- ... {len(lines) - len(kept)} more files")
+        return "\n".join(kept)
+
+    @staticmethod
+    def _fit_files(files: Dict[str, str], user_prompt: str, budget: int) -> str:
+        """
+        Full contents of as many files as fit, the rest as digest lines
+
+        Files the request mentions by name go first, then smaller files, so a
+        budget overrun costs as few files as possible.
+        """
+        prompt = user_prompt.lower()
+
+        def priority(path: str):
+            name = path.rsplit("/", 1)[-1].lower()
+            stem = name.rsplit(".", 1)[0]
+            mentioned = name in prompt or (len(stem) > 2 and stem in prompt)
+            return (not mentioned, len(files[path]))
+
+        blocks = []
+        summarized = {}
+        used = 0
+        for path in sorted(files, key=priority):
+            block = f"{FILE_START_MARKER} {path}{FILE_HEADER_END}\n{files[path]}\n{FILE_END_MARKER}"
+            cost = estimate_tokens(block) + 1
+            if used + cost <= budget:
+                blocks.append(block)
+                used += cost
+            else:
+                summarized[path] = files[path]
+
+        if summarized:
+            blocks.append(ContextBuilder._fit_digest(build_code_digest(summarized), budget - used))
+        return "\n".join(blocks)
+
+    @staticmethod
+    def _fit_history(history: List[dict], budget: int) -> List[dict]:
+        """Keep the newest messages that fit; the newest one is truncated if it alone is too long"""
+        kept = []
+        used = 0
+        for message in reversed(history):
+            # Role label and separator cost a few tokens per message
+            cost = estimate_tokens(message["content"]) + 4
+            if used + cost > budget:
+                if not kept and budget > 4:
+                    kept.append({
+                        **message,
+                        "content": truncate_to_tokens(message["content"], budget - 4)
+                    })
+                break
+            kept.append(message)
+            used += cost
+        kept.reverse()
+        return kept
@@ -0,0 +1,189 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """
+    Key/value store behind the entity cache
+
+    Values are serialized response bodies (bytes), so an out-of-process store
+    (Redis, memcached) only needs these three operations. A ``ttl`` of None means the
+    entry never expires, though the store may still evict it.
+    """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        pass
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class NullCacheBackend(CacheBackend):
+    """Caching disabled: every read goes to the database"""
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU with per-entry expiry, bounded by entry count and total size"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._discard(key)
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+class EntityCache:
+    """
+    Read-through cache of serialized project and generation responses
+
+    Services look a body up before querying and store what they load; writers
+    invalidate single keys, or bump a namespace to drop every key built from it
+    (listings). Invalidation runs immediately and again once the writer's
+    transaction commits, so a read racing the write cannot re-cache the old row.
+
+    With the in-process backend each process has its own copy: entries
+    invalidated elsewhere live on until ENTITY_CACHE_TTL_SECONDS. Immutable
+    ones never expire, so readers must check the entity still exists before
+    serving them.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+        self._pending: Set[asyncio.Task] = set()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            # The cache must never break a read
+            logger.warning(f"Entity cache lookup failed: {e}")
+            value = None
+        self._stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store a body for ``ttl`` seconds, ENTITY_CACHE_TTL_SECONDS by default"""
+        try:
+            await self.backend.set(key, value, settings.ENTITY_CACHE_TTL_SECONDS if ttl is None else ttl)
+            self._stats["stores"] += 1
+        except Exception as e:
+            logger.warning(f"Entity cache store failed: {e}")
+
+    async def set_immutable(self, key: str, value: bytes) -> None:
+        """Store a body that only a deletion can invalidate"""
+        try:
+            await self.backend.set(key, value, None)
+            self._stats["stores"] += 1
+        except Exception as e:
+            logger.warning(f"Entity cache store failed: {e}")
+
+    async def namespace(self, name: str) -> str:
+        """Current version of a namespace, to be made part of the keys built from it"""
+        version = await self.get(f"ns:{name}")
+        if version is None:
+            # Never seen, or evicted: start a fresh version so no older key can match
+            return await self._bump(name)
+        return version.decode("ascii")
+
+    async def invalidate(
+        self,
+        db: Optional[AsyncSession],
+        keys: Iterable[str] = (),
+        namespaces: Iterable[str] = ()
+    ) -> None:
+        """Drop keys and bump namespaces now, and again after ``db`` commits"""
+        keys = list(keys)
+        namespaces = list(namespaces)
+        await self._invalidate(keys, namespaces)
+        if db is None:
+            return
+
+        loop = asyncio.get_running_loop()
+
+        def after_commit(session):
+            task = loop.create_task(self._invalidate(keys, namespaces))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+        event.listen(db.sync_session, "after_commit", after_commit, once=True)
+
+    async def _invalidate(self, keys: list, namespaces: list) -> None:
+        self._stats["invalidations"] += 1
+        try:
+            if keys:
+                await self.backend.delete(keys)
+            for name in namespaces:
+                await self._bump(name)
+        except Exception as e:
+            logger.warning(f"Entity cache invalidation failed: {e}")
+
+    async def _bump(self, name: str) -> str:
+        # A fresh token rather than a counter, so there is no read-modify-write race
+        version = f"{time.time_ns():x}"
+        await self.backend.set(f"ns:{name}", version.encode("ascii"), None)
+        return version
+
+    def stats(self) -> dict:
+        return {**self._stats, **self.backend.stats()}
+
+
+def create_cache_backend() -> CacheBackend:
+    """Backend selected by ENTITY_CACHE"""
+    if settings.ENTITY_CACHE == "none":
+        return NullCacheBackend()
+    if settings.ENTITY_CACHE != "memory":
+        logger.warning(f"Unknown ENTITY_CACHE '{settings.ENTITY_CACHE}', using in-memory cache")
+    return MemoryCacheBackend(settings.ENTITY_CACHE_MAX_ENTRIES, settings.ENTITY_CACHE_MAX_BYTES)
+
+
+# Create a singleton instance
+entity_cache = EntityCache(create_cache_backend())
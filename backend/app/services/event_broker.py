@@ -0,0 +1,179 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable
+import logging
+
+import orjson
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Called with (generation_id, attempt, seq, event) for events from other processes
+DeliverCallback = Callable[[str, int, int, dict], None]
+
+
+class EventBroker:
+    """
+    Transport that shares generation events between worker processes
+
+    The in-process hub does all numbering, buffering and fan-out; a broker only
+    forwards locally produced events to other processes and hands their events
+    back to the local hub through the deliver callback.
+    """
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, generation_id: str, attempt: int, seq: int, event: dict) -> None:
+        """Forward a locally produced event; must never block the event loop"""
+        pass
+
+
+class LocalEventBroker(EventBroker):
+    """Single-process broker: events never leave the process"""
+
+
+class SQLiteEventBroker(EventBroker):
+    """
+    Broker backed by a shared SQLite file, for several uvicorn workers on one host
+
+    Writes are batched by a writer thread and every process tails the table from
+    a reader thread, so neither side blocks the event loop. Rows are trimmed
+    after ``EVENT_BROKER_RETENTION_SECONDS``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.origin = uuid.uuid4().hex
+        self._outbox: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._threads: list = []
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        loop = asyncio.get_running_loop()
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " origin TEXT NOT NULL,"
+            " generation_id TEXT NOT NULL,"
+            " attempt INTEGER NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_events_created_at ON events (created_at)")
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        conn.close()
+
+        def dispatch(rows) -> None:
+            for generation_id, attempt, seq, payload in rows:
+                deliver(generation_id, attempt, seq, orjson.loads(payload))
+
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._write_loop, name="event-broker-writer", daemon=True),
+            threading.Thread(
+                target=self._read_loop,
+                args=(loop, dispatch, last_id),
+                name="event-broker-reader",
+                daemon=True
+            ),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"SQLite event broker started ({self.path})")
+
+    async def stop(self) -> None:
+        self._stop.set()
+        self._outbox.put(None)
+        for thread in self._threads:
+            await asyncio.to_thread(thread.join, 5)
+        self._threads = []
+
+    def publish(self, generation_id: str, attempt: int, seq: int, event: dict) -> None:
+        self._outbox.put((self.origin, generation_id, attempt, seq, orjson.dumps(event).decode("utf-8"), time.time()))
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        last_trim = time.time()
+        try:
+            while not self._stop.is_set():
+                item = self._outbox.get()
+                if item is None:
+                    break
+                rows = [item]
+                # Batch whatever else is already waiting
+                while len(rows) < 500:
+                    try:
+                        item = self._outbox.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._stop.set()
+                        break
+                    rows.append(item)
+                try:
+                    conn.executemany(
+                        "INSERT INTO events (origin, generation_id, attempt, seq, payload, created_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+                    if time.time() - last_trim > settings.EVENT_BROKER_RETENTION_SECONDS:
+                        conn.execute(
+                            "DELETE FROM events WHERE created_at < ?",
+                            (time.time() - settings.EVENT_BROKER_RETENTION_SECONDS,)
+                        )
+                        last_trim = time.time()
+                except sqlite3.Error as e:
+                    logger.error(f"Event broker write failed: {e}")
+        finally:
+            conn.close()
+
+    def _read_loop(self, loop: asyncio.AbstractEventLoop, dispatch, last_id: int) -> None:
+        conn = self._connect()
+        try:
+            while not self._stop.is_set():
+                try:
+                    rows = conn.execute(
+                        "SELECT id, origin, generation_id, attempt, seq, payload FROM events"
+                        " WHERE id > ? ORDER BY id LIMIT 1000",
+                        (last_id,)
+                    ).fetchall()
+                except sqlite3.Error as e:
+                    logger.error(f"Event broker read failed: {e}")
+                    rows = []
+                if rows:
+                    last_id = rows[-1][0]
+                    remote = [row[2:] for row in rows if row[1] != self.origin]
+                    if remote:
+                        loop.call_soon_threadsafe(dispatch, remote)
+                else:
+                    self._stop.wait(settings.EVENT_BROKER_POLL_SECONDS)
+        finally:
+            conn.close()
+
+
+def create_event_broker() -> EventBroker:
+    """Build the broker selected by EVENT_BROKER"""
+    if settings.EVENT_BROKER == "sqlite":
+        return SQLiteEventBroker(os.path.abspath(settings.EVENT_BROKER_SQLITE_PATH))
+    if settings.EVENT_BROKER != "local":
+        logger.warning(f"Unknown EVENT_BROKER '{settings.EVENT_BROKER}', using local broker")
+    return LocalEventBroker()
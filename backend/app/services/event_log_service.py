@@ -0,0 +1,63 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from uuid import UUID
+from typing import List, Optional
+import orjson
+
+from app.models import GenerationEvent
+from app.services.generation_events import EventId, NumberedEvent
+
+
+class EventLogService:
+    """Service for streamed events spilled to the database"""
+
+    @staticmethod
+    async def spill_events(
+        db: AsyncSession,
+        generation_id: UUID,
+        events: List[NumberedEvent]
+    ) -> None:
+        """Persist events evicted from the in-memory replay buffer"""
+        db.add_all([
+            GenerationEvent(
+                generation_id=str(generation_id),
+                attempt=event_id.attempt,
+                seq=event_id.seq,
+                payload=orjson.dumps(event).decode("utf-8")
+            )
+            for event_id, event in events
+        ])
+        await db.flush()
+
+    @staticmethod
+    async def list_events(
+        db: AsyncSession,
+        generation_id: UUID,
+        attempt: int,
+        after_seq: int = 0,
+        before_seq: Optional[int] = None
+    ) -> List[NumberedEvent]:
+        """List spilled events of one attempt in sequence order"""
+        query = (
+            select(GenerationEvent.seq, GenerationEvent.payload)
+            .where(
+                GenerationEvent.generation_id == str(generation_id),
+                GenerationEvent.attempt == attempt,
+                GenerationEvent.seq > after_seq
+            )
+        )
+        if before_seq is not None:
+            query = query.where(GenerationEvent.seq < before_seq)
+
+        result = await db.execute(query.order_by(GenerationEvent.seq))
+        return [(EventId(attempt, seq), orjson.loads(payload)) for seq, payload in result]
+
+    @staticmethod
+    async def delete_events(
+        db: AsyncSession,
+        generation_id: UUID
+    ) -> None:
+        """Drop spilled events once the final output is stored"""
+        await db.execute(
+            delete(GenerationEvent).where(GenerationEvent.generation_id == str(generation_id))
+        )
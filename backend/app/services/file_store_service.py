@@ -0,0 +1,236 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, exists, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from uuid import UUID
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import zlib
+
+from app.models import FileBlob, GenerationFile, Generation
+
+# Path under which raw single-HTML output is exposed as a file
+RAW_HTML_PATH = "index.html"
+
+# Bytes of file content above which (de)compression moves to a worker thread
+THREAD_THRESHOLD = 64 * 1024
+
+
+async def _run_codec(func, payload, size: int):
+    """Run a compression helper inline for small payloads, in a thread for large ones"""
+    if size < THREAD_THRESHOLD:
+        return func(payload)
+    return await asyncio.to_thread(func, payload)
+
+
+def _compress_all(blobs: Dict[str, bytes]) -> Dict[str, bytes]:
+    return {key: zlib.compress(data) for key, data in blobs.items()}
+
+
+def _decompress_all(rows: List[Tuple[str, bytes]]) -> Dict[str, str]:
+    return {path: zlib.decompress(content).decode("utf-8") for path, content in rows}
+
+
+def _decompress(content: bytes) -> str:
+    return zlib.decompress(content).decode("utf-8")
+
+
+class FileStoreService:
+    """
+    Service for content-addressed generation files
+
+    Each distinct file body is stored once in ``file_blobs``, compressed and
+    keyed by its SHA-256; a generation's ``generation_files`` manifest maps its
+    paths to blobs, so versions share every file they did not change.
+    """
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """Content address of a file body"""
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    async def store_files(
+        db: AsyncSession,
+        generation_id: UUID,
+        files: Dict[str, str]
+    ) -> List[GenerationFile]:
+        """Replace a generation's manifest, writing only blobs not stored yet"""
+        encoded = {path: content.encode("utf-8") for path, content in files.items()}
+        hashes = {path: hashlib.sha256(data).hexdigest() for path, data in encoded.items()}
+
+        # Touch reused blobs before reading which exist: the update waits for a
+        # purge already deleting them, and once touched they are too recent for
+        # the next one; the locking read then sees rows that stay until commit
+        unique_hashes = set(hashes.values())
+        await db.execute(
+            update(FileBlob)
+            .where(FileBlob.hash.in_(unique_hashes))
+            .values(last_used_at=datetime.utcnow())
+        )
+        result = await db.execute(
+            select(FileBlob.hash).where(FileBlob.hash.in_(unique_hashes)).with_for_update()
+        )
+        stored = set(result.scalars().all())
+
+        new_blobs = {}
+        for path, blob_hash in hashes.items():
+            if blob_hash not in stored:
+                new_blobs[blob_hash] = encoded[path]
+        compressed = await _run_codec(
+            _compress_all, new_blobs, sum(len(data) for data in new_blobs.values())
+        )
+
+        for blob_hash, data in new_blobs.items():
+            try:
+                # A concurrent writer may store the same content first
+                async with db.begin_nested():
+                    db.add(FileBlob(hash=blob_hash, content=compressed[blob_hash], size=len(data)))
+            except IntegrityError:
+                pass
+
+        await db.execute(
+            delete(GenerationFile).where(GenerationFile.generation_id == str(generation_id))
+        )
+        manifest = [
+            GenerationFile(
+                generation_id=str(generation_id),
+                path=path,
+                blob_hash=hashes[path],
+                size=len(encoded[path])
+            )
+            for path in sorted(files)
+        ]
+        db.add_all(manifest)
+        await db.flush()
+        return manifest
+
+    @staticmethod
+    async def get_manifest(
+        db: AsyncSession,
+        generation_id: UUID
+    ) -> List[GenerationFile]:
+        """Get a generation's manifest entries, ordered by path"""
+        result = await db.execute(
+            select(GenerationFile)
+            .where(GenerationFile.generation_id == str(generation_id))
+            .order_by(GenerationFile.path)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def load_files(
+        db: AsyncSession,
+        generation_id: UUID,
+        paths: Optional[Iterable[str]] = None
+    ) -> Dict[str, str]:
+        """Load the contents of a generation's files, or only of the given paths"""
+        query = (
+            select(GenerationFile.path, FileBlob.content)
+            .join(FileBlob, FileBlob.hash == GenerationFile.blob_hash)
+            .where(GenerationFile.generation_id == str(generation_id))
+        )
+        if paths is not None:
+            query = query.where(GenerationFile.path.in_(list(paths)))
+        result = await db.execute(query.order_by(GenerationFile.path))
+        rows = [tuple(row) for row in result.all()]
+        return await _run_codec(_decompress_all, rows, sum(len(row[1]) for row in rows))
+
+    @staticmethod
+    async def describe_files(
+        db: AsyncSession,
+        generation: Generation
+    ) -> List[dict]:
+        """Path, size and hash of each file; raw HTML output is a single index.html"""
+        if generation.html_content is not None:
+            data = generation.html_content.encode("utf-8")
+            return [{
+                "path": RAW_HTML_PATH,
+                "size": len(data),
+                "hash": hashlib.sha256(data).hexdigest(),
+            }]
+        return [
+            {"path": entry.path, "size": entry.size, "hash": entry.blob_hash}
+            for entry in await FileStoreService.get_manifest(db, generation.id)
+        ]
+
+    @staticmethod
+    async def get_file(
+        db: AsyncSession,
+        generation: Generation,
+        path: str
+    ) -> Optional[Tuple[str, str]]:
+        """Hash and content of one file of a generation, loading only its blob"""
+        if generation.html_content is not None:
+            if path != RAW_HTML_PATH:
+                return None
+            return FileStoreService.hash_content(generation.html_content), generation.html_content
+
+        result = await db.execute(
+            select(FileBlob.hash, FileBlob.content)
+            .join(GenerationFile, GenerationFile.blob_hash == FileBlob.hash)
+            .where(
+                GenerationFile.generation_id == str(generation.id),
+                GenerationFile.path == path
+            )
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        return row[0], await _run_codec(_decompress, row[1], len(row[1]))
+
+    @staticmethod
+    async def get_file_compressed(
+        db: AsyncSession,
+        generation: Generation,
+        path: str
+    ) -> Optional[Tuple[str, bytes]]:
+        """
+        Hash and stored zlib stream of one manifest file, without decompressing it
+
+        The stream is exactly the HTTP "deflate" content coding. Raw HTML output
+        has no blob, so None is returned for it as for a missing path.
+        """
+        result = await db.execute(
+            select(FileBlob.hash, FileBlob.content)
+            .join(GenerationFile, GenerationFile.blob_hash == FileBlob.hash)
+            .where(
+                GenerationFile.generation_id == str(generation.id),
+                GenerationFile.path == path
+            )
+        )
+        row = result.one_or_none()
+        return (row[0], row[1]) if row is not None else None
+
+    @staticmethod
+    async def load_content(
+        db: AsyncSession,
+        generation: Generation
+    ) -> Optional[str]:
+        """A generation's output as stored before manifests: raw HTML or {"files": ...} JSON"""
+        if generation.html_content is not None:
+            return generation.html_content
+        files = await FileStoreService.load_files(db, generation.id)
+        return json.dumps({"files": files}) if files else None
+
+    @staticmethod
+    async def purge_unreferenced_blobs(
+        db: AsyncSession,
+        older_than: datetime
+    ) -> int:
+        """
+        Delete blobs no manifest references any more
+
+        Only blobs last written or reused before ``older_than`` are considered,
+        so content a transaction is about to reference in a manifest it has
+        not inserted yet survives.
+        """
+        result = await db.execute(
+            delete(FileBlob).where(
+                FileBlob.last_used_at < older_than,
+                ~exists().where(GenerationFile.blob_hash == FileBlob.hash)
+            )
+        )
+        return result.rowcount
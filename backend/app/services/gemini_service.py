@@ -1,70 +1,51 @@
-import google.generativeai as genai
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Iterator, Optional
 import asyncio
-import json
-import re
 from app.core.config import settings
 from app.core.exceptions import GeminiAPIException
-from app.utils.prompts import SYSTEM_PROMPT, build_correction_prompt
+from app.utils.prompts import (
+    SYSTEM_PROMPT,
+    SYSTEM_PROMPT_VERSION,
+    build_correction_prompt,
+    build_edit_prompt,
+)
+from app.utils.delimiter_parser import DelimiterStreamParser
+from app.services.model_guard import model_guard
+from app.services.model_providers import create_model_provider
+from app.services.response_cache import ResponseCache, response_cache
+from app.utils.tokens import estimate_tokens
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Configure Gemini API
-genai.configure(api_key=settings.GEMINI_API_KEY)
-
 
 class GeminiService:
-    """Service for interacting with Google Gemini API"""
+    """
+    Service for generating code with the configured model provider
+
+    Builds prompts, serves and fills the response cache, and calls the
+    provider (Gemini unless MODEL_PROVIDER says otherwise) through the model
+    call guard.
+    """
 
     def __init__(self):
         # Configure generation settings
-        generation_config = {
+        self.generation_config = {
             "temperature": 0.7,
             "top_p": 0.95,
             "top_k": 40,
             "max_output_tokens": 8192,
         }
 
-        self.model = genai.GenerativeModel(
-            model_name=settings.GEMINI_MODEL,
-            system_instruction=SYSTEM_PROMPT,
-            generation_config=generation_config
-        )
-        logger.info(f"Initialized Gemini model: {settings.GEMINI_MODEL}")
+        self.provider = create_model_provider(SYSTEM_PROMPT, self.generation_config)
+        logger.info(f"Model provider: {self.provider.identity}")
 
     def _parse_delimiter_format(self, text: str) -> str:
         """Parse delimiter-based format and convert to JSON"""
         try:
-            files = {}
-
-            # More flexible regex that handles various spacing
-            file_pattern = r'===FILE:\s*([^\s=]+[^\n]*?)\s*===\s*(.*?)\s*===END FILE==='
-            matches = re.findall(file_pattern, text, re.DOTALL)
-
-            if not matches:
-                # Fallback: treat entire response as single HTML file
-                logger.warning("No delimiter format found, treating as single HTML file")
-                return text
-
-            for filename, content in matches:
-                filename = filename.strip()
-                content = content.strip()
-                if content:  # Only add non-empty files
-                    files[filename] = content
-                else:
-                    logger.warning(f"Skipping empty file: {filename}")
-
-            if not files:
-                # If no valid files parsed, return original text
-                logger.warning("No valid files parsed, returning original content")
-                return text
-
-            # Convert to JSON format
-            result = json.dumps({"files": files})
-            logger.info(f"Successfully parsed {len(files)} files from delimiter format")
-
-            return result
+            parser = DelimiterStreamParser()
+            parser.feed(text)
+            parser.close()
+            return parser.result()
 
         except Exception as e:
             logger.error(f"Failed to parse delimiter format: {e}")
@@ -75,7 +56,10 @@ class GeminiService:
     async def generate_html_stream(
         self,
         user_prompt: str,
-        chat_history: list[dict] = None
+        chat_history: list[dict] = None,
+        use_cache: bool = True,
+        code_digest: str = "",
+        edit_mode: bool = False
     ) -> AsyncGenerator[str, None]:
         """
         Generate code from user prompt with streaming support
@@ -83,40 +67,44 @@ class GeminiService:
         Args:
             user_prompt: User's description of what to build
             chat_history: Optional chat history for context (corrections)
+            use_cache: Serve an identical earlier response from the cache if one exists
+            code_digest: Optional summary of the current files (corrections)
+            edit_mode: Ask only for changed, added or deleted files
 
         Yields:
             Chunks of JSON content as they are generated
         """
         try:
-            # Build the prompt
-            if chat_history and len(chat_history) > 0:
-                # This is a correction request
-                history_str = self._format_chat_history(chat_history)
-                full_prompt = build_correction_prompt(history_str, user_prompt)
-            else:
-                # This is a new generation
-                full_prompt = user_prompt
+            full_prompt, context_str = self._build_prompt(
+                user_prompt, chat_history, code_digest, edit_mode
+            )
+            cache_key = self._cache_key(context_str, user_prompt)
 
-            logger.info(f"Starting generation with prompt: {user_prompt[:100]}...")
+            cached = await self._cached_response(cache_key, use_cache)
+            if cached is not None:
+                logger.info(f"Replaying cached generation for prompt: {user_prompt[:100]}...")
+                for chunk in self._replay_chunks(cached):
+                    yield chunk
+                    # Let other streams run between replayed chunks
+                    await asyncio.sleep(0)
+                return
 
-            # Generate content with streaming
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                full_prompt,
-                stream=True
-            )
+            logger.info(f"Starting generation with prompt: {user_prompt[:100]}...")
 
-            # Accumulate response and parse delimiter format
-            full_response = ""
-            for chunk in response:
-                if chunk.text:
-                    full_response += chunk.text
-                    yield chunk.text
-                    # Small delay to prevent overwhelming the client
-                    await asyncio.sleep(0.01)
+            # The guard applies deadlines, retries, the breaker and rate limits
+            chunks = []
+            async for text in model_guard.stream(
+                lambda: self.provider.stream(full_prompt),
+                estimate_tokens(full_prompt)
+            ):
+                chunks.append(text)
+                yield text
 
             logger.info("Generation completed successfully")
 
+            if cache_key is not None:
+                await response_cache.set(cache_key, "".join(chunks))
+
         except Exception as e:
             logger.error(f"Gemini API error: {str(e)}")
             raise GeminiAPIException(f"Failed to generate code: {str(e)}")
@@ -124,7 +112,10 @@ class GeminiService:
     async def generate_html(
         self,
         user_prompt: str,
-        chat_history: list[dict] = None
+        chat_history: list[dict] = None,
+        use_cache: bool = True,
+        code_digest: str = "",
+        edit_mode: bool = False
     ) -> str:
         """
         Generate code from user prompt (non-streaming version)
@@ -132,29 +123,36 @@ class GeminiService:
         Args:
             user_prompt: User's description of what to build
             chat_history: Optional chat history for context (corrections)
+            use_cache: Serve an identical earlier response from the cache if one exists
+            code_digest: Optional summary of the current files (corrections)
+            edit_mode: Ask only for changed, added or deleted files
 
         Returns:
             Complete JSON content with file structure
         """
         try:
-            # Build the prompt
-            if chat_history and len(chat_history) > 0:
-                history_str = self._format_chat_history(chat_history)
-                full_prompt = build_correction_prompt(history_str, user_prompt)
-            else:
-                full_prompt = user_prompt
+            full_prompt, context_str = self._build_prompt(
+                user_prompt, chat_history, code_digest, edit_mode
+            )
+            cache_key = self._cache_key(context_str, user_prompt)
+
+            cached = await self._cached_response(cache_key, use_cache)
+            if cached is not None:
+                logger.info(f"Serving cached generation for prompt: {user_prompt[:100]}...")
+                return self._parse_delimiter_format(cached)
 
             logger.info(f"Starting non-streaming generation: {user_prompt[:100]}...")
 
             # Generate content without streaming
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                full_prompt
+            raw_content = await model_guard.call(
+                lambda: self.provider.generate(full_prompt),
+                estimate_tokens(full_prompt)
             )
-
-            raw_content = response.text
             logger.info(f"Generation completed. Length: {len(raw_content)} chars")
 
+            if cache_key is not None:
+                await response_cache.set(cache_key, raw_content)
+
             # Parse delimiter format to JSON
             parsed_content = self._parse_delimiter_format(raw_content)
 
@@ -164,6 +162,54 @@ class GeminiService:
             logger.error(f"Gemini API error: {str(e)}")
             raise GeminiAPIException(f"Failed to generate code: {str(e)}")
 
+    def _build_prompt(
+        self,
+        user_prompt: str,
+        chat_history: list[dict] = None,
+        code_digest: str = "",
+        edit_mode: bool = False
+    ) -> tuple[str, str]:
+        """Build the full prompt; returns it with the formatted context ("" for new generations)"""
+        if edit_mode:
+            # Correction that returns only the files it changes
+            history_str = self._format_chat_history(chat_history or [])
+            full_prompt = build_edit_prompt(history_str, user_prompt, code_digest)
+            return full_prompt, f"edit\n{code_digest}\n\n{history_str}"
+        if chat_history or code_digest:
+            # This is a correction request
+            history_str = self._format_chat_history(chat_history or [])
+            full_prompt = build_correction_prompt(history_str, user_prompt, code_digest)
+            return full_prompt, f"{code_digest}\n\n{history_str}"
+        # This is a new generation
+        return user_prompt, ""
+
+    def _cache_key(self, context_str: str, user_prompt: str) -> Optional[str]:
+        """Response cache key for a prompt, or None when caching is disabled"""
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return None
+        return ResponseCache.make_key(
+            self.provider.identity,
+            self.generation_config,
+            SYSTEM_PROMPT_VERSION,
+            context_str,
+            user_prompt
+        )
+
+    async def _cached_response(self, cache_key: Optional[str], use_cache: bool) -> Optional[str]:
+        if cache_key is None:
+            return None
+        if not use_cache:
+            response_cache.record_bypass()
+            return None
+        return await response_cache.get(cache_key)
+
+    @staticmethod
+    def _replay_chunks(content: str) -> Iterator[str]:
+        """Split cached output into chunks the size of a typical model chunk"""
+        size = settings.RESPONSE_CACHE_REPLAY_CHUNK_SIZE
+        for start in range(0, len(content), size):
+            yield content[start:start + size]
+
     def _format_chat_history(self, chat_history: list[dict]) -> str:
         """Format chat history for context"""
         formatted = []
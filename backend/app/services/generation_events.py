@@ -0,0 +1,259 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+import logging
+
+from app.core.config import settings
+from app.services.event_broker import EventBroker, LocalEventBroker, create_event_broker
+
+logger = logging.getLogger(__name__)
+
+# Event types after which a generation stream is finished
+TERMINAL_EVENTS = {"complete", "error", "cancelled"}
+
+
+@dataclass(frozen=True, order=True)
+class EventId:
+    """
+    Position of an event in a generation's stream
+
+    Sequence numbers restart when a reclaimed job is retried, so the attempt is
+    part of the ID. Serialized as ``"<attempt>.<seq>"`` in the SSE ``id:`` field.
+    """
+    attempt: int
+    seq: int
+
+    def __str__(self) -> str:
+        return f"{self.attempt}.{self.seq}"
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Optional["EventId"]:
+        """Parse a Last-Event-ID header; returns None when missing or malformed"""
+        if not value:
+            return None
+        try:
+            attempt, seq = value.strip().split(".", 1)
+            return cls(int(attempt), int(seq))
+        except ValueError:
+            return None
+
+
+NumberedEvent = Tuple[EventId, dict]
+
+
+class ReplayBuffer:
+    """Bounded in-memory history of one generation attempt's events"""
+
+    def __init__(self, attempt: int, maxsize: int, spill: bool = True):
+        self.attempt = attempt
+        self.seq = 0
+        self.events: Deque[NumberedEvent] = deque()
+        self.maxsize = maxsize
+        self.spill = spill
+        self.spilled: List[NumberedEvent] = []  # Evicted, waiting to be written to the DB
+
+    def append(self, event: dict) -> EventId:
+        """Number and buffer a new event"""
+        event_id = EventId(self.attempt, self.seq + 1)
+        self.add(event_id, event)
+        return event_id
+
+    def add(self, event_id: EventId, event: dict) -> None:
+        """Buffer an event that already has its position"""
+        self.seq = event_id.seq
+        self.events.append((event_id, event))
+        if len(self.events) > self.maxsize:
+            evicted = self.events.popleft()
+            if self.spill:
+                self.spilled.append(evicted)
+
+    def since(self, after: Optional[EventId] = None) -> List[NumberedEvent]:
+        """
+        Buffered events after a position (all of them when after is None)
+
+        Evicted events not yet persisted are included, so nothing is missed
+        while a spill is in flight.
+        """
+        events = self.spilled + list(self.events)
+        if after is None or after.attempt != self.attempt:
+            return events
+        return [(event_id, event) for event_id, event in events if event_id.seq > after.seq]
+
+    def drop_spilled(self, count: int) -> None:
+        """Forget the first ``count`` evicted events once they are persisted"""
+        del self.spilled[:count]
+
+
+class SubscriptionLagged(Exception):
+    """Raised to a subscriber that was dropped for falling too far behind"""
+    pass
+
+
+class Subscription:
+    """
+    A single listener attached to one generation's progress events
+
+    Each subscriber has its own bounded queue. A subscriber that lets it fill up
+    is dropped from live delivery instead of slowing down the producer; it then
+    gets ``SubscriptionLagged`` after draining what it has, and can catch up from
+    the replay buffer at its own pace.
+    """
+
+    def __init__(self, hub: "GenerationEventHub", generation_id: str):
+        self.hub = hub
+        self.generation_id = generation_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.SSE_SUBSCRIBER_QUEUE_SIZE)
+        self.lagged = False
+
+    async def events(self, timeout: Optional[float] = None) -> AsyncIterator[Optional[NumberedEvent]]:
+        """
+        Yield numbered events until the generation finishes; detaches on exit
+
+        With a timeout, ``None`` is yielded whenever no event arrived in time so
+        callers can send keep-alives or re-check the generation's state.
+        """
+        try:
+            while True:
+                if self.lagged and self.queue.empty():
+                    raise SubscriptionLagged(self.generation_id)
+                try:
+                    # Not wait_for, which can swallow the viewer's cancellation on 3.11
+                    async with asyncio.timeout(timeout):
+                        item = await self.queue.get()
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield item
+                if item[1].get("type") in TERMINAL_EVENTS:
+                    break
+        finally:
+            self.close()
+
+    def deliver(self, item: NumberedEvent) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            logger.warning(f"Dropping slow subscriber of generation {self.generation_id}")
+            self.lagged = True
+            self.close()
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class GenerationEventHub:
+    """
+    Pub/sub of generation progress, keyed by generation ID
+
+    Any number of subscribers can attach to one in-flight generation. Events of
+    generations running in this process are numbered and kept in a bounded
+    replay buffer; events falling out of the buffer are persisted by the
+    producer, so a dropped client can resume from any position with
+    Last-Event-ID. The configured broker forwards events to other worker
+    processes, which keep a mirror buffer of them for their own subscribers.
+
+    The hub also notes when the last local subscriber of a buffered generation
+    leaves, so the worker can stop a generation nobody is watching anymore.
+    """
+
+    def __init__(self, broker: Optional[EventBroker] = None):
+        self.broker = broker or LocalEventBroker()
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._buffers: Dict[str, ReplayBuffer] = {}
+        self._unwatched_since: Dict[str, float] = {}
+
+    async def start(self) -> None:
+        await self.broker.start(self._deliver_remote)
+
+    async def stop(self) -> None:
+        await self.broker.stop()
+
+    def subscribe(self, generation_id: str) -> Subscription:
+        """Attach a new listener; subscribe before reading history to miss nothing"""
+        subscription = Subscription(self, str(generation_id))
+        self._subscribers[subscription.generation_id].add(subscription)
+        self._unwatched_since.pop(subscription.generation_id, None)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.generation_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.generation_id]
+            if subscription.generation_id in self._buffers:
+                self._unwatched_since[subscription.generation_id] = time.monotonic()
+
+    def subscriber_count(self, generation_id: str) -> int:
+        return len(self._subscribers.get(str(generation_id), ()))
+
+    def has_subscribers(self, generation_id: str) -> bool:
+        return self.subscriber_count(generation_id) > 0
+
+    @property
+    def sees_all_viewers(self) -> bool:
+        """Whether every viewer subscribes here (no broker to other processes)"""
+        return isinstance(self.broker, LocalEventBroker)
+
+    def unwatched_for(self, generation_id: str) -> Optional[float]:
+        """
+        Seconds since the last subscriber of a running generation left
+
+        None while someone is subscribed, or when nobody has subscribed yet
+        (a job reclaimed from a dead process keeps running for later viewers).
+        """
+        since = self._unwatched_since.get(str(generation_id))
+        if since is None or self.has_subscribers(generation_id):
+            return None
+        return time.monotonic() - since
+
+    def begin(self, generation_id: str, attempt: int) -> None:
+        """Start a fresh replay buffer for a job attempt running in this process"""
+        self._buffers[str(generation_id)] = ReplayBuffer(attempt, settings.SSE_REPLAY_BUFFER_SIZE)
+
+    def end(self, generation_id: str) -> None:
+        """Drop the replay buffer once the generation's final state is persisted"""
+        self._buffers.pop(str(generation_id), None)
+        self._unwatched_since.pop(str(generation_id), None)
+
+    def get_buffer(self, generation_id: str) -> Optional[ReplayBuffer]:
+        return self._buffers.get(str(generation_id))
+
+    def publish(self, generation_id: str, event: dict) -> EventId:
+        """Number, buffer and deliver an event produced in this process"""
+        generation_id = str(generation_id)
+        buffer = self._buffers.get(generation_id)
+        if buffer is None:
+            buffer = self._buffers[generation_id] = ReplayBuffer(1, settings.SSE_REPLAY_BUFFER_SIZE)
+
+        event_id = buffer.append(event)
+        self._fan_out(generation_id, (event_id, event))
+        self.broker.publish(generation_id, event_id.attempt, event_id.seq, event)
+        return event_id
+
+    def _deliver_remote(self, generation_id: str, attempt: int, seq: int, event: dict) -> None:
+        """Mirror an event produced by another process"""
+        buffer = self._buffers.get(generation_id)
+        if buffer is None or buffer.attempt != attempt:
+            # Mirrors are never spilled; the producing process persists its own evictions
+            buffer = self._buffers[generation_id] = ReplayBuffer(
+                attempt, settings.SSE_REPLAY_BUFFER_SIZE, spill=False
+            )
+
+        event_id = EventId(attempt, seq)
+        buffer.add(event_id, event)
+        self._fan_out(generation_id, (event_id, event))
+
+        if event.get("type") in TERMINAL_EVENTS:
+            self.end(generation_id)
+
+    def _fan_out(self, generation_id: str, item: NumberedEvent) -> None:
+        for subscription in list(self._subscribers.get(generation_id, ())):
+            subscription.deliver(item)
+
+
+# Create a singleton instance
+generation_event_hub = GenerationEventHub(create_event_broker())
@@ -0,0 +1,135 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, or_, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from uuid import UUID
+from typing import Optional
+import hashlib
+
+from app.core.config import settings
+from app.models import Generation, GenerationRequest, GenerationStatus, MessageRole
+from app.services.chat_service import ChatService
+
+
+class GenerationRequestService:
+    """Service for single-flight deduplication of generate requests"""
+
+    @staticmethod
+    async def make_key(
+        db: AsyncSession,
+        project_id: UUID,
+        user_prompt: str,
+        idempotency_key: Optional[str] = None
+    ) -> tuple[str, int]:
+        """
+        Build the dedup key for a request and how long it stays valid
+
+        With an Idempotency-Key the key is scoped to the project and kept for
+        GENERATION_IDEMPOTENCY_TTL_SECONDS. Otherwise requests coalesce for
+        GENERATION_DEDUP_WINDOW_SECONDS when they carry the same prompt on top
+        of the same conversation, identified by its latest assistant reply.
+        """
+        if idempotency_key:
+            material = f"idempotency:{project_id}:{idempotency_key}"
+            ttl = settings.GENERATION_IDEMPOTENCY_TTL_SECONDS
+        else:
+            base_message_id = await ChatService.get_latest_message_id(
+                db, project_id, role=MessageRole.ASSISTANT
+            )
+            material = f"fingerprint:{project_id}:{base_message_id}:{user_prompt}"
+            ttl = settings.GENERATION_DEDUP_WINDOW_SECONDS
+        return hashlib.sha256(material.encode("utf-8")).hexdigest(), ttl
+
+    @staticmethod
+    def hash_request(
+        project_id: UUID,
+        user_prompt: str,
+        bypass_cache: bool,
+        full_regeneration: bool
+    ) -> str:
+        """Hash of a generate request body, to tell a retry from a reused key"""
+        material = f"{project_id}:{int(bypass_cache)}:{int(full_regeneration)}:{user_prompt}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    async def try_claim(
+        db: AsyncSession,
+        key: str,
+        project_id: UUID,
+        ttl_seconds: int,
+        request_hash: Optional[str] = None
+    ) -> bool:
+        """
+        Take the lock row for a key; returns False if a live request holds it
+
+        The insert runs in a savepoint so a duplicate leaves the surrounding
+        transaction usable. A racing insert blocks until the holder's
+        transaction finishes.
+        """
+        now = datetime.utcnow()
+        await db.execute(
+            delete(GenerationRequest).where(
+                GenerationRequest.key == key,
+                GenerationRequest.expires_at < now
+            )
+        )
+        try:
+            async with db.begin_nested():
+                db.add(GenerationRequest(
+                    key=key,
+                    project_id=str(project_id),
+                    request_hash=request_hash,
+                    expires_at=now + timedelta(seconds=ttl_seconds)
+                ))
+        except IntegrityError:
+            return False
+        return True
+
+    @staticmethod
+    async def attach_generation(
+        db: AsyncSession,
+        key: str,
+        generation_id: UUID
+    ) -> None:
+        """Record which generation a claimed request produced"""
+        await db.execute(
+            update(GenerationRequest)
+            .where(GenerationRequest.key == key)
+            .values(generation_id=str(generation_id))
+        )
+
+    @staticmethod
+    async def get_claim(
+        db: AsyncSession,
+        key: str
+    ) -> Optional[GenerationRequest]:
+        """Get the lock row of the request holding a key"""
+        result = await db.execute(
+            select(GenerationRequest).where(GenerationRequest.key == key)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def release(
+        db: AsyncSession,
+        generation_id: UUID
+    ) -> None:
+        """Drop the lock rows of a generation that failed or was cancelled"""
+        await db.execute(
+            delete(GenerationRequest).where(GenerationRequest.generation_id == str(generation_id))
+        )
+
+    @staticmethod
+    async def purge_expired(db: AsyncSession) -> int:
+        """Delete lock rows past their window, and those of generations that did not complete"""
+        # Correlated, so each of the few live lock rows costs a primary key lookup
+        unfinished = select(Generation.id).where(
+            Generation.id == GenerationRequest.generation_id,
+            Generation.status.in_([GenerationStatus.FAILED, GenerationStatus.CANCELLED])
+        ).exists()
+        result = await db.execute(
+            delete(GenerationRequest).where(
+                or_(GenerationRequest.expires_at < datetime.utcnow(), unfinished)
+            )
+        )
+        return result.rowcount
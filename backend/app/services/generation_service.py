@@ -1,12 +1,37 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, func
+from sqlalchemy import select, desc
 from uuid import UUID
-from typing import List, Optional
+from sqlalchemy.orm import defer
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import hashlib
 
-from app.models import Generation, GenerationStatus, ChatMessage, MessageRole
-from app.schemas import GenerationCreate
-from app.core.exceptions import raise_not_found
+from app.models import Generation, GenerationStatus, ChatMessage, JobStatus, MessageRole
+from app.schemas import GenerationCreate, GenerationResponse
+from app.core.exceptions import raise_conflict, raise_not_found
 from app.services.project_service import ProjectService
+from app.services.entity_cache import entity_cache
+from app.services.event_log_service import EventLogService
+from app.services.file_store_service import FileStoreService
+from app.services.generation_request_service import GenerationRequestService
+from app.services.job_service import JobService
+from app.db import request_scope
+from app.db.types import encode_text_async
+from app.utils.code_digest import parse_file_set
+from app.utils.http import gzip_body, make_etag
+from app.utils.pagination import after_cursor
+
+# Characters of output shown in version listings
+PREVIEW_LENGTH = 200
+
+
+@dataclass
+class GenerationRepresentation:
+    """Serialized GenerationResponse and its strong entity tag"""
+    etag: str
+    body: bytes
+    # Completed generations never change
+    immutable: bool
 
 
 class GenerationService:
@@ -19,23 +44,22 @@ class GenerationService:
         html_content: Optional[str] = None,
         status: GenerationStatus = GenerationStatus.GENERATING
     ) -> Generation:
-        """Create a new generation"""
-        # Get the current max version for this project
-        result = await db.execute(
-            select(func.max(Generation.version))
-            .where(Generation.project_id == str(project_id))
-        )
-        max_version = result.scalar() or 0
+        """Create a new generation with the project's next version number"""
+        version = await ProjectService.allocate_version(db, project_id)
 
         generation = Generation(
             project_id=str(project_id),
-            html_content=html_content,
             status=status,
-            version=max_version + 1
+            version=version
         )
         db.add(generation)
         await db.flush()
+        await ProjectService.record_generation_created(db, generation)
+        if html_content is not None:
+            await GenerationService._store_content(db, generation, html_content)
+            await db.flush()
         await db.refresh(generation)
+        request_scope.remember("generation", generation.id)
         return generation
 
     @staticmethod
@@ -47,7 +71,10 @@ class GenerationService:
         result = await db.execute(
             select(Generation).where(Generation.id == str(generation_id))
         )
-        return result.scalar_one_or_none()
+        generation = result.scalar_one_or_none()
+        if generation is not None:
+            request_scope.remember("generation", generation.id)
+        return generation
 
     @staticmethod
     async def get_generation_or_404(
@@ -60,36 +87,149 @@ class GenerationService:
             raise_not_found("Generation", str(generation_id))
         return generation
 
+    @staticmethod
+    async def ensure_generation_exists(
+        db: AsyncSession,
+        generation_id: UUID
+    ) -> None:
+        """Raise 404 unless the generation exists, querying at most once per request"""
+        if request_scope.is_known("generation", generation_id):
+            return
+        result = await db.execute(
+            select(Generation.id).where(Generation.id == str(generation_id))
+        )
+        if result.scalar_one_or_none() is None:
+            raise_not_found("Generation", str(generation_id))
+        request_scope.remember("generation", generation_id)
+
+    @staticmethod
+    async def _cache_key(generation_id: UUID) -> str:
+        # Deleting a project bumps the namespace, dropping its generations too
+        namespace = await entity_cache.namespace("generations")
+        return f"generation:{namespace}:{generation_id}"
+
+    @staticmethod
+    async def get_generation_body(
+        db: AsyncSession,
+        generation_id: UUID
+    ) -> GenerationRepresentation:
+        """
+        Serialized GenerationResponse, content included, read through the entity cache
+
+        Completed generations never change, so they are cached until deleted;
+        generations still in progress are always read from the database. A
+        cached body is only served after a primary key lookup confirms the
+        generation still exists: a deletion in another process cannot reach
+        this process's cache.
+        """
+        key = await GenerationService._cache_key(generation_id)
+        cached = await entity_cache.get(key)
+        if cached is not None:
+            await GenerationService.ensure_generation_exists(db, generation_id)
+            # Stored as "<etag>\n<body>"
+            etag, body = cached.split(b"\n", 1)
+            return GenerationRepresentation(etag=etag.decode("ascii"), body=body, immutable=True)
+
+        generation = await GenerationService.get_generation_or_404(db, generation_id)
+        return await GenerationService._represent(db, generation, key)
+
+    @staticmethod
+    async def _represent(
+        db: AsyncSession,
+        generation: Generation,
+        key: str
+    ) -> GenerationRepresentation:
+        html_content = await FileStoreService.load_content(db, generation)
+        body = GenerationResponse.model_validate(generation).model_copy(
+            update={"html_content": html_content}
+        ).model_dump_json().encode("utf-8")
+        representation = GenerationRepresentation(
+            etag=make_etag(hashlib.sha256(body).hexdigest()),
+            body=body,
+            immutable=generation.status == GenerationStatus.COMPLETED
+        )
+        if representation.immutable:
+            await entity_cache.set_immutable(key, representation.etag.encode("ascii") + b"\n" + body)
+        return representation
+
+    @staticmethod
+    async def get_generation_gzip(
+        generation_id: UUID,
+        representation: GenerationRepresentation
+    ) -> bytes:
+        """The gzip variant of a representation, compressed once for completed generations"""
+        key = await GenerationService._cache_key(generation_id) + ":gzip"
+        if representation.immutable:
+            cached = await entity_cache.get(key)
+            if cached is not None:
+                return cached
+        compressed = await gzip_body(representation.body)
+        if representation.immutable:
+            await entity_cache.set_immutable(key, compressed)
+        return compressed
+
+    @staticmethod
+    async def prime_cache(
+        db: AsyncSession,
+        generation_id: UUID
+    ) -> None:
+        """Cache the serialized and gzip forms of a just-completed generation in this process"""
+        generation = await GenerationService.get_generation(db, generation_id)
+        if generation is None or generation.status != GenerationStatus.COMPLETED:
+            return
+        key = await GenerationService._cache_key(generation_id)
+        representation = await GenerationService._represent(db, generation, key)
+        await GenerationService.get_generation_gzip(generation_id, representation)
+
     @staticmethod
     async def list_generations(
         db: AsyncSession,
         project_id: UUID,
         skip: int = 0,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[str] = None
     ) -> List[Generation]:
-        """List all generations for a project"""
+        """List all generations for a project, newest first, by offset or cursor"""
         # Verify project exists
-        await ProjectService.get_project_or_404(db, project_id)
+        await ProjectService.ensure_project_exists(db, project_id)
 
+        # Listings use the summary columns; the content itself is never loaded
+        query = after_cursor(
+            select(Generation), Generation.created_at, Generation.id, cursor, descending=True
+        )
         result = await db.execute(
-            select(Generation)
+            query
+            .options(defer(Generation.html_content, raiseload=True))
             .where(Generation.project_id == str(project_id))
-            .order_by(desc(Generation.created_at))
-            .offset(skip)
+            .order_by(desc(Generation.created_at), desc(Generation.id))
+            .offset(0 if cursor else skip)
             .limit(limit)
         )
         return list(result.scalars().all())
 
     @staticmethod
-    async def get_latest_generation(
+    async def count_generations(
         db: AsyncSession,
         project_id: UUID
+    ) -> int:
+        """Number of generations of a project, from its denormalized counter"""
+        project = await ProjectService.get_project_or_404(db, project_id)
+        return project.generation_count
+
+    @staticmethod
+    async def get_latest_generation(
+        db: AsyncSession,
+        project_id: UUID,
+        status: Optional[GenerationStatus] = None
     ) -> Optional[Generation]:
-        """Get the latest generation for a project"""
+        """Get the latest generation for a project, optionally with a given status"""
+        query = select(Generation).where(Generation.project_id == str(project_id))
+        if status is not None:
+            query = query.where(Generation.status == status)
+        # By version, not created_at: timestamps can tie or go backwards, versions are unique
         result = await db.execute(
-            select(Generation)
-            .where(Generation.project_id == str(project_id))
-            .order_by(desc(Generation.created_at))
+            query
+            .order_by(desc(Generation.version))
             .limit(1)
         )
         return result.scalar_one_or_none()
@@ -105,14 +245,74 @@ class GenerationService:
         generation = await GenerationService.get_generation_or_404(db, generation_id)
 
         if html_content is not None:
-            generation.html_content = html_content
+            await GenerationService._store_content(db, generation, html_content)
         if status is not None:
             generation.status = status
 
         await db.flush()
         await db.refresh(generation)
+        key = await GenerationService._cache_key(generation.id)
+        await entity_cache.invalidate(db, keys=[key, key + ":gzip"])
         return generation
 
+    @staticmethod
+    async def cancel_generation(
+        db: AsyncSession,
+        generation_id: UUID
+    ) -> Tuple[Generation, Optional[JobStatus]]:
+        """
+        Mark an unfinished generation and its job CANCELLED
+
+        Returns the generation with the status its job had before (None if it
+        had no job, or was already cancelled). Cancelling twice is harmless;
+        cancelling a finished generation raises 409.
+        """
+        # Lock the job first: a worker completing it at the same moment waits,
+        # then finds it no longer owns the job
+        previous = await JobService.cancel_job(db, generation_id)
+        generation = await GenerationService.get_generation_or_404(db, generation_id)
+        if generation.status == GenerationStatus.CANCELLED:
+            return generation, previous
+        if generation.status != GenerationStatus.GENERATING:
+            raise_conflict(f"Generation with id {generation_id} has already finished")
+
+        generation = await GenerationService.update_generation(
+            db, generation_id, status=GenerationStatus.CANCELLED
+        )
+        await EventLogService.delete_events(db, generation_id)
+        await GenerationRequestService.release(db, generation_id)
+        return generation, previous
+
+    @staticmethod
+    async def _store_content(
+        db: AsyncSession,
+        generation: Generation,
+        html_content: str
+    ) -> None:
+        """Keep multi-file output in the file store and raw HTML on the row"""
+        files = parse_file_set(html_content)
+        if files is None:
+            generation.html_content = await encode_text_async(html_content)
+            GenerationService.summarize_html(generation, html_content)
+            return
+        manifest = await FileStoreService.store_files(db, generation.id, files)
+        generation.html_content = None
+        GenerationService.summarize_manifest(generation, [(entry.path, entry.size) for entry in manifest])
+
+    @staticmethod
+    def summarize_html(generation: Generation, html_content: str) -> None:
+        """Set the list summary of a raw HTML generation"""
+        generation.preview = html_content[:PREVIEW_LENGTH]
+        generation.content_size = len(html_content.encode("utf-8"))
+        generation.file_count = 1
+
+    @staticmethod
+    def summarize_manifest(generation: Generation, entries: List[Tuple[str, int]]) -> None:
+        """Set the list summary of a multi-file generation from (path, size) pairs"""
+        generation.preview = ", ".join(sorted(path for path, _ in entries))[:PREVIEW_LENGTH] or None
+        generation.content_size = sum(size for _, size in entries)
+        generation.file_count = len(entries)
+
     @staticmethod
     async def delete_generation(
         db: AsyncSession,
@@ -122,3 +322,7 @@ class GenerationService:
         generation = await GenerationService.get_generation_or_404(db, generation_id)
         await db.delete(generation)
         await db.flush()
+        request_scope.forget("generation", generation.id)
+        key = await GenerationService._cache_key(generation.id)
+        await entity_cache.invalidate(db, keys=[key, key + ":gzip"])
+        await ProjectService.record_generation_deleted(db, generation)
@@ -0,0 +1,144 @@
+from uuid import UUID
+from typing import AsyncIterator, Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.db.database import session_scope
+from app.models import GenerationStatus
+from app.services.event_log_service import EventLogService
+from app.services.file_store_service import FileStoreService
+from app.services.generation_events import (
+    EventId,
+    SubscriptionLagged,
+    TERMINAL_EVENTS,
+    generation_event_hub,
+)
+from app.services.generation_service import GenerationService
+from app.services.job_service import JobService
+
+logger = logging.getLogger(__name__)
+
+# An event to send, with its stream position when it has one; None means keep-alive
+StreamItem = Optional[Tuple[Optional[EventId], dict]]
+
+
+class GenerationStreamService:
+    """Service for (re)attaching clients to a generation's event stream"""
+
+    @staticmethod
+    def _final_events(generation, html_content: Optional[str]) -> list:
+        """Events describing a finished generation, sent instead of a replay"""
+        generation_id = str(generation.id)
+        if generation.status == GenerationStatus.COMPLETED:
+            return [
+                (None, {
+                    "type": "snapshot",
+                    "generation_id": generation_id,
+                    "html_content": html_content,
+                }),
+                (None, {"type": "complete", "generation_id": generation_id}),
+            ]
+        if generation.status == GenerationStatus.CANCELLED:
+            return [(None, {"type": "cancelled", "generation_id": generation_id})]
+        return [(None, {"type": "error", "message": "Generation failed"})]
+
+    @staticmethod
+    async def resume(
+        generation_id: UUID,
+        last_event_id: Optional[str] = None
+    ) -> AsyncIterator[StreamItem]:
+        """
+        Stream a generation's events starting after ``last_event_id``
+
+        Finished generations are answered immediately from their stored output
+        with a single ``snapshot`` event. For running generations, missed events
+        are replayed from the database spill and the in-memory buffer before
+        switching to live delivery. When the requested position belongs to an
+        earlier attempt of a retried job, a ``reset`` event tells the client to
+        discard what it has and the new attempt is replayed from the start.
+
+        Any number of viewers can follow the same generation. A viewer dropped
+        from live delivery for reading too slowly transparently catches up from
+        the replay history and re-attaches.
+        """
+        after = EventId.parse(last_event_id)
+        attempt = None
+        last_seq = 0
+
+        while True:
+            async with session_scope() as db:
+                generation = await GenerationService.get_generation_or_404(db, generation_id)
+                job = await JobService.get_job_for_generation(db, generation_id)
+                html_content = None
+                if generation.status == GenerationStatus.COMPLETED:
+                    html_content = await FileStoreService.load_content(db, generation)
+            if generation.status != GenerationStatus.GENERATING:
+                for item in GenerationStreamService._final_events(generation, html_content):
+                    yield item
+                return
+
+            # Subscribe before reading history so nothing published meanwhile is lost
+            subscription = generation_event_hub.subscribe(generation_id)
+            try:
+                buffer = generation_event_hub.get_buffer(generation_id)
+                if buffer is not None:
+                    attempt = buffer.attempt
+                elif attempt is None:
+                    attempt = job.attempts if job else 0
+
+                if after is not None and after.attempt != attempt:
+                    yield None, {"type": "reset"}
+                    after = None
+                last_seq = after.seq if after else 0
+
+                buffered = buffer.since(after) if buffer is not None else []
+                first_buffered = buffered[0][0].seq if buffered else None
+
+                if attempt and (first_buffered is None or first_buffered > last_seq + 1):
+                    async with session_scope() as db:
+                        spilled = await EventLogService.list_events(
+                            db, generation_id, attempt, after_seq=last_seq, before_seq=first_buffered
+                        )
+                    for event_id, event in spilled:
+                        last_seq = event_id.seq
+                        yield event_id, event
+
+                for event_id, event in buffered:
+                    if event_id.seq > last_seq:
+                        last_seq = event_id.seq
+                        yield event_id, event
+                        if event.get("type") in TERMINAL_EVENTS:
+                            return
+
+                finished = False
+                async for item in subscription.events(timeout=settings.SSE_KEEPALIVE_SECONDS):
+                    if item is None:
+                        # Nothing live here (job queued or running elsewhere); check if it finished
+                        async with session_scope() as db:
+                            generation = await GenerationService.get_generation_or_404(db, generation_id)
+                        if generation.status != GenerationStatus.GENERATING:
+                            finished = True
+                            break
+                        yield None
+                        continue
+
+                    event_id, event = item
+                    if event_id.attempt == attempt and event_id.seq <= last_seq:
+                        continue
+                    if event_id.attempt != attempt:
+                        # A retry started after we attached
+                        if last_seq:
+                            yield None, {"type": "reset"}
+                        attempt = event_id.attempt
+                    last_seq = event_id.seq
+                    yield event_id, event
+                if not finished:
+                    return
+                # Finished out of sight; the top of the loop sends its final events
+
+            except SubscriptionLagged:
+                # Dropped from live delivery for reading too slowly; catch up from history
+                logger.info(f"Subscriber of generation {generation_id} lagged at {attempt}.{last_seq}")
+                after = EventId(attempt, last_seq) if attempt else None
+            finally:
+                subscription.close()
@@ -0,0 +1,400 @@
+import asyncio
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import logging
+
+from app.core.config import settings
+from app.db.database import session_scope
+from app.models import GenerationStatus, JobStatus, MessageRole
+from app.services.chat_service import ChatService
+from app.services.event_log_service import EventLogService
+from app.services.file_store_service import FileStoreService
+from app.services.gemini_service import gemini_service
+from app.services.generation_events import generation_event_hub
+from app.services.generation_request_service import GenerationRequestService
+from app.services.generation_service import GenerationService
+from app.services.job_service import JobService
+from app.services.project_service import ProjectService
+from app.services.response_cache import ResponseCache
+from app.utils.code_digest import parse_file_set
+from app.utils.delimiter_parser import DelimiterStreamParser
+from app.utils.streaming import coalesce_chunks
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationWorkerPool:
+    """
+    Bounded pool of workers executing queued generation jobs
+
+    Jobs enqueued by this process are handed over directly through ``notify`` and
+    claimed immediately; jobs left behind by other processes (crash, restart) are
+    picked up by polling once they have waited longer than the claim grace period.
+    The number of workers caps concurrent model calls per process.
+
+    A running generation's model stream is stopped when it is cancelled, when
+    its lease is lost, or when every viewer has left and none came back within
+    the disconnect grace period; the model call and its thread are released at
+    once instead of running to completion for nobody.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local_jobs: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        # Model streams running here, and why the ones being stopped were stopped
+        self._streams: Dict[str, asyncio.Task] = {}
+        self._stop_reasons: Dict[str, str] = {}
+
+    async def start(self) -> None:
+        """Start worker and reaper tasks"""
+        if self._tasks:
+            return
+        self._local_jobs = asyncio.Queue()
+        for index in range(settings.GENERATION_WORKERS):
+            self._tasks.append(asyncio.create_task(self._worker_loop(), name=f"generation-worker-{index}"))
+        self._tasks.append(asyncio.create_task(self._reaper_loop(), name="generation-reaper"))
+        logger.info(f"Started {settings.GENERATION_WORKERS} generation workers ({self.worker_id})")
+
+    async def stop(self) -> None:
+        """Stop all workers and hand their in-flight jobs back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        async with session_scope() as db:
+            released = await JobService.release_jobs(db, self.worker_id)
+        if released:
+            logger.info(f"Released {released} in-flight generation jobs")
+
+    def notify(self, job_id: str) -> None:
+        """Hand a freshly enqueued job to a local worker"""
+        self._local_jobs.put_nowait(str(job_id))
+
+    def cancel(self, generation_id: str, reason: str) -> bool:
+        """Stop the model stream of a generation running here; False if there is none"""
+        stream = self._streams.get(str(generation_id))
+        if stream is None or stream.done():
+            return False
+        self._stop_reasons.setdefault(str(generation_id), reason)
+        stream.cancel()
+        return True
+
+    async def _worker_loop(self) -> None:
+        while True:
+            try:
+                job_id = await self._next_local_job()
+                async with session_scope() as db:
+                    if job_id is not None:
+                        job = await JobService.claim_job(
+                            db, self.worker_id, settings.GENERATION_JOB_LEASE_SECONDS, job_id=job_id
+                        )
+                    else:
+                        grace = timedelta(seconds=settings.GENERATION_JOB_CLAIM_GRACE_SECONDS)
+                        job = await JobService.claim_job(
+                            db,
+                            self.worker_id,
+                            settings.GENERATION_JOB_LEASE_SECONDS,
+                            queued_before=datetime.utcnow() - grace
+                        )
+                if job is not None:
+                    await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Generation worker error: {e}")
+                await asyncio.sleep(settings.GENERATION_JOB_POLL_SECONDS)
+
+    async def _next_local_job(self) -> Optional[str]:
+        """Wait for a locally enqueued job, or time out to poll for orphaned ones"""
+        try:
+            # Not wait_for: on Python 3.11 it can swallow the cancellation of stop()
+            # when a job arrives at the same moment, and the worker never exits
+            async with asyncio.timeout(settings.GENERATION_JOB_POLL_SECONDS):
+                return await self._local_jobs.get()
+        except asyncio.TimeoutError:
+            return None
+
+    async def _heartbeat_loop(self, job_id: str, generation_id: str) -> None:
+        while True:
+            await asyncio.sleep(settings.GENERATION_JOB_HEARTBEAT_SECONDS)
+            async with session_scope() as db:
+                held = await JobService.heartbeat(
+                    db, job_id, self.worker_id, settings.GENERATION_JOB_LEASE_SECONDS
+                )
+            if not held:
+                # Cancelled through another process, or reclaimed: the result would be discarded
+                logger.warning(f"Lost lease on generation job {job_id}")
+                self.cancel(generation_id, "Lease lost")
+                return
+
+    async def _watch_viewers(self, generation_id: str) -> None:
+        """Stop a generation once nobody has been watching it for the grace period"""
+        grace = settings.GENERATION_DISCONNECT_GRACE_SECONDS
+        while True:
+            await asyncio.sleep(min(max(grace / 2, 0.05), 1.0))
+            unwatched = generation_event_hub.unwatched_for(generation_id)
+            if unwatched is not None and unwatched >= grace:
+                logger.info(f"Stopping generation {generation_id}: no viewer for {unwatched:.1f}s")
+                self.cancel(generation_id, "All viewers disconnected")
+                return
+
+    async def _run_job(self, job) -> None:
+        """Execute one claimed job, publishing progress to subscribers"""
+        generation_id = job.generation_id
+        heartbeat = asyncio.create_task(self._heartbeat_loop(job.id, generation_id))
+        watcher = None
+        if settings.GENERATION_CANCEL_ON_DISCONNECT and generation_event_hub.sees_all_viewers:
+            # Viewers attached to other processes are invisible here
+            watcher = asyncio.create_task(self._watch_viewers(generation_id))
+        generation_event_hub.begin(generation_id, job.attempts)
+
+        def publish(event: dict) -> None:
+            generation_event_hub.publish(generation_id, event)
+
+        async def spill() -> None:
+            buffer = generation_event_hub.get_buffer(generation_id)
+            if buffer is not None and len(buffer.spilled) >= settings.SSE_SPILL_BATCH_SIZE:
+                batch = list(buffer.spilled)
+                async with session_scope() as db:
+                    await EventLogService.spill_events(db, generation_id, batch)
+                buffer.drop_spilled(len(batch))
+
+        parser = DelimiterStreamParser()
+
+        async def stream_output() -> None:
+            model_chunks = gemini_service.generate_html_stream(
+                job.user_prompt,
+                json.loads(job.chat_history or "[]"),
+                use_cache=not job.bypass_cache,
+                code_digest=job.code_digest or "",
+                edit_mode=job.base_generation_id is not None
+            )
+            async for chunk in coalesce_chunks(
+                model_chunks, settings.SSE_COALESCE_SECONDS, settings.SSE_COALESCE_MAX_CHARS
+            ):
+                publish({"type": "chunk", "content": chunk})
+                for event in parser.feed(chunk):
+                    publish(event)
+                await spill()
+
+        try:
+            async with session_scope() as db:
+                # Events of an earlier attempt can no longer be resumed
+                await EventLogService.delete_events(db, generation_id)
+
+            # A task of its own, so cancel() stops the model call and nothing else
+            stream = self._streams[generation_id] = asyncio.create_task(stream_output())
+            try:
+                await stream
+            except asyncio.CancelledError:
+                reason = self._stop_reasons.pop(generation_id, None)
+                if reason is None or asyncio.current_task().cancelling():
+                    # Shutdown of this worker, even if a stop was also requested
+                    raise
+                await self._finish_stopped(job, reason, publish)
+                return
+            finally:
+                self._streams.pop(generation_id, None)
+
+            for event in parser.close():
+                publish(event)
+
+            async with session_scope() as db:
+                owned = await JobService.get_owned_job(db, job.id, self.worker_id)
+                if owned is None:
+                    logger.warning(f"Discarding result of generation job {job.id}: lease lost")
+                    publish(await self._lost_job_event(db, job))
+                    return
+
+                # Parsed {"files": ...} JSON, or the raw output if it had no file markers
+                html_content = parser.result()
+                summary = "HTML generated successfully"
+                edited = job.base_generation_id is not None and parser.has_changes
+                if edited:
+                    html_content = await self._merge_edit(db, job.base_generation_id, parser)
+                    summary = self._edit_summary(parser)
+
+                await GenerationService.update_generation(
+                    db,
+                    generation_id,
+                    html_content=html_content,
+                    status=GenerationStatus.COMPLETED
+                )
+
+                # Save assistant message
+                await ChatService.create_message(
+                    db,
+                    project_id=job.project_id,
+                    role=MessageRole.ASSISTANT,
+                    content=summary,
+                    generation_id=generation_id
+                )
+                await JobService.finish_job(db, owned, JobStatus.COMPLETED)
+
+                # Completed generations are replayed from their stored output
+                await EventLogService.delete_events(db, generation_id)
+
+            try:
+                # Serialize and compress the version once, before clients ask for it
+                async with session_scope() as db:
+                    await GenerationService.prime_cache(db, generation_id)
+            except Exception as e:
+                logger.warning(f"Could not prime the cache for generation {generation_id}: {e}")
+
+            if edited:
+                # The stream only carried the changed files; hand out the merged version
+                publish({"type": "snapshot", "html_content": html_content})
+            publish({"type": "complete", "generation_id": generation_id})
+
+        except asyncio.CancelledError:
+            # Shutdown: the lease is released by stop() and the job requeued
+            raise
+
+        except Exception as e:
+            logger.error(f"Generation job {job.id} failed: {e}")
+            async with session_scope() as db:
+                owned = await JobService.get_owned_job(db, job.id, self.worker_id)
+                if owned is not None:
+                    await JobService.finish_job(db, owned, JobStatus.FAILED, error=str(e))
+                    await self._record_failure(db, generation_id)
+
+            publish({"type": "error", "message": str(e)})
+
+        finally:
+            heartbeat.cancel()
+            if watcher is not None:
+                watcher.cancel()
+            self._stop_reasons.pop(generation_id, None)
+            generation_event_hub.end(generation_id)
+
+    async def _finish_stopped(self, job, reason: str, publish) -> None:
+        """Record a generation whose model stream was stopped, and tell its viewers"""
+        generation_id = job.generation_id
+        logger.info(f"Generation job {job.id} stopped: {reason}")
+        async with session_scope() as db:
+            owned = await JobService.get_owned_job(db, job.id, self.worker_id)
+            if owned is None:
+                # Cancelled by request (already recorded) or taken over by another worker
+                event = await self._lost_job_event(db, job)
+            else:
+                await GenerationService.update_generation(
+                    db,
+                    generation_id,
+                    status=GenerationStatus.CANCELLED
+                )
+                await JobService.finish_job(db, owned, JobStatus.CANCELLED, error=reason)
+                await EventLogService.delete_events(db, generation_id)
+                await GenerationRequestService.release(db, generation_id)
+                event = {"type": "cancelled", "generation_id": generation_id}
+        publish(event)
+
+    @staticmethod
+    async def _lost_job_event(db, job) -> dict:
+        """Final event for viewers of a job this worker no longer owns"""
+        current = await JobService.get_job_for_generation(db, job.generation_id)
+        if current is not None and current.status == JobStatus.CANCELLED:
+            return {"type": "cancelled", "generation_id": job.generation_id}
+        return {"type": "error", "message": "Generation was taken over by another worker"}
+
+    @staticmethod
+    async def _record_failure(db, generation_id: str) -> None:
+        """Mark a generation FAILED and clean up after it, whoever failed its job"""
+        await GenerationService.update_generation(db, generation_id, status=GenerationStatus.FAILED)
+        await EventLogService.delete_events(db, generation_id)
+        # A repeat of the request should start over, not follow this failure
+        await GenerationRequestService.release(db, generation_id)
+
+    def _announce_failure(self, generation_id: str, attempt: int, message: str) -> None:
+        """Tell viewers of a generation the reaper failed, unless it is running here"""
+        if generation_id in self._streams:
+            # The local job finds its lease lost and tells its own viewers
+            return
+        # A new attempt, so viewers of the dead one reset instead of skipping the event
+        generation_event_hub.begin(generation_id, attempt)
+        generation_event_hub.publish(generation_id, {"type": "error", "message": message})
+        generation_event_hub.end(generation_id)
+
+    async def _reap_jobs(self) -> None:
+        """Fail or requeue jobs whose worker died and fail stale generations; purge expired rows"""
+        async with session_scope() as db:
+            reclaimed = await JobService.reclaim_expired_jobs(db, settings.GENERATION_JOB_MAX_ATTEMPTS)
+            failed = [job for job in reclaimed if job.status == JobStatus.FAILED]
+            for job in failed:
+                await self._record_failure(db, job.generation_id)
+            orphaned = await JobService.find_orphaned_generations(
+                db,
+                datetime.utcnow() - timedelta(seconds=settings.GENERATION_STALE_SECONDS)
+            )
+            for generation_id in orphaned:
+                await self._record_failure(db, generation_id)
+            await GenerationRequestService.purge_expired(db)
+            await ResponseCache.purge_expired(db)
+
+        # Only once committed, so viewers polling on the event see the FAILED row
+        for job in failed:
+            self._announce_failure(job.generation_id, job.attempts + 1, job.error)
+        for generation_id in orphaned:
+            self._announce_failure(generation_id, 1, "Generation failed")
+        if reclaimed or orphaned:
+            logger.info(
+                f"Reclaimed {len(reclaimed)} expired jobs ({len(failed)} failed),"
+                f" failed {len(orphaned)} stale generations"
+            )
+
+    @staticmethod
+    async def _merge_edit(db, base_generation_id: str, parser: DelimiterStreamParser) -> str:
+        """Apply an edit-mode response to the version it was made against"""
+        base = await GenerationService.get_generation(db, base_generation_id)
+        base_files = None
+        if base is not None:
+            base_files = parse_file_set(await FileStoreService.load_content(db, base))
+        if base_files is None:
+            raise RuntimeError("The version being edited is no longer available")
+        return parser.merge_into(base_files)
+
+    @staticmethod
+    def _edit_summary(parser: DelimiterStreamParser) -> str:
+        parts = []
+        if parser.files:
+            parts.append("Updated " + ", ".join(sorted(parser.files)))
+        if parser.deleted:
+            parts.append("Deleted " + ", ".join(parser.deleted))
+        return "; ".join(parts)
+
+    async def _reaper_loop(self) -> None:
+        """Periodically reap abandoned jobs and expired rows, and finish project deletions"""
+        last_blob_gc = last_counter_repair = datetime.utcnow()
+        while True:
+            try:
+                repair_interval = timedelta(seconds=settings.PROJECT_COUNTER_REPAIR_SECONDS)
+                if datetime.utcnow() - last_counter_repair > repair_interval:
+                    last_counter_repair = datetime.utcnow()
+                    await ProjectService.repair_all_counters()
+
+                if datetime.utcnow() - last_blob_gc > timedelta(seconds=settings.FILE_BLOB_GC_SECONDS):
+                    last_blob_gc = datetime.utcnow()
+                    async with session_scope() as db:
+                        purged = await FileStoreService.purge_unreferenced_blobs(
+                            db, last_blob_gc - timedelta(seconds=settings.FILE_BLOB_GC_SECONDS)
+                        )
+                    if purged:
+                        logger.info(f"Purged {purged} unreferenced file blobs")
+
+                await self._reap_jobs()
+
+                await ProjectService.purge_deleted_projects()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Generation reaper error: {e}")
+            await asyncio.sleep(settings.GENERATION_JOB_REAP_SECONDS)
+
+
+# Create a singleton instance
+generation_worker_pool = GenerationWorkerPool()
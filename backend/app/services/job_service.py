@@ -0,0 +1,236 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, and_
+from datetime import datetime, timedelta
+from uuid import UUID
+from typing import List, Optional
+import json
+
+from app.models import Generation, GenerationJob, GenerationStatus, JobStatus
+
+
+class JobService:
+    """Service for durable generation job operations"""
+
+    @staticmethod
+    async def create_job(
+        db: AsyncSession,
+        generation_id: UUID,
+        project_id: UUID,
+        user_prompt: str,
+        chat_history: Optional[List[dict]] = None,
+        code_digest: Optional[str] = None,
+        base_generation_id: Optional[UUID] = None,
+        bypass_cache: bool = False
+    ) -> GenerationJob:
+        """Enqueue a generation job"""
+        job = GenerationJob(
+            generation_id=str(generation_id),
+            project_id=str(project_id),
+            user_prompt=user_prompt,
+            chat_history=json.dumps(chat_history or []),
+            code_digest=code_digest or None,
+            base_generation_id=str(base_generation_id) if base_generation_id else None,
+            bypass_cache=bypass_cache,
+            status=JobStatus.QUEUED
+        )
+        db.add(job)
+        await db.flush()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    async def get_job_for_generation(
+        db: AsyncSession,
+        generation_id: UUID
+    ) -> Optional[GenerationJob]:
+        """Get the job executing a generation"""
+        result = await db.execute(
+            select(GenerationJob).where(GenerationJob.generation_id == str(generation_id))
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def claim_job(
+        db: AsyncSession,
+        worker_id: str,
+        lease_seconds: int,
+        job_id: Optional[str] = None,
+        queued_before: Optional[datetime] = None
+    ) -> Optional[GenerationJob]:
+        """
+        Claim a queued job and take a lease on it
+
+        Rows are locked with SKIP LOCKED so concurrent workers (in this or other
+        processes) never claim the same job.
+        """
+        query = select(GenerationJob).where(GenerationJob.status == JobStatus.QUEUED)
+        if job_id is not None:
+            query = query.where(GenerationJob.id == job_id)
+        if queued_before is not None:
+            query = query.where(GenerationJob.created_at <= queued_before)
+
+        result = await db.execute(
+            query
+            .order_by(GenerationJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = result.scalar_one_or_none()
+        if not job:
+            return None
+
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.lease_owner = worker_id
+        job.lease_expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        await db.flush()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    async def heartbeat(
+        db: AsyncSession,
+        job_id: str,
+        worker_id: str,
+        lease_seconds: int
+    ) -> bool:
+        """Extend a held lease; returns False if the lease was lost"""
+        result = await db.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.id == job_id,
+                GenerationJob.lease_owner == worker_id,
+                GenerationJob.status == JobStatus.RUNNING
+            )
+            .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        )
+        return result.rowcount > 0
+
+    @staticmethod
+    async def get_owned_job(
+        db: AsyncSession,
+        job_id: str,
+        worker_id: str
+    ) -> Optional[GenerationJob]:
+        """Lock a running job if it is still leased by this worker"""
+        result = await db.execute(
+            select(GenerationJob)
+            .where(
+                GenerationJob.id == job_id,
+                GenerationJob.lease_owner == worker_id,
+                GenerationJob.status == JobStatus.RUNNING
+            )
+            .with_for_update()
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def finish_job(
+        db: AsyncSession,
+        job: GenerationJob,
+        status: JobStatus,
+        error: Optional[str] = None
+    ) -> GenerationJob:
+        """Mark a job as finished and release its lease"""
+        job.status = status
+        job.error = error
+        job.lease_owner = None
+        job.lease_expires_at = None
+        await db.flush()
+        return job
+
+    @staticmethod
+    async def cancel_job(
+        db: AsyncSession,
+        generation_id: UUID
+    ) -> Optional[JobStatus]:
+        """
+        Cancel the unfinished job of a generation and release its lease
+
+        Returns the status the job had (QUEUED or RUNNING), or None when there
+        was nothing left to cancel. A worker running the job notices the lost
+        lease at its next heartbeat.
+        """
+        result = await db.execute(
+            select(GenerationJob)
+            .where(
+                GenerationJob.generation_id == str(generation_id),
+                GenerationJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+            )
+            .with_for_update()
+        )
+        job = result.scalar_one_or_none()
+        if job is None:
+            return None
+        previous = job.status
+        await JobService.finish_job(db, job, JobStatus.CANCELLED, error="Cancelled by request")
+        return previous
+
+    @staticmethod
+    async def release_jobs(
+        db: AsyncSession,
+        worker_id: str
+    ) -> int:
+        """Put every job leased by a worker back in the queue (graceful shutdown)"""
+        result = await db.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.lease_owner == worker_id,
+                GenerationJob.status == JobStatus.RUNNING
+            )
+            .values(status=JobStatus.QUEUED, lease_owner=None, lease_expires_at=None)
+        )
+        return result.rowcount
+
+    @staticmethod
+    async def reclaim_expired_jobs(
+        db: AsyncSession,
+        max_attempts: int
+    ) -> List[GenerationJob]:
+        """
+        Requeue running jobs whose lease expired, failing those out of attempts
+
+        Returns the jobs reclaimed; the caller records the failure of the
+        generations whose job is now FAILED.
+        """
+        now = datetime.utcnow()
+        result = await db.execute(
+            select(GenerationJob)
+            .where(
+                GenerationJob.status == JobStatus.RUNNING,
+                GenerationJob.lease_expires_at < now
+            )
+            .with_for_update(skip_locked=True)
+        )
+        jobs = list(result.scalars().all())
+
+        for job in jobs:
+            job.lease_owner = None
+            job.lease_expires_at = None
+            if job.attempts >= max_attempts:
+                job.status = JobStatus.FAILED
+                job.error = "Lease expired too many times"
+            else:
+                job.status = JobStatus.QUEUED
+
+        await db.flush()
+        return jobs
+
+    @staticmethod
+    async def find_orphaned_generations(
+        db: AsyncSession,
+        older_than: datetime
+    ) -> List[str]:
+        """IDs of GENERATING rows with no job behind them (e.g. from before the job queue)"""
+        result = await db.execute(
+            select(Generation.id)
+            .outerjoin(GenerationJob, GenerationJob.generation_id == Generation.id)
+            .where(
+                and_(
+                    Generation.status == GenerationStatus.GENERATING,
+                    Generation.created_at < older_than,
+                    GenerationJob.id.is_(None)
+                )
+            )
+        )
+        return list(result.scalars().all())
@@ -0,0 +1,445 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+import logging
+
+from google.api_core import exceptions as google_exceptions
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.exceptions import ModelTimeoutException, ModelUnavailableException
+from app.db.database import session_scope
+from app.models import RateLimitBucket
+from app.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Provider errors worth another attempt: overload, quota, transient server faults
+RETRYABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    ModelTimeoutException,
+    ConnectionError,
+)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed model call may succeed when repeated"""
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def retry_delay(retry: int) -> float:
+    """Backoff before retry number ``retry`` (0-based): exponential, full jitter"""
+    ceiling = min(settings.GEMINI_RETRY_MAX_SECONDS, settings.GEMINI_RETRY_BASE_SECONDS * 2 ** retry)
+    return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the model provider is down
+
+    After ``failure_threshold`` consecutive provider failures the breaker opens
+    and calls raise ModelUnavailableException without reaching the provider.
+    Once ``reset_seconds`` have passed a single probe call is let through: its
+    success closes the breaker, its failure keeps it open for another period.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._stats: Dict[str, int] = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        """Raise ModelUnavailableException unless a call may go ahead"""
+        if self._opened_at is None:
+            return
+        if not self._probing and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._probing = True
+            return
+        self._stats["rejected"] += 1
+        raise ModelUnavailableException("The model provider is unavailable, try again shortly")
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                self._stats["opened"] += 1
+                logger.warning(f"Model circuit breaker opened after {self._failures} failures")
+            # A failed probe keeps it open for another period
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self) -> None:
+        """End a call that neither succeeded nor failed (cancelled), freeing the probe slot"""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._failures, **self._stats}
+
+
+@dataclass
+class TokenBucket:
+    """Bucket refilled continuously to ``capacity`` over a minute; its level may go negative"""
+    capacity: float
+    level: float
+    updated_at: float
+
+    def refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated_at)
+        self.level = min(self.capacity, self.level + elapsed * self.capacity / 60.0)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` (at most the capacity) is available; 0 if it is now"""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60.0 / self.capacity)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits on model calls
+
+    A call reserves one request and its estimated prompt tokens before it
+    starts, waiting while either bucket is short, and is charged for its output
+    tokens once it ends. Output is only known afterwards, so it may drive the
+    token bucket below zero, which delays the calls that follow.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._stats: Dict[str, float] = {"acquired": 0, "waited": 0, "wait_seconds": 0.0}
+
+    def _limits(self, tokens: int) -> Dict[str, tuple]:
+        """Bucket name to (capacity, amount) for the limits that are enabled"""
+        limits = {}
+        if self.requests_per_minute > 0:
+            limits["requests"] = (self.requests_per_minute, 1)
+        if self.tokens_per_minute > 0:
+            limits["tokens"] = (self.tokens_per_minute, tokens)
+        return limits
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one request and ``tokens`` tokens can be taken, then take them"""
+        limits = self._limits(tokens)
+        started = time.monotonic()
+        waited = False
+        while limits:
+            wait = await self._try_take(limits)
+            if wait <= 0:
+                break
+            waited = True
+            await asyncio.sleep(wait)
+        self._stats["acquired"] += 1
+        if waited:
+            self._stats["waited"] += 1
+            self._stats["wait_seconds"] += time.monotonic() - started
+
+    async def charge(self, tokens: int) -> None:
+        """Take tokens used by a finished call, without waiting"""
+        if self.tokens_per_minute > 0 and tokens > 0:
+            await self._charge(tokens)
+
+    async def _try_take(self, limits: Dict[str, tuple]) -> float:
+        """Take every amount if all are available; otherwise the seconds to wait"""
+        return 0.0
+
+    async def _charge(self, tokens: int) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"limiter": type(self).__name__, **self._stats}
+
+
+class NullRateLimiter(RateLimiter):
+    """No limits"""
+
+    def __init__(self):
+        super().__init__(0, 0)
+
+
+class LocalRateLimiter(RateLimiter):
+    """Buckets held by this process; each process gets the full quota"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        now = time.monotonic()
+        self._buckets = {
+            name: TokenBucket(capacity, capacity, now)
+            for name, (capacity, _) in self._limits(0).items()
+        }
+        # Waiters are served in arrival order, so a large request is not starved
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        async with self._lock:
+            await super().acquire(tokens)
+
+    async def _try_take(self, limits: Dict[str, tuple]) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        for name, (_, amount) in limits.items():
+            self._buckets[name].refill(now)
+            wait = max(wait, self._buckets[name].wait_time(amount))
+        if wait <= 0:
+            for name, (_, amount) in limits.items():
+                self._buckets[name].level -= amount
+        return wait
+
+    async def _charge(self, tokens: int) -> None:
+        bucket = self._buckets["tokens"]
+        bucket.refill(time.monotonic())
+        bucket.level -= tokens
+
+
+class DatabaseRateLimiter(RateLimiter):
+    """
+    Buckets stored in the ``rate_limit_buckets`` table, shared by every process
+
+    Each attempt locks the bucket rows, refills them from their timestamps and
+    takes what it needs in one short transaction. Waiters re-check at least
+    once a second, since other processes may take or charge tokens meanwhile.
+    If the database cannot be reached the call goes ahead unlimited.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, prefix: str):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self.prefix = prefix
+
+    async def _locked_buckets(self, db, limits: Dict[str, tuple], now: float) -> Dict[str, RateLimitBucket]:
+        names = {name: f"{self.prefix}:{name}" for name in limits}
+        result = await db.execute(
+            select(RateLimitBucket)
+            .where(RateLimitBucket.name.in_(list(names.values())))
+            .with_for_update()
+        )
+        rows = {row.name: row for row in result.scalars().all()}
+        buckets = {}
+        for name, (capacity, _) in limits.items():
+            row = rows.get(names[name])
+            if row is None:
+                row = RateLimitBucket(name=names[name], level=capacity, updated_at=now)
+                db.add(row)
+            buckets[name] = row
+        return buckets
+
+    async def _try_take(self, limits: Dict[str, tuple]) -> float:
+        try:
+            async with session_scope() as db:
+                now = time.time()
+                rows = await self._locked_buckets(db, limits, now)
+                buckets = {
+                    name: TokenBucket(limits[name][0], row.level, row.updated_at)
+                    for name, row in rows.items()
+                }
+                wait = 0.0
+                for name, bucket in buckets.items():
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(limits[name][1]))
+                if wait > 0:
+                    return min(wait, 1.0)
+                for name, bucket in buckets.items():
+                    rows[name].level = bucket.level - limits[name][1]
+                    rows[name].updated_at = bucket.updated_at
+            return 0.0
+        except IntegrityError:
+            # Another process created the bucket first; its row is there now
+            return 0.01
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, calling the model unlimited: {e}")
+            return 0.0
+
+    async def _charge(self, tokens: int) -> None:
+        limits = {"tokens": (self.tokens_per_minute, tokens)}
+        try:
+            async with session_scope() as db:
+                now = time.time()
+                row = (await self._locked_buckets(db, limits, now))["tokens"]
+                bucket = TokenBucket(self.tokens_per_minute, row.level, row.updated_at)
+                bucket.refill(now)
+                row.level = bucket.level - tokens
+                row.updated_at = now
+        except Exception as e:
+            logger.warning(f"Could not charge {tokens} tokens to the rate limiter: {e}")
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Limiter selected by GEMINI_RATE_LIMITER"""
+    requests, tokens = settings.GEMINI_REQUESTS_PER_MINUTE, settings.GEMINI_TOKENS_PER_MINUTE
+    if settings.GEMINI_RATE_LIMITER == "none":
+        return NullRateLimiter()
+    if settings.GEMINI_RATE_LIMITER == "database":
+        return DatabaseRateLimiter(requests, tokens, prefix=f"gemini:{settings.GEMINI_MODEL}")
+    if settings.GEMINI_RATE_LIMITER != "local":
+        logger.warning(f"Unknown GEMINI_RATE_LIMITER '{settings.GEMINI_RATE_LIMITER}', using local limits")
+    return LocalRateLimiter(requests, tokens)
+
+
+async def _next_chunk(chunks: AsyncIterator[str]) -> str:
+    return await chunks.__anext__()
+
+
+class ModelCallGuard:
+    """
+    Deadlines, retries, circuit breaking and rate limiting around model calls
+
+    A call that fails with a retryable error is repeated with jittered
+    exponential backoff, but only as long as nothing has been handed to the
+    caller: once a chunk of a stream is out, a failure is final.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, limiter: RateLimiter):
+        self.breaker = breaker
+        self.limiter = limiter
+        self._stats: Dict[str, int] = {"calls": 0, "retries": 0, "timeouts": 0, "failures": 0}
+
+    async def stream(
+        self,
+        open_stream: Callable[[], AsyncIterator[str]],
+        prompt_tokens: int
+    ) -> AsyncIterator[str]:
+        """
+        Yield the chunks of a streamed call, opening a fresh stream per attempt
+
+        The first chunk must arrive within GEMINI_FIRST_CHUNK_TIMEOUT_SECONDS,
+        each later one within GEMINI_IDLE_TIMEOUT_SECONDS, and the whole stream
+        within GEMINI_CALL_TIMEOUT_SECONDS.
+        """
+        self._stats["calls"] += 1
+        retry = 0
+        while True:
+            self.breaker.before_call()
+            await self.limiter.acquire(prompt_tokens)
+            deadline = time.monotonic() + settings.GEMINI_CALL_TIMEOUT_SECONDS
+            chunks = open_stream()
+            output_tokens = 0
+            started = completed = False
+            error = None
+            try:
+                while True:
+                    timeout = (
+                        settings.GEMINI_IDLE_TIMEOUT_SECONDS if started
+                        else settings.GEMINI_FIRST_CHUNK_TIMEOUT_SECONDS
+                    )
+                    remaining = deadline - time.monotonic()
+                    try:
+                        # Not wait_for: on 3.11 it can return a chunk and drop a
+                        # cancellation that arrives with it, and the stream runs on
+                        async with asyncio.timeout(min(timeout, remaining)):
+                            chunk = await _next_chunk(chunks)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        self._stats["timeouts"] += 1
+                        if remaining <= timeout:
+                            raise ModelTimeoutException("The model did not finish in time")
+                        raise ModelTimeoutException(
+                            f"No {'next' if started else 'first'} chunk from the model in time"
+                        )
+                    started = True
+                    output_tokens += estimate_tokens(chunk)
+                    yield chunk
+                completed = True
+            except Exception as e:
+                error = e
+            finally:
+                if not completed and error is None:
+                    # Stopped by the caller: the call says nothing about the provider
+                    self.breaker.release()
+                # Release the failed stream (and its thread) before any backoff
+                aclose = getattr(chunks, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+                await self.limiter.charge(output_tokens)
+
+            if error is None:
+                self.breaker.record_success()
+                return
+            if not await self._should_retry(error, retry, started):
+                raise error
+            retry += 1
+
+    async def call(
+        self,
+        make_call: Callable[[], Awaitable[str]],
+        prompt_tokens: int
+    ) -> str:
+        """Run a non-streamed call, retried on retryable errors within its deadline"""
+        self._stats["calls"] += 1
+        retry = 0
+        while True:
+            self.breaker.before_call()
+            await self.limiter.acquire(prompt_tokens)
+            try:
+                try:
+                    async with asyncio.timeout(settings.GEMINI_CALL_TIMEOUT_SECONDS):
+                        text = await make_call()
+                except asyncio.TimeoutError:
+                    self._stats["timeouts"] += 1
+                    raise ModelTimeoutException("No response from the model in time")
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not await self._should_retry(e, retry, started=False):
+                    raise
+                retry += 1
+                continue
+            self.breaker.record_success()
+            await self.limiter.charge(estimate_tokens(text))
+            return text
+
+    async def _should_retry(self, error: Exception, retry: int, started: bool) -> bool:
+        """Record a failed attempt; sleeps the backoff and returns True if it should be repeated"""
+        retryable = is_retryable(error)
+        if retryable:
+            # Only provider-side trouble counts towards opening the breaker
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+        if (
+            not retryable
+            or started
+            or retry >= settings.GEMINI_MAX_RETRIES
+            # The breaker just opened: report the provider's error rather than our rejection
+            or self.breaker.state == "open"
+        ):
+            self._stats["failures"] += 1
+            return False
+        delay = retry_delay(retry)
+        self._stats["retries"] += 1
+        logger.warning(f"Model call failed ({error}), retry {retry + 1} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+        return True
+
+    def stats(self) -> dict:
+        return {**self._stats, "breaker": self.breaker.stats(), "rate_limiter": self.limiter.stats()}
+
+
+# Create a singleton instance
+model_guard = ModelCallGuard(
+    CircuitBreaker(settings.GEMINI_BREAKER_FAILURES, settings.GEMINI_BREAKER_RESET_SECONDS),
+    create_rate_limiter()
+)
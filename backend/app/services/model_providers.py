@@ -0,0 +1,400 @@
+import asyncio
+import hashlib
+import html
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+import logging
+
+import google.generativeai as genai
+import orjson
+
+from app.core.config import settings
+from app.core.exceptions import GeminiAPIException
+from app.utils.streaming import iterate_in_thread
+
+logger = logging.getLogger(__name__)
+
+
+class ModelProvider(ABC):
+    """
+    Source of model output for a fully built prompt
+
+    ``stream`` yields the response text in chunks as it is produced; ``generate``
+    returns it whole, by default by joining the stream. ``identity`` names what
+    determines the output (model and its settings) and is part of response
+    cache keys, so responses of different providers never answer for each other.
+    """
+
+    identity = "none"
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Response text in chunks, as an async generator"""
+
+    async def generate(self, prompt: str) -> str:
+        return "".join([chunk async for chunk in self.stream(prompt)])
+
+
+class GeminiProvider(ModelProvider):
+    """
+    Google Gemini through google.generativeai
+
+    The client is configured on first use rather than at import, so the
+    application starts, and other providers run, without an API key or network.
+    """
+
+    def __init__(self, model_name: str, system_instruction: str, generation_config: dict):
+        self.identity = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config
+        self._model = None
+        # Dedicated threads for blocking stream reads, so long generations never
+        # compete with (or exhaust) the event loop's default executor
+        self._stream_executor = ThreadPoolExecutor(
+            max_workers=settings.GEMINI_STREAM_WORKERS,
+            thread_name_prefix="gemini-stream"
+        )
+
+    @property
+    def model(self):
+        if self._model is None:
+            if not settings.GEMINI_API_KEY:
+                raise GeminiAPIException("GEMINI_API_KEY is not set")
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            self._model = genai.GenerativeModel(
+                model_name=self.identity,
+                system_instruction=self.system_instruction,
+                generation_config=self.generation_config
+            )
+            logger.info(f"Initialized Gemini model: {self.identity}")
+        return self._model
+
+    @model.setter
+    def model(self, model) -> None:
+        self._model = model
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        # Both the request and the chunk reads run in a worker thread; the
+        # bounded queue applies backpressure when the client reads slowly
+        call = _StreamCall(self.model, prompt)
+        async with aclosing(iterate_in_thread(
+            call.texts,
+            maxsize=settings.GEMINI_STREAM_QUEUE_SIZE,
+            executor=self._stream_executor,
+            on_stop=call.cancel
+        )) as texts:
+            async for text in texts:
+                yield text
+
+    async def generate(self, prompt: str) -> str:
+        model = self.model
+        response = await asyncio.to_thread(
+            model.generate_content,
+            prompt,
+            request_options={"timeout": settings.GEMINI_CALL_TIMEOUT_SECONDS}
+        )
+        return response.text
+
+
+class _StreamCall:
+    """
+    One streamed Gemini request, read in a worker thread and stoppable from the loop
+
+    A stopped consumer must not leave the thread blocked in a chunk read, holding
+    one of the GEMINI_STREAM_WORKERS threads until the model finishes: ``cancel``
+    aborts the response's underlying stream, which ends the read at once.
+    """
+
+    def __init__(self, model, prompt: str):
+        self.model = model
+        self.prompt = prompt
+        self.stopped = threading.Event()
+        self.response = None
+
+    def texts(self) -> Iterator[str]:
+        """Blocking iterator over the text of the streamed response"""
+        self.response = self.model.generate_content(
+            self.prompt,
+            stream=True,
+            request_options={"timeout": settings.GEMINI_CALL_TIMEOUT_SECONDS}
+        )
+        if self.stopped.is_set():
+            # Cancelled while the request was being made
+            self._abort()
+            return
+        for chunk in self.response:
+            if self.stopped.is_set():
+                return
+            if chunk.text:
+                yield chunk.text
+
+    def cancel(self) -> None:
+        self.stopped.set()
+        if self.response is not None:
+            self._abort()
+
+    def _abort(self) -> None:
+        # GenerateContentResponse has no public way to stop; the api_core stream
+        # it reads (gRPC or REST) can be cancelled from any thread
+        cancel = getattr(getattr(self.response, "_iterator", None), "cancel", None)
+        if cancel is not None:
+            try:
+                cancel()
+            except Exception as e:
+                logger.debug(f"Cancelling a Gemini stream failed: {e}")
+
+
+_FAKE_WORDS = (
+    "alpha bravo canvas delta ember frame grid harbor index jade kernel lumen "
+    "matrix nova orbit pixel quartz raster signal tensor unity vector widget "
+    "xenon yield zenith"
+).split()
+
+
+class FakeProvider(ModelProvider):
+    """
+    Deterministic offline model for development, CI and load tests
+
+    The same prompt always gets the same multi-file response of about
+    ``output_chars`` characters, in the ===FILE: path=== format the real model
+    is asked for. The first chunk arrives after ``latency`` seconds and the
+    rest at ``chars_per_second`` (0: as fast as the consumer reads), in chunks
+    of ``chunk_chars``.
+    """
+
+    def __init__(self, latency: float, chars_per_second: float, chunk_chars: int, output_chars: int):
+        self.latency = latency
+        self.chars_per_second = chars_per_second
+        self.chunk_chars = max(1, chunk_chars)
+        self.output_chars = output_chars
+        self.identity = f"fake:{output_chars}"
+
+    def respond(self, prompt: str) -> str:
+        """The response to a prompt"""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        rng = random.Random(digest)
+        title = html.escape(" ".join(prompt.split()[:8]) or "Untitled")
+        paragraphs: List[str] = []
+        size = 0
+        while size < self.output_chars:
+            paragraph = f"    <p>{' '.join(rng.choice(_FAKE_WORDS) for _ in range(rng.randint(8, 24)))}.</p>"
+            paragraphs.append(paragraph)
+            size += len(paragraph) + 1
+        body = "\n".join(paragraphs)
+        return (
+            "===FILE: index.html===\n"
+            "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n"
+            "  <meta charset=\"UTF-8\">\n"
+            f"  <title>{title}</title>\n"
+            "  <link rel=\"stylesheet\" href=\"styles.css\">\n"
+            "</head>\n<body>\n  <main>\n"
+            f"    <h1>{title}</h1>\n{body}\n"
+            f"  </main>\n  <footer>{digest[:12]}</footer>\n</body>\n</html>\n"
+            "===END FILE===\n"
+            "===FILE: styles.css===\n"
+            f"body {{ font-family: system-ui, sans-serif; margin: 0 auto; max-width: 48rem; color: #{digest[:6]}; }}\n"
+            "===END FILE==="
+        )
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        text = self.respond(prompt)
+        loop = asyncio.get_running_loop()
+        start = loop.time() + self.latency
+        await asyncio.sleep(self.latency)
+        for offset in range(0, len(text), self.chunk_chars):
+            chunk = text[offset:offset + self.chunk_chars]
+            if self.chars_per_second > 0:
+                await asyncio.sleep(max(0.0, start + offset / self.chars_per_second - loop.time()))
+            else:
+                await asyncio.sleep(0)
+            yield chunk
+
+    async def generate(self, prompt: str) -> str:
+        text = self.respond(prompt)
+        duration = len(text) / self.chars_per_second if self.chars_per_second > 0 else 0.0
+        await asyncio.sleep(self.latency + duration)
+        return text
+
+
+class RecordingStore:
+    """
+    Recorded model sessions, one JSON file per prompt in a directory
+
+    A session holds the prompt, the provider that answered it, and its chunks
+    with their offsets in seconds from the start of the call.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._sessions: Dict[str, dict] = {}
+        self._index: Optional[List[str]] = None
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    async def save(self, prompt: str, identity: str, chunks: List[list]) -> None:
+        key = self.key(prompt)
+        session = {
+            "prompt": prompt,
+            "provider": identity,
+            "recorded_at": datetime.utcnow().isoformat(),
+            "chunks": chunks,
+        }
+        data = orjson.dumps(session, option=orjson.OPT_INDENT_2)
+
+        def write() -> None:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written aside and renamed, so a replaying process never reads half a file
+            temporary = self._path(key) + ".tmp"
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, self._path(key))
+
+        await asyncio.to_thread(write)
+        self._sessions[key] = session
+        self._index = None
+
+    async def load(self, prompt: str, match_any: bool = False) -> Optional[dict]:
+        """
+        The session recorded for a prompt
+
+        With ``match_any``, a prompt never recorded gets one of the recorded
+        sessions instead, always the same one for the same prompt.
+        """
+        key = self.key(prompt)
+        session = await self._read(key)
+        if session is None and match_any:
+            index = await self._keys()
+            if index:
+                session = await self._read(index[int(key, 16) % len(index)])
+        return session
+
+    async def _read(self, key: str) -> Optional[dict]:
+        session = self._sessions.get(key)
+        if session is not None:
+            return session
+
+        def read() -> Optional[bytes]:
+            try:
+                with open(self._path(key), "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                return None
+
+        data = await asyncio.to_thread(read)
+        if data is None:
+            return None
+        session = self._sessions[key] = orjson.loads(data)
+        return session
+
+    async def _keys(self) -> List[str]:
+        if self._index is None:
+            def scan() -> List[str]:
+                if not os.path.isdir(self.directory):
+                    return []
+                return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+            self._index = await asyncio.to_thread(scan)
+        return self._index
+
+
+class RecordingProvider(ModelProvider):
+    """Pass calls to another provider and record every completed session"""
+
+    def __init__(self, inner: ModelProvider, store: RecordingStore):
+        self.inner = inner
+        self.store = store
+        self.identity = inner.identity
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        chunks = []
+        async for text in self.inner.stream(prompt):
+            chunks.append([round(loop.time() - start, 4), text])
+            yield text
+        await self._save(prompt, chunks)
+
+    async def generate(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        text = await self.inner.generate(prompt)
+        await self._save(prompt, [[round(loop.time() - start, 4), text]])
+        return text
+
+    async def _save(self, prompt: str, chunks: List[list]) -> None:
+        try:
+            await self.store.save(prompt, self.identity, chunks)
+        except OSError as e:
+            # A recording must never fail the generation it records
+            logger.warning(f"Could not record model session: {e}")
+
+
+class ReplayProvider(ModelProvider):
+    """
+    Answer from recorded sessions with their original timing
+
+    ``speed`` scales the timing (2.0 replays twice as fast, 0 without any
+    delay). Prompts without a recording fail, unless ``match_any`` lets them
+    borrow another session, which suits load tests with varied prompts.
+    """
+
+    def __init__(self, store: RecordingStore, speed: float, match_any: bool):
+        self.store = store
+        self.speed = speed
+        self.match_any = match_any
+        self.identity = f"replay:{os.path.abspath(store.directory)}"
+
+    async def _session(self, prompt: str) -> dict:
+        session = await self.store.load(prompt, self.match_any)
+        if session is None:
+            raise GeminiAPIException(f"No recorded model session for this prompt in {self.store.directory}")
+        return session
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        session = await self._session(prompt)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for offset, text in session["chunks"]:
+            delay = start + offset / self.speed - loop.time() if self.speed > 0 else 0.0
+            await asyncio.sleep(max(0.0, delay))
+            yield text
+
+    async def generate(self, prompt: str) -> str:
+        session = await self._session(prompt)
+        if self.speed > 0 and session["chunks"]:
+            await asyncio.sleep(session["chunks"][-1][0] / self.speed)
+        return "".join(text for _, text in session["chunks"])
+
+
+def create_model_provider(system_instruction: str, generation_config: dict) -> ModelProvider:
+    """Provider selected by MODEL_PROVIDER"""
+    if settings.MODEL_PROVIDER == "fake":
+        return FakeProvider(
+            settings.FAKE_MODEL_LATENCY_SECONDS,
+            settings.FAKE_MODEL_CHARS_PER_SECOND,
+            settings.FAKE_MODEL_CHUNK_CHARS,
+            settings.FAKE_MODEL_OUTPUT_CHARS
+        )
+    if settings.MODEL_PROVIDER == "replay":
+        return ReplayProvider(
+            RecordingStore(settings.MODEL_RECORDINGS_DIR),
+            settings.MODEL_REPLAY_SPEED,
+            match_any=settings.MODEL_REPLAY_MATCH == "any"
+        )
+    gemini = GeminiProvider(settings.GEMINI_MODEL, system_instruction, generation_config)
+    if settings.MODEL_PROVIDER == "record":
+        return RecordingProvider(gemini, RecordingStore(settings.MODEL_RECORDINGS_DIR))
+    if settings.MODEL_PROVIDER != "gemini":
+        logger.warning(f"Unknown MODEL_PROVIDER '{settings.MODEL_PROVIDER}', using Gemini")
+    return gemini
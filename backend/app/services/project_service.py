@@ -1,11 +1,23 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, func, desc, update, delete, case
+from datetime import datetime
 from uuid import UUID
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
+from pydantic import TypeAdapter
+import logging
 
-from app.models import Project, Generation
+from app.models import Project, Generation, ChatMessage
 from app.schemas import ProjectCreate, ProjectUpdate, ProjectResponse, ProjectWithGenerations
+from app.core.config import settings
 from app.core.exceptions import raise_not_found
+from app.db import request_scope
+from app.db.database import session_scope
+from app.services.entity_cache import entity_cache
+from app.utils.pagination import after_cursor, next_cursor, total_count_cache
+
+logger = logging.getLogger(__name__)
+
+_project_list_adapter = TypeAdapter(List[ProjectWithGenerations])
 
 
 class ProjectService:
@@ -24,6 +36,9 @@ class ProjectService:
         db.add(project)
         await db.flush()
         await db.refresh(project)
+        request_scope.remember("project", project.id)
+        total_count_cache.invalidate("projects")
+        await entity_cache.invalidate(db, namespaces=["projects"])
         return project
 
     @staticmethod
@@ -33,9 +48,12 @@ class ProjectService:
     ) -> Optional[Project]:
         """Get a project by ID"""
         result = await db.execute(
-            select(Project).where(Project.id == str(project_id))
+            select(Project).where(Project.id == str(project_id), Project.deleted_at.is_(None))
         )
-        return result.scalar_one_or_none()
+        project = result.scalar_one_or_none()
+        if project is not None:
+            request_scope.remember("project", project.id)
+        return project
 
     @staticmethod
     async def get_project_or_404(
@@ -48,17 +66,56 @@ class ProjectService:
             raise_not_found("Project", str(project_id))
         return project
 
+    @staticmethod
+    async def ensure_project_exists(
+        db: AsyncSession,
+        project_id: UUID
+    ) -> None:
+        """Raise 404 unless the project exists, querying at most once per request"""
+        if request_scope.is_known("project", project_id):
+            return
+        result = await db.execute(
+            select(Project.id).where(Project.id == str(project_id), Project.deleted_at.is_(None))
+        )
+        if result.scalar_one_or_none() is None:
+            raise_not_found("Project", str(project_id))
+        request_scope.remember("project", project_id)
+
+    @staticmethod
+    async def get_project_body(
+        db: AsyncSession,
+        project_id: UUID
+    ) -> bytes:
+        """Serialized ProjectResponse of a project, read through the entity cache"""
+        key = f"project:{project_id}"
+        body = await entity_cache.get(key)
+        if body is not None:
+            request_scope.remember("project", project_id)
+            return body
+        project = await ProjectService.get_project_or_404(db, project_id)
+        body = ProjectResponse.model_validate(project).model_dump_json().encode("utf-8")
+        await entity_cache.set(key, body)
+        return body
+
     @staticmethod
     async def list_projects(
         db: AsyncSession,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
     ) -> List[Project]:
-        """List all projects with pagination"""
+        """List all projects, most recently updated first, by offset or cursor"""
+        query = after_cursor(
+            select(Project).where(Project.deleted_at.is_(None)),
+            Project.updated_at,
+            Project.id,
+            cursor,
+            descending=True
+        )
         result = await db.execute(
-            select(Project)
-            .order_by(desc(Project.updated_at))
-            .offset(skip)
+            query
+            .order_by(desc(Project.updated_at), desc(Project.id))
+            .offset(0 if cursor else skip)
             .limit(limit)
         )
         return list(result.scalars().all())
@@ -67,35 +124,198 @@ class ProjectService:
     async def list_projects_with_counts(
         db: AsyncSession,
         skip: int = 0,
-        limit: int = 100
-    ) -> List[dict]:
-        """List projects with generation counts"""
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> List[Project]:
+        """List projects with their generation counters, by offset or cursor"""
+        # The counters are columns of the project row, so this is a plain index scan
+        return await ProjectService.list_projects(db, skip, limit, cursor)
+
+    @staticmethod
+    async def list_projects_body(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        """
+        Serialized page of the project list and the next page's cursor
+
+        Read through the entity cache; any project or counter change starts a
+        new "projects" namespace, so every cached page is dropped at once.
+        """
+        namespace = await entity_cache.namespace("projects")
+        key = f"projects:{namespace}:{skip}:{limit}:{cursor or ''}"
+        cached = await entity_cache.get(key)
+        if cached is not None:
+            # Stored as "<next cursor>\n<body>"; cursors never contain a newline
+            page_cursor, body = cached.split(b"\n", 1)
+            return body, page_cursor.decode("ascii") or None
+
+        projects = await ProjectService.list_projects_with_counts(db, skip, limit, cursor)
+        body = _project_list_adapter.dump_json(
+            _project_list_adapter.validate_python(projects, from_attributes=True)
+        )
+        page_cursor = next_cursor(projects, limit, "updated_at")
+        await entity_cache.set(key, (page_cursor or "").encode("ascii") + b"\n" + body)
+        return body, page_cursor
+
+    @staticmethod
+    async def allocate_version(
+        db: AsyncSession,
+        project_id: UUID
+    ) -> int:
+        """
+        Hand out the next version number of a project
+
+        The increment locks the project row until the caller's transaction
+        ends, so concurrent generations of one project get distinct numbers
+        without scanning their history.
+        """
+        result = await db.execute(
+            update(Project)
+            .where(Project.id == str(project_id))
+            .values(version_counter=Project.version_counter + 1, updated_at=Project.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            raise_not_found("Project", str(project_id))
         result = await db.execute(
-            select(
-                Project,
-                func.count(Generation.id).label("generation_count")
+            select(Project.version_counter).where(Project.id == str(project_id))
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def record_generation_created(
+        db: AsyncSession,
+        generation: Generation
+    ) -> None:
+        """Count a new generation on its project, in the caller's transaction"""
+        await db.execute(
+            update(Project)
+            .where(Project.id == generation.project_id)
+            .values(
+                generation_count=Project.generation_count + 1,
+                latest_version=generation.version,
+                latest_generation_id=generation.id,
+                last_activity_at=generation.created_at,
+                # Counter maintenance is not a user edit of the project
+                updated_at=Project.updated_at
             )
-            .outerjoin(Generation)
-            .group_by(Project.id)
-            .order_by(desc(Project.updated_at))
-            .offset(skip)
-            .limit(limit)
         )
+        await entity_cache.invalidate(db, namespaces=["projects"])
 
-        projects_with_counts = []
-        for row in result:
-            project = row[0]
-            count = row[1]
-            projects_with_counts.append({
-                "id": project.id,
-                "name": project.name,
-                "description": project.description,
-                "created_at": project.created_at,
-                "updated_at": project.updated_at,
-                "generation_count": count
-            })
+    @staticmethod
+    async def record_generation_deleted(
+        db: AsyncSession,
+        generation: Generation
+    ) -> None:
+        """Uncount a deleted generation, moving "latest" back if it was the latest"""
+        await db.execute(
+            update(Project)
+            .where(Project.id == generation.project_id)
+            .values(
+                generation_count=case(
+                    (Project.generation_count > 0, Project.generation_count - 1),
+                    else_=0
+                ),
+                updated_at=Project.updated_at
+            )
+        )
+        project = await ProjectService.get_project(db, generation.project_id)
+        if project is not None and project.latest_generation_id == generation.id:
+            await ProjectService._refresh_latest(db, project.id)
+        await entity_cache.invalidate(db, namespaces=["projects"])
+
+    @staticmethod
+    async def _refresh_latest(db: AsyncSession, project_id: str) -> None:
+        """Point a project's latest_* counters at its highest remaining version"""
+        # By version, as get_latest_generation: timestamps can tie, versions are unique
+        result = await db.execute(
+            select(Generation.id, Generation.version, Generation.created_at)
+            .where(Generation.project_id == project_id)
+            .order_by(desc(Generation.version))
+            .limit(1)
+        )
+        latest = result.one_or_none()
+        await db.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(
+                latest_version=latest.version if latest else None,
+                latest_generation_id=latest.id if latest else None,
+                last_activity_at=latest.created_at if latest else None,
+                updated_at=Project.updated_at
+            )
+        )
+
+    @staticmethod
+    async def repair_counters(
+        db: AsyncSession,
+        after_id: str = "",
+        batch_size: int = 100
+    ) -> Optional[str]:
+        """
+        Recompute the generation counters of a batch of projects from scratch
+
+        Processes up to ``batch_size`` projects with IDs after ``after_id`` and
+        returns the last ID handled, or None when there are no more projects.
+        """
+        result = await db.execute(
+            select(Project.id)
+            .where(Project.id > after_id)
+            .order_by(Project.id)
+            .limit(batch_size)
+        )
+        project_ids = list(result.scalars().all())
+        if not project_ids:
+            return None
+
+        result = await db.execute(
+            select(Generation.project_id, func.count(Generation.id), func.max(Generation.version))
+            .where(Generation.project_id.in_(project_ids))
+            .group_by(Generation.project_id)
+        )
+        stats = {project_id: (count, max_version) for project_id, count, max_version in result.all()}
+
+        for project_id in project_ids:
+            count, max_version = stats.get(project_id, (0, 0))
+            await db.execute(
+                update(Project)
+                .where(Project.id == project_id)
+                .values(
+                    generation_count=count,
+                    # Never move the version counter backwards
+                    version_counter=case(
+                        (Project.version_counter < max_version, max_version),
+                        else_=Project.version_counter
+                    ),
+                    updated_at=Project.updated_at
+                )
+            )
+            await ProjectService._refresh_latest(db, project_id)
+        await entity_cache.invalidate(db, namespaces=["projects"])
+        return project_ids[-1]
 
-        return projects_with_counts
+    @staticmethod
+    async def repair_all_counters(batch_size: int = 100) -> None:
+        """Recompute every project's counters, one short transaction per batch"""
+        after_id = ""
+        while after_id is not None:
+            async with session_scope() as db:
+                after_id = await ProjectService.repair_counters(db, after_id, batch_size)
+
+    @staticmethod
+    async def count_projects(db: AsyncSession) -> int:
+        """Total number of projects, served from a short-lived cache"""
+        total = total_count_cache.get("projects")
+        if total is None:
+            result = await db.execute(
+                select(func.count()).select_from(Project).where(Project.deleted_at.is_(None))
+            )
+            total = result.scalar_one()
+            total_count_cache.set("projects", total)
+        return total
 
     @staticmethod
     async def update_project(
@@ -112,6 +332,7 @@ class ProjectService:
 
         await db.flush()
         await db.refresh(project)
+        await entity_cache.invalidate(db, keys=[f"project:{project.id}"], namespaces=["projects"])
         return project
 
     @staticmethod
@@ -121,5 +342,85 @@ class ProjectService:
     ) -> None:
         """Delete a project"""
         project = await ProjectService.get_project_or_404(db, project_id)
-        await db.delete(project)
-        await db.flush()
+        await ProjectService.delete_projects(db, [project.id])
+
+    @staticmethod
+    async def delete_projects(
+        db: AsyncSession,
+        project_ids: Iterable[UUID]
+    ) -> List[str]:
+        """
+        Delete several projects, returning the IDs that existed
+
+        Projects with up to PROJECT_DELETE_INLINE_LIMIT generations are deleted
+        with one statement, their rows removed by ON DELETE CASCADE. Larger ones
+        are only marked deleted, which hides them at once, and left to
+        purge_deleted_projects so no single transaction holds their rows locked.
+        """
+        result = await db.execute(
+            select(Project.id, Project.generation_count).where(
+                Project.id.in_([str(project_id) for project_id in project_ids]),
+                Project.deleted_at.is_(None)
+            )
+        )
+        rows = result.all()
+        inline = [pid for pid, count in rows if count <= settings.PROJECT_DELETE_INLINE_LIMIT]
+        deferred = [pid for pid, count in rows if count > settings.PROJECT_DELETE_INLINE_LIMIT]
+
+        if inline:
+            await db.execute(
+                delete(Project)
+                .where(Project.id.in_(inline))
+                .execution_options(synchronize_session=False)
+            )
+        if deferred:
+            await db.execute(
+                update(Project)
+                .where(Project.id.in_(deferred))
+                .values(deleted_at=datetime.utcnow(), updated_at=Project.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+        for pid, _ in rows:
+            request_scope.forget("project", pid)
+        if rows:
+            total_count_cache.invalidate("projects")
+            # Cached generations of these projects go with them
+            await entity_cache.invalidate(
+                db,
+                keys=[f"project:{pid}" for pid, _ in rows],
+                namespaces=["projects", "generations"]
+            )
+        return [pid for pid, _ in rows]
+
+    @staticmethod
+    async def purge_deleted_projects(batch_size: Optional[int] = None) -> int:
+        """
+        Remove the rows of projects marked deleted, one short transaction per batch
+
+        Chat messages go first, so deleting generations does not have to null
+        out their references; returns the number of projects removed.
+        """
+        batch_size = batch_size or settings.PROJECT_PURGE_BATCH_SIZE
+        async with session_scope() as db:
+            result = await db.execute(select(Project.id).where(Project.deleted_at.is_not(None)))
+            project_ids = list(result.scalars().all())
+
+        for project_id in project_ids:
+            for model in (ChatMessage, Generation):
+                while True:
+                    async with session_scope() as db:
+                        result = await db.execute(
+                            select(model.id).where(model.project_id == project_id).limit(batch_size)
+                        )
+                        ids = list(result.scalars().all())
+                        if not ids:
+                            break
+                        await db.execute(
+                            delete(model)
+                            .where(model.id.in_(ids))
+                            .execution_options(synchronize_session=False)
+                        )
+            async with session_scope() as db:
+                await db.execute(delete(Project).where(Project.id == project_id))
+            logger.info(f"Purged deleted project {project_id}")
+        return len(project_ids)
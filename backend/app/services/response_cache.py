@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import hashlib
+import json
+import time
+import logging
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import session_scope
+from app.models import ResponseCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Two-tier cache of raw model output keyed by prompt hash
+
+    An in-memory LRU answers repeated prompts without a round trip; the
+    ``response_cache`` table shares entries between processes and restarts.
+    Both tiers honour RESPONSE_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+        }
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        generation_config: dict,
+        system_prompt_version: str,
+        formatted_history: str,
+        user_prompt: str
+    ) -> str:
+        """Hash every input that determines the model's output"""
+        material = json.dumps(
+            {
+                "model": model_name,
+                "config": generation_config,
+                "system_prompt": system_prompt_version,
+                "history": formatted_history,
+                "prompt": user_prompt,
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def record_bypass(self) -> None:
+        self._stats["bypassed"] += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look a response up in memory, then in the database"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            content, expires_at = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return content
+            del self._entries[key]
+
+        try:
+            async with session_scope() as db:
+                result = await db.execute(
+                    select(ResponseCacheEntry).where(ResponseCacheEntry.key == key)
+                )
+                row = result.scalar_one_or_none()
+                if row is not None and row.expires_at <= datetime.utcnow():
+                    await db.delete(row)
+                    row = None
+                if row is not None:
+                    row.hit_count += 1
+                    content = row.content
+                    remaining = (row.expires_at - datetime.utcnow()).total_seconds()
+        except Exception as e:
+            # The cache must never break generation
+            logger.warning(f"Response cache lookup failed: {e}")
+            row = None
+
+        if row is None:
+            self._stats["misses"] += 1
+            return None
+
+        self._stats["db_hits"] += 1
+        self._remember(key, content, time.time() + remaining)
+        return content
+
+    async def set(self, key: str, content: str) -> None:
+        """Store a response in both tiers"""
+        self._remember(key, content, time.time() + self.ttl_seconds)
+        self._stats["stores"] += 1
+
+        try:
+            async with session_scope() as db:
+                await db.execute(delete(ResponseCacheEntry).where(ResponseCacheEntry.key == key))
+                db.add(ResponseCacheEntry(
+                    key=key,
+                    content=content,
+                    expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+                ))
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {e}")
+
+    @staticmethod
+    async def purge_expired(db: AsyncSession) -> int:
+        """Delete database entries past their TTL that no lookup has removed"""
+        result = await db.execute(
+            delete(ResponseCacheEntry).where(ResponseCacheEntry.expires_at <= datetime.utcnow())
+        )
+        return result.rowcount
+
+    def _remember(self, key: str, content: str, expires_at: float) -> None:
+        self._entries[key] = (content, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current memory tier size"""
+        lookups = self._stats["memory_hits"] + self._stats["db_hits"] + self._stats["misses"]
+        hits = self._stats["memory_hits"] + self._stats["db_hits"]
+        return {
+            **self._stats,
+            "memory_entries": len(self._entries),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Create a singleton instance
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS
+)
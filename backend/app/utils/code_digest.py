@@ -0,0 +1,73 @@
+"""Compact summaries of generated files for correction prompts"""
+
+import json
+import re
+from typing import Dict, List, Optional
+
+# Exported or top-level declarations worth telling the model about
+_DECLARATION_PATTERNS = [
+    re.compile(r"^\s*export\s+default\s+(?:async\s+)?function\s*(\w*)\s*(\([^)]*\))", re.M),
+    re.compile(r"^\s*(?:export\s+)?(?:async\s+)?function\s+(\w+)\s*(\([^)]*\))", re.M),
+    re.compile(r"^\s*(?:export\s+)?const\s+(\w+)\s*(?::\s*[\w.<>\[\], ]+)?=\s*(?:async\s*)?(\([^)]*\))\s*(?::[^=]+)?=>", re.M),
+    re.compile(r"^\s*(?:export\s+)?(?:default\s+)?class\s+(\w+)()", re.M),
+    re.compile(r"^\s*(?:export\s+)?interface\s+(\w+)()", re.M),
+    re.compile(r"^\s*(?:export\s+)?type\s+(\w+)()\s*=", re.M),
+    re.compile(r"^\s*(?:export\s+)?enum\s+(\w+)()", re.M),
+]
+_EXPORT_DEFAULT_NAME = re.compile(r"^\s*export\s+default\s+(\w+)\s*;?\s*$", re.M)
+
+
+def parse_file_set(html_content: Optional[str]) -> Optional[Dict[str, str]]:
+    """Files of a stored {"files": ...} generation, or None for raw HTML output"""
+    if not html_content:
+        return None
+    try:
+        parsed = json.loads(html_content)
+    except ValueError:
+        return None
+    if isinstance(parsed, dict) and isinstance(parsed.get("files"), dict):
+        return parsed["files"]
+    return None
+
+
+def parse_files(html_content: Optional[str]) -> Dict[str, str]:
+    """Files of a stored generation; raw HTML output counts as a single index.html"""
+    if not html_content:
+        return {}
+    files = parse_file_set(html_content)
+    return files if files is not None else {"index.html": html_content}
+
+
+def _signatures(content: str) -> List[str]:
+    found = []
+    seen = set()
+    for pattern in _DECLARATION_PATTERNS:
+        for match in pattern.finditer(content):
+            name, params = match.group(1), match.group(2)
+            key = name or "default"
+            if key in seen:
+                continue
+            seen.add(key)
+            params = re.sub(r"\s+", " ", params)
+            found.append(f"{name}{params}" if params else name)
+    for match in _EXPORT_DEFAULT_NAME.finditer(content):
+        found.append(f"default={match.group(1)}")
+    return found
+
+
+def build_code_digest(files: Dict[str, str]) -> List[str]:
+    """
+    One line per file: path, size and its declarations
+
+    Returned as a list so callers can drop lines to fit a token budget.
+    """
+    lines = []
+    for path in sorted(files):
+        content = files[path]
+        line_count = content.count("\n") + 1
+        signatures = _signatures(content) if not path.endswith((".json", ".css", ".md")) else []
+        line = f"- {path} ({line_count} lines)"
+        if signatures:
+            line += ": " + ", ".join(signatures)
+        lines.append(line)
+    return lines
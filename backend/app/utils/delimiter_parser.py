@@ -0,0 +1,185 @@
+"""Incremental parser for the ===FILE: path=== / ===END FILE=== output format"""
+
+import json
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FILE_START_MARKER = "===FILE:"
+FILE_HEADER_END = "==="
+FILE_END_MARKER = "===END FILE==="
+DELETE_MARKER = "===DELETE FILE:"
+
+
+def _partial_suffix(text: str, marker: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of marker"""
+    for size in range(min(len(text), len(marker) - 1), 0, -1):
+        if marker.startswith(text[-size:]):
+            return size
+    return 0
+
+
+class DelimiterStreamParser:
+    """
+    State-machine parser that consumes model output chunk by chunk
+
+    Each call to ``feed`` returns the events that became certain with the new
+    chunk, so clients can render files while the model is still writing them:
+
+        {"type": "file_start", "path": ...}
+        {"type": "file_delta", "path": ...,  "content": ...}
+        {"type": "file_complete", "path": ..., "size": ...}
+        {"type": "file_deleted", "path": ...}
+
+    ``===DELETE FILE: path===`` lines, used by edit-mode corrections, remove a
+    file from the version being edited. Deltas of a file concatenate to exactly the same stripped content the old
+    regex-based parser produced. Empty and unterminated files are dropped.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, str] = {}
+        self.deleted: List[str] = []
+        self._raw: List[str] = []
+        self._buffer = ""
+        self._path: Optional[str] = None  # Set while inside a file body
+        self._parts: List[str] = []
+        self._started = False  # file_start emitted for the current file
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consume a chunk of model output and return the resulting events"""
+        self._raw.append(chunk)
+        self._buffer += chunk
+        events: List[dict] = []
+
+        while True:
+            if self._path is None:
+                if not self._consume_header(events):
+                    break
+            elif not self._consume_body(events):
+                break
+
+        return events
+
+    def close(self) -> List[dict]:
+        """Signal end of output; returns any final events"""
+        if self._path is not None:
+            logger.warning(f"Dropping unterminated file: {self._path}")
+            self._path = None
+            self._parts = []
+        self._buffer = ""
+        return []
+
+    @property
+    def raw_text(self) -> str:
+        """Full unparsed output received so far"""
+        return "".join(self._raw)
+
+    def result(self) -> str:
+        """Parsed output as {"files": ...} JSON, or the raw text when no files were found"""
+        if not self.files:
+            logger.warning("No delimiter format found, treating as single HTML file")
+            return self.raw_text
+        logger.info(f"Successfully parsed {len(self.files)} files from delimiter format")
+        return json.dumps({"files": self.files})
+
+    @property
+    def has_changes(self) -> bool:
+        """Whether any file was written or deleted"""
+        return bool(self.files or self.deleted)
+
+    def merge_into(self, base_files: Dict[str, str]) -> str:
+        """Apply the parsed files and deletions to a base version; returns {"files": ...} JSON"""
+        merged = dict(base_files)
+        merged.update(self.files)
+        for path in self.deleted:
+            merged.pop(path, None)
+        return json.dumps({"files": merged})
+
+    def _consume_header(self, events: List[dict]) -> bool:
+        """Look for a complete file or delete header; returns True when one was consumed"""
+        start = self._buffer.find(FILE_START_MARKER)
+        delete_start = self._buffer.find(DELETE_MARKER)
+        if start == -1 and delete_start == -1:
+            # Keep only a tail that may turn into a marker with the next chunk
+            keep = max(
+                _partial_suffix(self._buffer, FILE_START_MARKER),
+                _partial_suffix(self._buffer, DELETE_MARKER)
+            )
+            self._buffer = self._buffer[len(self._buffer) - keep:] if keep else ""
+            return False
+
+        is_delete = delete_start != -1 and (start == -1 or delete_start < start)
+        if is_delete:
+            start = delete_start
+        name_start = start + len(DELETE_MARKER if is_delete else FILE_START_MARKER)
+        end = self._buffer.find(FILE_HEADER_END, name_start)
+        newline = self._buffer.find("\n", name_start)
+
+        if newline != -1 and (end == -1 or newline < end):
+            # Header broken across lines, not a real file marker
+            self._buffer = self._buffer[name_start:]
+            return True
+        if end == -1:
+            self._buffer = self._buffer[start:]
+            return False
+
+        path = self._buffer[name_start:end].strip()
+        self._buffer = self._buffer[end + len(FILE_HEADER_END):]
+        if not path or path.startswith("="):
+            return True
+
+        if is_delete:
+            self.files.pop(path, None)
+            if path not in self.deleted:
+                self.deleted.append(path)
+            events.append({"type": "file_deleted", "path": path})
+            return True
+
+        self._path = path
+        self._parts = []
+        self._started = False
+        return True
+
+    def _consume_body(self, events: List[dict]) -> bool:
+        """Emit content of the current file; returns True when the file was closed"""
+        if not self._started:
+            self._buffer = self._buffer.lstrip()
+
+        end = self._buffer.find(FILE_END_MARKER)
+        if end != -1:
+            self._emit(self._buffer[:end].rstrip(), events)
+            self._buffer = self._buffer[end + len(FILE_END_MARKER):]
+            self._finish_file(events)
+            return True
+
+        # Hold back a possible partial end marker and trailing whitespace, which
+        # is stripped if the marker follows
+        keep = _partial_suffix(self._buffer, FILE_END_MARKER)
+        body = self._buffer[:len(self._buffer) - keep]
+        ready = body.rstrip()
+        self._emit(ready, events)
+        self._buffer = self._buffer[len(ready):]
+        return False
+
+    def _emit(self, content: str, events: List[dict]) -> None:
+        if not content:
+            return
+        if not self._started:
+            self._started = True
+            events.append({"type": "file_start", "path": self._path})
+        self._parts.append(content)
+        events.append({"type": "file_delta", "path": self._path, "content": content})
+
+    def _finish_file(self, events: List[dict]) -> None:
+        if self._started:
+            content = "".join(self._parts)
+            self.files[self._path] = content
+            if self._path in self.deleted:
+                self.deleted.remove(self._path)
+            events.append({"type": "file_complete", "path": self._path, "size": len(content)})
+        else:
+            logger.warning(f"Skipping empty file: {self._path}")
+        self._path = None
+        self._parts = []
+        self._started = False
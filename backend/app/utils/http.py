@@ -0,0 +1,102 @@
+"""HTTP caching helpers"""
+
+import asyncio
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.middleware import gzip as starlette_gzip
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+
+# For representations that never change once they exist (completed generations,
+# content-addressed files); revalidation is never needed
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# For representations that may still change: always revalidate, usually a 304
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def make_etag(value: str) -> str:
+    """Strong entity tag for an opaque value such as a content hash"""
+    return f'"{value}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers etag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates)
+
+
+def variant_etag(etag: str, coding: str) -> str:
+    """Entity tag of a content-coded variant; strong tags must differ per encoding"""
+    return f'{etag[:-1]}-{coding}"'
+
+
+async def gzip_body(body: bytes) -> bytes:
+    """Deterministic gzip of a response body, compressed in a worker thread when large"""
+    if len(body) < 64 * 1024:
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return await asyncio.to_thread(gzip.compress, body, 6, mtime=0)
+
+
+def accepts_encoding(accept_encoding: Optional[str], coding: str) -> bool:
+    """Whether an Accept-Encoding header allows a content coding (q=0 refuses it)"""
+    qualities = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+    # An explicit entry for the coding overrides the wildcard
+    return qualities.get(coding, qualities.get("*", 0.0)) > 0
+
+
+def wants_gzip(accept_encoding: Optional[str], size: int) -> bool:
+    """Whether a body of this size is sent gzipped; GZipMiddleware follows the same rule"""
+    return size >= settings.GZIP_MINIMUM_SIZE and accepts_encoding(accept_encoding, "gzip")
+
+
+class GZipMiddleware(starlette_gzip.GZipMiddleware):
+    """
+    Starlette's GZipMiddleware, honouring q=0 in Accept-Encoding
+
+    Endpoints with a strong ETag negotiate their gzip variant themselves with
+    wants_gzip (and a variant ETag, as RFC 9110 requires); agreeing with them
+    on when to compress keeps this middleware off their identity responses.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not accepts_encoding(Headers(scope=scope).get("accept-encoding"), "gzip"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Generated files are text; anything not listed (.ts, .tsx, ...) is served as
+# plain text rather than guessed (mimetypes maps .ts to MPEG transport streams)
+_FILE_MEDIA_TYPES = {
+    ".html": "text/html",
+    ".css": "text/css",
+    ".js": "text/javascript",
+    ".mjs": "text/javascript",
+    ".json": "application/json",
+    ".svg": "image/svg+xml",
+    ".md": "text/markdown",
+}
+
+
+def media_type_for(path: str) -> str:
+    """Content type of a generated file, with charset"""
+    extension = path[path.rfind("."):].lower() if "." in path else ""
+    return f"{_FILE_MEDIA_TYPES.get(extension, 'text/plain')}; charset=utf-8"
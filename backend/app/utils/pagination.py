@@ -0,0 +1,97 @@
+"""Opaque keyset cursors for paginated listings"""
+
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+import base64
+import json
+import time
+
+from sqlalchemy import and_, or_
+
+from app.core.config import settings
+from app.core.exceptions import raise_bad_request
+
+
+def encode_cursor(sort_value: datetime, row_id: str) -> str:
+    """Cursor pointing just past a row, from its sort key and ID"""
+    raw = json.dumps([sort_value.isoformat(), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Sort key and ID of a cursor; raises 400 for anything not made by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(sort_value), str(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise_bad_request("Invalid pagination cursor")
+
+
+def after_cursor(query, sort_column, id_column, cursor: Optional[str], descending: bool):
+    """
+    Restrict a query to rows after a cursor, in (sort_column, id_column) order
+
+    Written as ``a < x OR (a = x AND id < y)`` rather than a row-value
+    comparison so MySQL uses the composite index for the range.
+    """
+    if not cursor:
+        return query
+    sort_value, row_id = decode_cursor(cursor)
+    if descending:
+        return query.where(or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < row_id)
+        ))
+    return query.where(or_(
+        sort_column > sort_value,
+        and_(sort_column == sort_value, id_column > row_id)
+    ))
+
+
+def next_cursor(items: Sequence[Any], limit: int, sort_attr: str) -> Optional[str]:
+    """Cursor of the following page, or None when this page was the last"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    if isinstance(last, dict):
+        return encode_cursor(last[sort_attr], last["id"])
+    return encode_cursor(getattr(last, sort_attr), last.id)
+
+
+def set_page_headers(response, cursor: Optional[str]) -> None:
+    """Expose the next page's cursor on a list response"""
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+
+
+class TotalCountCache:
+    """
+    Short-lived cache of row counts shown next to paginated listings
+
+    Totals are informational, so a count up to ``ttl_seconds`` old is served
+    instead of running COUNT(*) for every page; writers invalidate their key.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._counts: dict = {}
+
+    def get(self, key: str) -> Optional[int]:
+        entry = self._counts.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, key: str, count: int) -> None:
+        now = time.monotonic()
+        if len(self._counts) >= 10000:
+            self._counts = {k: v for k, v in self._counts.items() if v[1] >= now}
+        self._counts[key] = (count, now + self.ttl_seconds)
+
+    def invalidate(self, key: str) -> None:
+        self._counts.pop(key, None)
+
+
+# Create a singleton instance
+total_count_cache = TotalCountCache(settings.PAGINATION_TOTAL_CACHE_SECONDS)
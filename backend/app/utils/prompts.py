@@ -1,5 +1,7 @@
 """System prompts for VisionCraft Studio"""
 
+import hashlib
+
 SYSTEM_PROMPT = """You are an expert full-stack developer and UI/UX designer specializing in creating high-fidelity, interactive demo systems using React and TypeScript. Your role is to transform user requirements and workflow descriptions into fully functional, production-ready React + TypeScript applications.
 
 ## INPUT REQUIREMENTS
@@ -194,9 +196,13 @@ CRITICAL RULES:
 6. Must be fully functional when opened in a browser"""
 
 
+# Changes whenever the system prompt does, so cached responses never outlive it
+SYSTEM_PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+
+
 CORRECTION_PROMPT_TEMPLATE = """Based on the previous code generation and the user's feedback below, please make the requested corrections/improvements.
 
-Previous context:
+{code_digest}Previous context:
 {chat_history}
 
 User's correction request:
@@ -205,9 +211,45 @@ User's correction request:
 IMPORTANT: Generate a complete HTML file with all updates. Start directly with <!DOCTYPE html> - NO explanations or markdown blocks."""
 
 
-def build_correction_prompt(chat_history: str, user_request: str) -> str:
-    """Build a correction prompt with chat history context"""
+CODE_DIGEST_SECTION = """Current project files (paths, sizes, exports and signatures):
+{code_digest}
+
+"""
+
+
+def build_correction_prompt(chat_history: str, user_request: str, code_digest: str = "") -> str:
+    """Build a correction prompt with chat history and current code context"""
     return CORRECTION_PROMPT_TEMPLATE.format(
-        chat_history=chat_history,
+        code_digest=CODE_DIGEST_SECTION.format(code_digest=code_digest) if code_digest else "",
+        chat_history=chat_history or "(none)",
+        user_request=user_request
+    )
+
+
+EDIT_PROMPT_TEMPLATE = """Apply the user's change request to the existing project below by editing only what needs to change.
+
+Current project files:
+{code_context}
+
+Previous context:
+{chat_history}
+
+User's change request:
+{user_request}
+
+IMPORTANT: Output ONLY the files you change or add, each one complete, in this format:
+===FILE: path/to/file===
+...full new content of the file...
+===END FILE===
+To delete a file, output the line ===DELETE FILE: path/to/file===
+Files listed without content are shown by signature only; leave them out unless they must be rewritten in full.
+Do NOT repeat unchanged files. NO explanations or markdown blocks."""
+
+
+def build_edit_prompt(chat_history: str, user_request: str, code_context: str) -> str:
+    """Build an edit-mode prompt asking only for changed, added or deleted files"""
+    return EDIT_PROMPT_TEMPLATE.format(
+        code_context=code_context,
+        chat_history=chat_history or "(none)",
         user_request=user_request
     )
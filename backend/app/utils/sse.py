@@ -0,0 +1,22 @@
+"""Server-Sent Events framing helpers"""
+
+from typing import Optional
+
+import orjson
+
+# Comment line; ignored by clients but keeps proxies from closing idle streams
+KEEPALIVE = ": keep-alive\n\n"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+
+
+def format_sse(event: dict, event_id: Optional[object] = None) -> str:
+    """Frame an event as an SSE message, with an ``id:`` line when numbered"""
+    data = f"data: {orjson.dumps(event).decode('utf-8')}\n\n"
+    if event_id is None:
+        return data
+    return f"id: {event_id}\n{data}"
@@ -0,0 +1,175 @@
+"""Helpers for bridging blocking iterators onto the asyncio event loop, and for pacing streams"""
+
+import asyncio
+import threading
+from concurrent.futures import Executor
+from typing import AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def iterate_in_thread(
+    factory: Callable[[], Iterable[T]],
+    maxsize: int = 32,
+    executor: Optional[Executor] = None,
+    on_stop: Optional[Callable[[], None]] = None
+) -> AsyncIterator[T]:
+    """
+    Consume a blocking iterable in a worker thread and yield its items asynchronously
+
+    The iterable is created *and* iterated inside the worker thread, so neither the
+    initial request nor the per-item network reads ever block the event loop. At most
+    ``maxsize`` items are buffered: once the consumer falls behind, the producer thread
+    waits for a free slot instead of growing the buffer without bound.
+
+    If the consumer stops early (break, exception or cancellation) the producer is
+    signalled to stop and the underlying iterator is closed when it supports it.
+    The flag is only seen between items; ``on_stop`` is called on the event loop
+    at that point too, to abort a read the thread is blocked in (it must not block).
+
+    Args:
+        factory: Callable returning the blocking iterable (called in the worker thread)
+        maxsize: Maximum number of items buffered between the thread and the loop
+        executor: Executor to run the producer in (defaults to the loop's executor)
+        on_stop: Called if the consumer stops before the producer finished
+
+    Yields:
+        Items produced by the iterable, in order
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(maxsize)
+    stop = threading.Event()
+
+    def push(item, error=None) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # Event loop already closed, nobody is listening anymore
+            stop.set()
+
+    def produce() -> None:
+        iterator = None
+        error = None
+        try:
+            iterator = iter(factory())
+            for item in iterator:
+                # Wait for a free slot, waking up regularly to honour cancellation
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                push(item)
+        except BaseException as e:
+            error = e
+        finally:
+            close = getattr(iterator, "close", None)
+            if stop.is_set() and close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            push(_DONE, error)
+
+    producer = loop.run_in_executor(executor, produce)
+
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                break
+            slots.release()
+            yield item
+    finally:
+        stop.set()
+        if on_stop is not None and not producer.done():
+            on_stop()
+        # Let the producer observe the stop flag without blocking the caller
+        producer.add_done_callback(lambda f: f.exception() if not f.cancelled() else None)
+
+
+async def coalesce_chunks(
+    chunks: AsyncIterator[str],
+    interval: float,
+    max_chars: int
+) -> AsyncIterator[str]:
+    """
+    Merge text chunks that arrive close together into larger ones
+
+    The first chunk is passed on at once so time to first output is unchanged;
+    after that, chunks arriving within ``interval`` seconds of the first pending
+    one are joined, up to ``max_chars`` characters. Every stage downstream
+    (parser, event hub, replay log, SSE frames) then handles fewer, larger
+    events. An ``interval`` of 0 passes chunks through unchanged.
+
+    When the consumer stops early, ``chunks`` is closed before this generator
+    finishes, so whatever feeds it (a model call, its thread) is released.
+    """
+    if interval <= 0:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    # Bounded, so a slow consumer still holds the producer back
+    queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+
+    async def pump() -> None:
+        try:
+            async for chunk in chunks:
+                await queue.put((chunk, None))
+            await queue.put((_DONE, None))
+        except Exception as e:
+            await queue.put((_DONE, e))
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    pump_task = asyncio.create_task(pump())
+    first = True
+    try:
+        while True:
+            chunk, error = await queue.get()
+            if chunk is _DONE:
+                if error is not None:
+                    raise error
+                return
+            if first:
+                first = False
+                yield chunk
+                continue
+
+            pending = [chunk]
+            size = len(chunk)
+            deadline = loop.time() + interval
+            done = False
+            while size < max_chars:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    # Not wait_for, which can swallow a cancellation of the stream on 3.11
+                    async with asyncio.timeout(remaining):
+                        chunk, error = await queue.get()
+                except asyncio.TimeoutError:
+                    break
+                if chunk is _DONE:
+                    done = True
+                    break
+                pending.append(chunk)
+                size += len(chunk)
+
+            yield "".join(pending)
+            if done:
+                if error is not None:
+                    raise error
+                return
+    finally:
+        pump_task.cancel()
+        await asyncio.gather(pump_task, return_exceptions=True)
@@ -0,0 +1,20 @@
+"""
+Benchmarks
+
+Run from the backend directory, e.g. ``python -m benchmarks.generation_listing``.
+They use a throwaway SQLite database and the offline fake model unless
+DB_URL and the other settings are already set in the environment. As in
+the tests, the environment is set before anything from ``app`` is imported.
+"""
+
+import os
+import tempfile
+
+if not os.environ.get("DB_URL"):
+    _DB_DIR = tempfile.mkdtemp(prefix="visioncraft-bench-")
+    os.environ["DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ.setdefault("DB_PASSWORD", "unused")
+os.environ.setdefault("DEBUG", "False")
+os.environ.setdefault("MODEL_PROVIDER", "fake")
+os.environ.setdefault("GEMINI_RATE_LIMITER", "none")
+os.environ.setdefault("EVENT_BROKER", "local")
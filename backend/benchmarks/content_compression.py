@@ -0,0 +1,57 @@
+"""
+Compressed generation content: stored size and encode/decode time
+
+Generates Tailwind-style pages of a few sizes and measures what
+CompressedText stores for them. ``python -m benchmarks.content_compression``
+"""
+
+import argparse
+import random
+import time
+
+from app.db.types import decode_text, encode_text
+
+WORDS = ["lorem", "ipsum", "dolor", "amet", "sit", "consectetur", "adipiscing", "elit"]
+
+
+def _page(seed: int, cards: int) -> str:
+    """A generated-looking page: repeated markup around varying text"""
+    rnd = random.Random(seed)
+    rows = "".join(
+        '<div class="card p-4 shadow rounded-lg">'
+        f'<h2 class="text-xl font-bold">Item {rnd.randint(0, 10 ** 6)}</h2>'
+        f'<p class="text-gray-600">{" ".join(rnd.choice(WORDS) for _ in range(30))}</p>'
+        "</div>\n"
+        for _ in range(cards)
+    )
+    return f"<!DOCTYPE html><html><head></head><body>{rows}</body></html>"
+
+
+def _per_call_ms(function, values: list) -> float:
+    start = time.perf_counter()
+    for value in values:
+        function(value)
+    return (time.perf_counter() - start) / len(values) * 1000
+
+
+def main(card_counts: list, pages: int) -> None:
+    print(f"{pages} pages per size")
+    for cards in card_counts:
+        texts = [_page(seed, cards) for seed in range(pages)]
+        stored = [encode_text(text) for text in texts]
+        raw_bytes = sum(len(text.encode("utf-8")) for text in texts) / pages
+        stored_bytes = sum(len(value) for value in stored) / pages
+        print(
+            f"{raw_bytes / 1024:8.1f}KB -> {stored_bytes / 1024:7.1f}KB stored"
+            f" ({raw_bytes / stored_bytes:4.1f}x)"
+            f"   encode {_per_call_ms(encode_text, texts):6.2f} ms"
+            f"   decode {_per_call_ms(decode_text, stored):6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, nargs="+", default=[4, 40, 400, 4000], help="cards per page")
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+    main(args.cards, args.pages)
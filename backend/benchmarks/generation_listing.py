@@ -0,0 +1,89 @@
+"""
+Generation listing: summary columns versus loading every version's content
+
+Seeds a project with generations of a few output sizes and times a page
+of the listing both ways. ``python -m benchmarks.generation_listing``
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import desc, select
+
+from app.db.database import Base, engine, init_db, session_scope
+from app.models import Generation, GenerationStatus, Project
+from app.services import GenerationService
+
+
+async def _seed(size_kb: int, versions: int) -> str:
+    """ID of a new project with completed generations of about size_kb each"""
+    async with session_scope() as db:
+        project = Project(name=f"Listing benchmark {size_kb}KB")
+        db.add(project)
+        await db.flush()
+        body = "<div class=\"p-4\">Lorem ipsum dolor sit amet</div>\n" * (size_kb * 1024 // 42)
+        for version in range(versions):
+            # Alternate single-page and multi-file output, like real projects
+            if version % 2:
+                content = json.dumps({"files": {"src/App.tsx": body + str(version), "package.json": "{}"}})
+            else:
+                content = f"<!DOCTYPE html><html><body>{body}{version}</body></html>"
+            await GenerationService.create_generation(
+                db, project.id, html_content=content, status=GenerationStatus.COMPLETED
+            )
+        return project.id
+
+
+async def _list_full_rows(project_id: str, limit: int) -> int:
+    """The listing before summary columns: whole rows, content included"""
+    async with session_scope() as db:
+        result = await db.execute(
+            select(Generation)
+            .where(Generation.project_id == project_id)
+            .order_by(desc(Generation.created_at), desc(Generation.id))
+            .limit(limit)
+        )
+        return sum(len(generation.html_content or "") for generation in result.scalars())
+
+
+async def _list_summaries(project_id: str, limit: int) -> int:
+    async with session_scope() as db:
+        generations = await GenerationService.list_generations(db, project_id, limit=limit)
+        return sum(len(generation.preview or "") for generation in generations)
+
+
+async def _time(list_page, project_id: str, limit: int, repeat: int) -> tuple:
+    """Milliseconds per listing, and characters of content or preview it read"""
+    read = await list_page(project_id, limit)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await list_page(project_id, limit)
+    return (time.perf_counter() - start) / repeat * 1000, read
+
+
+async def main(sizes: list, versions: int, repeat: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await init_db()
+    print(f"{versions} versions per project, {repeat} listings each, page of {versions}")
+    for size_kb in sizes:
+        project_id = await _seed(size_kb, versions)
+        full_ms, full_read = await _time(_list_full_rows, project_id, versions, repeat)
+        summary_ms, summary_read = await _time(_list_summaries, project_id, versions, repeat)
+        print(
+            f"{size_kb:>5}KB  full rows {full_ms:8.1f} ms ({full_read:>10} chars)"
+            f"   summaries {summary_ms:6.1f} ms ({summary_read:>6} chars)"
+            f"   {full_ms / summary_ms:5.1f}x"
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 1000], help="output sizes in KB")
+    parser.add_argument("--versions", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.versions, args.repeat))
@@ -0,0 +1,71 @@
+"""
+Stream events: SSE framing with json versus orjson, and chunk coalescing
+
+Times format_sse against the stdlib json framing it replaced, then feeds a
+burst of small model chunks through coalesce_chunks and the stream parser
+with and without coalescing. ``python -m benchmarks.sse_events``
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
+from app.core.config import settings
+from app.utils.delimiter_parser import DelimiterStreamParser
+from app.utils.sse import format_sse
+from app.utils.streaming import coalesce_chunks
+
+
+def _json_sse(event: dict, event_id: Optional[object] = None) -> str:
+    """format_sse as it was, with the standard library encoder"""
+    data = f"data: {json.dumps(event)}\n\n"
+    if event_id is None:
+        return data
+    return f"id: {event_id}\n{data}"
+
+
+def framing(count: int) -> None:
+    for size in (40, 2000):
+        event = {"type": "chunk", "content": "<div class=\"p-4\">héllo</div>\n" * (size // 30 + 1)}
+        for name, frame in (("json", _json_sse), ("orjson", format_sse)):
+            start = time.perf_counter()
+            for index in range(count):
+                frame(event, f"1:{index}")
+            print(f"{name:>7} {size:>5}-char event: {(time.perf_counter() - start) / count * 1e6:6.2f} us")
+
+
+async def _model_burst(chunks: int, gap: float) -> AsyncIterator[str]:
+    """Small chunks at a steady rate, as a fast model streams them"""
+    for index in range(chunks):
+        await asyncio.sleep(gap)
+        yield ("===FILE: src/App.tsx===\n" if index == 0 else "") + "const x = <div>chunk</div>;\n"
+
+
+async def coalescing(interval: float, chunks: int, gap: float) -> None:
+    parser = DelimiterStreamParser()
+    events = 0
+    chunk_events = 0
+    first = None
+    start = time.perf_counter()
+    async for chunk in coalesce_chunks(_model_burst(chunks, gap), interval, settings.SSE_COALESCE_MAX_CHARS):
+        if first is None:
+            first = time.perf_counter() - start
+        chunk_events += 1
+        events += 1 + len(parser.feed(chunk))
+    print(
+        f"interval {interval:>5}s: {chunk_events:>5} chunk events, {events:>5} events in all,"
+        f" first after {first * 1000:5.1f} ms, done in {time.perf_counter() - start:5.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=100000, help="events framed per encoder and size")
+    parser.add_argument("--chunks", type=int, default=1000, help="model chunks in the burst")
+    parser.add_argument("--gap", type=float, default=0.002, help="seconds between model chunks")
+    args = parser.parse_args()
+    framing(args.frames)
+    for interval in (0, settings.SSE_COALESCE_SECONDS):
+        asyncio.run(coalescing(interval, args.chunks, args.gap))
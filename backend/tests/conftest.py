@@ -0,0 +1,43 @@
+"""
+Test configuration
+
+Tests run against a throwaway SQLite database and the offline fake model.
+The environment is set before anything from ``app`` is imported, because
+settings and the database engine are created at import.
+"""
+
+import os
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="visioncraft-tests-")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.setdefault("DB_PASSWORD", "unused")
+os.environ["DEBUG"] = "False"
+os.environ["MODEL_PROVIDER"] = "fake"
+os.environ["GEMINI_RATE_LIMITER"] = "none"
+os.environ["EVENT_BROKER"] = "local"
+
+import pytest
+
+from app.db.database import Base, engine, init_db, session_scope
+from app.models import Project
+
+
+@pytest.fixture(autouse=True)
+async def database():
+    """A fresh schema for every test"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await init_db()
+    yield
+    await engine.dispose()
+
+
+@pytest.fixture
+async def project_id(database) -> str:
+    """ID of an empty project"""
+    async with session_scope() as db:
+        project = Project(name="Test project")
+        db.add(project)
+        await db.flush()
+        return project.id
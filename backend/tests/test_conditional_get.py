@@ -0,0 +1,62 @@
+import gzip
+
+import httpx
+import pytest
+
+from app.db.database import session_scope
+from app.main import app
+from app.models import GenerationStatus
+from app.services import FileStoreService, GenerationService
+
+APP = "export default function App() { return <h1>Hi</h1> }\n" * 40
+# Enough files for the manifest to be worth compressing too
+FILES = {"src/App.tsx": APP, **{f"src/components/Part{index}.tsx": f"export const part = {index}\n" for index in range(20)}}
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def generation_id(project_id):
+    async with session_scope() as db:
+        generation = await GenerationService.create_generation(db, project_id)
+        await FileStoreService.store_files(db, generation.id, FILES)
+        await GenerationService.update_generation(db, generation.id, status=GenerationStatus.COMPLETED)
+    return generation.id
+
+
+async def _get(client, url: str, accept_encoding: str, if_none_match: str = None) -> httpx.Response:
+    headers = {"Accept-Encoding": accept_encoding}
+    if if_none_match is not None:
+        headers["If-None-Match"] = if_none_match
+    # Raw stream, so the body is seen as sent rather than decoded by httpx
+    async with client.stream("GET", url, headers=headers) as response:
+        response.raw = b"".join([chunk async for chunk in response.aiter_raw()])
+    return response
+
+
+@pytest.mark.parametrize("path", ["manifest", "files/src/App.tsx"])
+async def test_gzipped_responses_have_their_own_etag(client, generation_id, path):
+    url = f"/api/v1/generations/{generation_id}/{path}"
+    plain = await _get(client, url, "identity")
+    zipped = await _get(client, url, "gzip")
+
+    assert "Content-Encoding" not in plain.headers
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.raw) == plain.raw
+    assert zipped.headers["ETag"] != plain.headers["ETag"]
+
+    # Either tag revalidates, and the 304 names the variant the client would get
+    revalidated = await _get(client, url, "gzip", if_none_match=plain.headers["ETag"])
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == zipped.headers["ETag"]
+
+
+async def test_refused_gzip_is_not_applied_by_the_middleware(client, generation_id):
+    response = await _get(client, f"/api/v1/generations/{generation_id}/files/src/App.tsx", "gzip;q=0")
+
+    assert "Content-Encoding" not in response.headers
+    assert response.raw == APP.encode("utf-8")
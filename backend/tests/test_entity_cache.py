@@ -0,0 +1,39 @@
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.db.database import session_scope
+from app.main import app
+from app.models import GenerationStatus
+from app.services import GenerationService, entity_cache, generation_service
+from app.services.entity_cache import EntityCache, MemoryCacheBackend
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_generation_deleted_by_another_process_is_not_served_from_cache(project_id, client, monkeypatch):
+    async with session_scope() as db:
+        generation = await GenerationService.create_generation(
+            db, project_id, html_content="<h1>Hello</h1>", status=GenerationStatus.COMPLETED
+        )
+    response = await client.get(f"/api/v1/generations/{generation.id}")
+    assert response.status_code == 200
+    hits = entity_cache.stats()["hits"]
+    assert (await client.get(f"/api/v1/generations/{generation.id}")).status_code == 200
+    assert entity_cache.stats()["hits"] > hits
+
+    # Another process deletes it, invalidating only its own cache
+    other_process = EntityCache(
+        MemoryCacheBackend(settings.ENTITY_CACHE_MAX_ENTRIES, settings.ENTITY_CACHE_MAX_BYTES)
+    )
+    with monkeypatch.context() as patch:
+        patch.setattr(generation_service, "entity_cache", other_process)
+        async with session_scope() as db:
+            await GenerationService.delete_generation(db, generation.id)
+
+    response = await client.get(f"/api/v1/generations/{generation.id}")
+    assert response.status_code == 404
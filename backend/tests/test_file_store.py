@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+
+from app.db.database import session_scope
+from app.models import FileBlob, GenerationFile
+from app.services import FileStoreService, GenerationService
+
+FILES = {"src/App.tsx": "export default function App() { return <h1>Hi</h1> }\n" * 20, "package.json": "{}"}
+
+
+async def _generation_with_files(project_id: str) -> str:
+    async with session_scope() as db:
+        generation = await GenerationService.create_generation(db, project_id)
+        await FileStoreService.store_files(db, generation.id, FILES)
+    return generation.id
+
+
+async def _orphan_blobs(generation_id: str, age: timedelta) -> None:
+    """Drop a generation's manifest and backdate its blobs, as if unused for that long"""
+    async with session_scope() as db:
+        await db.execute(delete(GenerationFile).where(GenerationFile.generation_id == generation_id))
+        await db.execute(update(FileBlob).values(
+            created_at=datetime.utcnow() - age, last_used_at=datetime.utcnow() - age
+        ))
+
+
+async def _purge() -> int:
+    async with session_scope() as db:
+        return await FileStoreService.purge_unreferenced_blobs(db, datetime.utcnow() - timedelta(hours=1))
+
+
+async def test_purge_deletes_old_unreferenced_blobs(project_id):
+    await _orphan_blobs(await _generation_with_files(project_id), timedelta(hours=2))
+
+    assert await _purge() == 2
+
+
+async def test_reused_blobs_survive_the_next_purge(project_id):
+    await _orphan_blobs(await _generation_with_files(project_id), timedelta(hours=2))
+
+    # A new version stores the same files: the old blobs are reused, not rewritten
+    generation_id = await _generation_with_files(project_id)
+
+    assert await _purge() == 0
+    async with session_scope() as db:
+        assert await db.scalar(select(func.count()).select_from(FileBlob)) == 2
+        assert await FileStoreService.load_files(db, generation_id) == FILES
@@ -0,0 +1,187 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.db.database import engine, session_scope
+from app.main import app
+from app.models import GenerationStatus, JobStatus
+from app.services import (
+    GenerationService,
+    GenerationStreamService,
+    JobService,
+    gemini_service,
+    generation_event_hub,
+    generation_worker_pool,
+)
+from app.services.event_log_service import EventLogService
+from app.services.generation_events import TERMINAL_EVENTS
+from app.services.model_providers import GeminiProvider
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class SlowModel:
+    """Stand-in Gemini client: a chunk every 20ms for about 10s, read on a stream thread"""
+
+    def __init__(self):
+        self.produced = 0
+        self.reading = 0
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        def response():
+            self.reading += 1
+            try:
+                for index in range(500):
+                    time.sleep(0.02)
+                    self.produced += 1
+                    yield _Chunk(f"<p>{index}</p>\n")
+            finally:
+                self.reading -= 1
+        return response()
+
+
+@pytest.fixture
+def slow_model(monkeypatch) -> SlowModel:
+    provider = GeminiProvider("slow-test-model", "", {})
+    provider.model = SlowModel()
+    monkeypatch.setattr(gemini_service, "provider", provider)
+    return provider.model
+
+
+@pytest.fixture
+async def workers(database, monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_WORKERS", 2)
+    await generation_event_hub.start()
+    await generation_worker_pool.start()
+    yield generation_worker_pool
+    await generation_worker_pool.stop()
+    await generation_event_hub.stop()
+
+
+async def _start_generation(project_id: str) -> str:
+    async with session_scope() as db:
+        generation = await GenerationService.create_generation(db, project_id)
+        job = await JobService.create_job(
+            db, generation.id, project_id, "A page that never ends", bypass_cache=True
+        )
+    generation_worker_pool.notify(job.id)
+    return generation.id
+
+
+async def _watch(generation_id: str, events: list, leave_after: int = 0) -> None:
+    """Follow a generation like an SSE client; leaving closes the stream as a disconnect does"""
+    stream = GenerationStreamService.resume(generation_id)
+    try:
+        async for item in stream:
+            if item is None:
+                continue
+            events.append(item[1])
+            if item[1].get("type") in TERMINAL_EVENTS:
+                return
+            if leave_after and len(events) >= leave_after:
+                return
+    finally:
+        await stream.aclose()
+
+
+async def _wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.02)
+
+
+async def _assert_released(model: SlowModel) -> None:
+    """The stream thread stopped reading, and no database connection is left checked out"""
+    await _wait_until(lambda: model.reading == 0, timeout=2.0)
+    produced = model.produced
+    await asyncio.sleep(0.2)
+    assert model.produced == produced
+    await _wait_until(lambda: engine.pool.checkedout() == 0, timeout=2.0)
+
+
+async def _statuses(generation_id: str) -> tuple:
+    async with session_scope() as db:
+        generation = await GenerationService.get_generation(db, generation_id)
+        job = await JobService.get_job_for_generation(db, generation_id)
+    return generation.status, job.status, job.error
+
+
+async def test_cancel_releases_stream_thread_and_connection(project_id, workers, slow_model):
+    generation_id = await _start_generation(project_id)
+    events = []
+    viewer = asyncio.create_task(_watch(generation_id, events))
+    await _wait_until(lambda: slow_model.produced >= 5)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(f"/api/v1/generations/{generation_id}/cancel")
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+
+    await asyncio.wait_for(viewer, 2.0)
+    assert events[-1] == {"type": "cancelled", "generation_id": generation_id}
+    await _assert_released(slow_model)
+    status, job_status, error = await _statuses(generation_id)
+    assert (status, job_status, error) == (
+        GenerationStatus.CANCELLED, JobStatus.CANCELLED, "Cancelled by request"
+    )
+
+
+async def test_disconnect_releases_stream_thread_and_connection(project_id, workers, slow_model, monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_DISCONNECT_GRACE_SECONDS", 0.3)
+    generation_id = await _start_generation(project_id)
+
+    await _watch(generation_id, [], leave_after=3)
+
+    await _assert_released(slow_model)
+    status, job_status, error = await _statuses(generation_id)
+    assert (status, job_status, error) == (
+        GenerationStatus.CANCELLED, JobStatus.CANCELLED, "All viewers disconnected"
+    )
+
+
+async def test_reconnect_within_grace_keeps_generating(project_id, workers, slow_model, monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_DISCONNECT_GRACE_SECONDS", 0.3)
+    generation_id = await _start_generation(project_id)
+
+    await _watch(generation_id, [], leave_after=3)
+    events = []
+    viewer = asyncio.create_task(_watch(generation_id, events))
+    await asyncio.sleep(1.0)
+    assert slow_model.reading == 1
+    assert (await _statuses(generation_id))[0] == GenerationStatus.GENERATING
+
+    generation_worker_pool.cancel(generation_id, "Test finished")
+    await asyncio.wait_for(viewer, 2.0)
+    await _assert_released(slow_model)
+
+
+async def test_cancel_during_database_write_releases_connection(project_id, workers, slow_model, monkeypatch):
+    # Spill every evicted event, and hold the spill's transaction open until cancelled
+    monkeypatch.setattr(settings, "SSE_REPLAY_BUFFER_SIZE", 2)
+    monkeypatch.setattr(settings, "SSE_SPILL_BATCH_SIZE", 1)
+    writing = asyncio.Event()
+    spill_events = EventLogService.spill_events
+
+    async def slow_spill(db, generation_id, batch):
+        await spill_events(db, generation_id, batch)
+        writing.set()
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(EventLogService, "spill_events", slow_spill)
+    generation_id = await _start_generation(project_id)
+    await asyncio.wait_for(writing.wait(), 5.0)
+
+    assert generation_worker_pool.cancel(generation_id, "Cancelled by request")
+
+    await _assert_released(slow_model)
+    status, job_status, error = await _statuses(generation_id)
+    assert (status, job_status, error) == (
+        GenerationStatus.CANCELLED, JobStatus.CANCELLED, "Cancelled by request"
+    )
@@ -0,0 +1,83 @@
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.db.database import session_scope
+from app.main import app
+from app.models import GenerationStatus
+from app.services import (
+    GenerationRequestService, GenerationService, GenerationWorkerPool, JobService, generation_event_hub
+)
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def _claimed_generation(project_id: str, idempotency_key: str, prompt: str) -> tuple:
+    """Dedup key and generation of a request that went through, as the generate endpoint leaves them"""
+    async with session_scope() as db:
+        key, ttl = await GenerationRequestService.make_key(db, project_id, prompt, idempotency_key)
+        request_hash = GenerationRequestService.hash_request(project_id, prompt, False, False)
+        assert await GenerationRequestService.try_claim(db, key, project_id, ttl, request_hash)
+        generation = await GenerationService.create_generation(db, project_id)
+        await JobService.create_job(db, generation.id, project_id, prompt)
+        await GenerationRequestService.attach_generation(db, key, generation.id)
+    return key, generation.id
+
+
+async def test_reused_idempotency_key_with_another_body_is_rejected(project_id, client):
+    await _claimed_generation(project_id, "key-1", "A landing page")
+
+    response = await client.post(
+        "/api/v1/generations/generate",
+        json={"project_id": project_id, "user_prompt": "A pricing page"},
+        headers={"Idempotency-Key": "key-1"},
+    )
+
+    assert response.status_code == 422
+    assert "Idempotency-Key" in response.json()["detail"]
+
+
+async def test_cancelled_generation_releases_its_claim(project_id):
+    key, generation_id = await _claimed_generation(project_id, "key-2", "A landing page")
+
+    async with session_scope() as db:
+        await GenerationService.cancel_generation(db, generation_id)
+
+    async with session_scope() as db:
+        assert await GenerationRequestService.get_claim(db, key) is None
+        assert await GenerationRequestService.try_claim(db, key, project_id, 60)
+
+
+async def test_reaper_releases_claims_of_failed_generations(project_id):
+    failed_key, failed_id = await _claimed_generation(project_id, "key-3", "A landing page")
+    live_key, _ = await _claimed_generation(project_id, "key-4", "A landing page")
+    async with session_scope() as db:
+        await GenerationService.update_generation(db, failed_id, status=GenerationStatus.FAILED)
+
+    async with session_scope() as db:
+        assert await GenerationRequestService.purge_expired(db) == 1
+
+    async with session_scope() as db:
+        assert await GenerationRequestService.get_claim(db, failed_key) is None
+        assert await GenerationRequestService.get_claim(db, live_key) is not None
+
+
+async def test_reaped_generation_fails_like_a_failed_job(project_id, monkeypatch):
+    key, generation_id = await _claimed_generation(project_id, "key-5", "A landing page")
+    monkeypatch.setattr(settings, "GENERATION_JOB_MAX_ATTEMPTS", 1)
+    async with session_scope() as db:
+        # Claimed by a worker that died: its lease is already over
+        assert await JobService.claim_job(db, "dead-worker", -1) is not None
+    subscription = generation_event_hub.subscribe(generation_id)
+
+    await GenerationWorkerPool()._reap_jobs()
+
+    async with session_scope() as db:
+        assert (await GenerationService.get_generation(db, generation_id)).status == GenerationStatus.FAILED
+        assert await GenerationRequestService.get_claim(db, key) is None
+    _, event = await anext(subscription.events(timeout=1))
+    assert event["type"] == "error"
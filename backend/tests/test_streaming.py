@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import gemini_service
+from app.services.model_providers import FakeProvider, GeminiProvider
+
+STREAMS = 50
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class BlockingModel:
+    """Stand-in for the Gemini client: every chunk read blocks its thread"""
+
+    def __init__(self, chunks: int, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        def response():
+            for index in range(self.chunks):
+                time.sleep(self.delay)
+                yield _Chunk(f"<p>{index}</p>")
+        return response()
+
+
+class _StalledStream:
+    """api_core stream stand-in: after one chunk, a read that blocks until cancelled"""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def __iter__(self):
+        yield _Chunk("<p>0</p>")
+        self.cancelled.wait(30)
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class _StalledResponse:
+    def __init__(self):
+        self._iterator = _StalledStream()
+
+    def __iter__(self):
+        return iter(self._iterator)
+
+
+class StallingModel:
+    """Stand-in for the Gemini client whose "stall" prompt stops streaming after one chunk"""
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if prompt == "stall":
+            return _StalledResponse()
+        return iter([_Chunk("<p>done</p>")])
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    # Streams only; writing 50 cache rows would time SQLite instead
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+
+
+async def _consume(prompt: str) -> str:
+    chunks = []
+    async for chunk in gemini_service.generate_html_stream(prompt, use_cache=False):
+        chunks.append(chunk)
+    return "".join(chunks)
+
+
+async def _timed_streams(count: int) -> tuple:
+    """Run streams concurrently; elapsed seconds, outputs and the worst event loop stall"""
+    stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal stall
+        loop = asyncio.get_running_loop()
+        while running:
+            before = loop.time()
+            await asyncio.sleep(0.01)
+            stall = max(stall, loop.time() - before - 0.01)
+
+    ticks = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    outputs = await asyncio.gather(*(_consume(f"Landing page number {index}") for index in range(count)))
+    elapsed = time.perf_counter() - start
+    running = False
+    await ticks
+    return elapsed, outputs, stall
+
+
+async def test_parallel_fake_streams_do_not_serialize(monkeypatch):
+    # About 0.4s per stream: 0.2s to the first chunk, then 2000 chars at 10000/s
+    provider = FakeProvider(latency=0.2, chars_per_second=10000, chunk_chars=200, output_chars=2000)
+    monkeypatch.setattr(gemini_service, "provider", provider)
+
+    single, _, _ = await _timed_streams(1)
+    elapsed, outputs, stall = await _timed_streams(STREAMS)
+
+    assert all("===FILE: index.html===" in output for output in outputs)
+    # Serialized, 50 streams would take 50 times as long as one; in parallel about as long
+    assert elapsed < single * 3
+    assert stall < 0.2
+
+
+async def test_parallel_blocking_client_streams_do_not_serialize(monkeypatch):
+    # The blocking client reads run on the provider's stream threads, not the loop
+    provider = GeminiProvider("blocking-test-model", "", {})
+    provider.model = BlockingModel(chunks=10, delay=0.03)
+    monkeypatch.setattr(gemini_service, "provider", provider)
+
+    single, _, _ = await _timed_streams(1)
+    elapsed, outputs, stall = await _timed_streams(STREAMS)
+
+    assert outputs == ["".join(f"<p>{index}</p>" for index in range(10))] * STREAMS
+    assert elapsed < single * 3
+    assert stall < 0.2
+
+
+async def test_stopped_stream_frees_its_thread(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_STREAM_WORKERS", 1)
+    provider = GeminiProvider("stalling-test-model", "", {})
+    provider.model = StallingModel()
+
+    stream = provider.stream("stall")
+    assert await anext(stream) == "<p>0</p>"
+    await stream.aclose()
+
+    # The only stream thread is free again, rather than stuck in the stalled read
+    async with asyncio.timeout(2):
+        assert [text async for text in provider.stream("next")] == ["<p>done</p>"]
@@ -0,0 +1,47 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app.db.database import session_scope
+from app.models import Generation, Project
+from app.services import GenerationService
+
+
+async def test_simultaneous_generations_get_consecutive_versions(project_id):
+    async def create() -> int:
+        async with session_scope() as db:
+            generation = await GenerationService.create_generation(db, project_id)
+            return generation.version
+
+    versions = await asyncio.gather(*(create() for _ in range(100)))
+
+    assert sorted(versions) == list(range(1, 101))
+    async with session_scope() as db:
+        result = await db.execute(select(Generation.version).where(Generation.project_id == project_id))
+        assert sorted(result.scalars().all()) == list(range(1, 101))
+        project = await db.get(Project, project_id)
+        assert project.version_counter == 100
+        assert project.generation_count == 100
+
+
+async def test_project_latest_follows_versions_after_a_delete(project_id):
+    async with session_scope() as db:
+        generations = [await GenerationService.create_generation(db, project_id) for _ in range(3)]
+        # The clock stepped back: each later version has an earlier timestamp
+        for generation in generations:
+            await db.execute(
+                update(Generation)
+                .where(Generation.id == generation.id)
+                .values(created_at=datetime(2024, 1, 1) - timedelta(minutes=generation.version))
+            )
+
+    async with session_scope() as db:
+        await GenerationService.delete_generation(db, generations[2].id)
+
+    async with session_scope() as db:
+        project = await db.get(Project, project_id)
+        latest = await GenerationService.get_latest_generation(db, project_id)
+        assert latest.id == generations[1].id
+        assert (project.latest_version, project.latest_generation_id) == (2, generations[1].id)
+        assert project.last_activity_at == datetime(2024, 1, 1) - timedelta(minutes=2)
@@ -1,14 +1,23 @@
 import React, { useState } from 'react'
-import { Send } from 'lucide-react'
+import { Send, Square } from 'lucide-react'
 import { Button } from '@/components/shared/Button'
 
 interface ChatInputProps {
   onSubmit: (prompt: string) => void
   isLoading: boolean
   placeholder?: string
+  // Shown in place of the send button while loading
+  onCancel?: () => void
+  isCancelling?: boolean
 }
 
-export const ChatInput: React.FC<ChatInputProps> = ({ onSubmit, isLoading, placeholder }) => {
+export const ChatInput: React.FC<ChatInputProps> = ({
+  onSubmit,
+  isLoading,
+  placeholder,
+  onCancel,
+  isCancelling = false,
+}) => {
   const [prompt, setPrompt] = useState('')
 
   const handleSubmit = (e: React.FormEvent) => {
@@ -33,9 +42,15 @@ export const ChatInput: React.FC<ChatInputProps> = ({ onSubmit, isLoading, place
           }
         }}
       />
-      <Button type="submit" disabled={!prompt.trim() || isLoading} isLoading={isLoading}>
-        <Send size={20} />
-      </Button>
+      {isLoading && onCancel ? (
+        <Button type="button" variant="danger" onClick={onCancel} isLoading={isCancelling} title="Stop generating">
+          <Square size={20} />
+        </Button>
+      ) : (
+        <Button type="submit" disabled={!prompt.trim() || isLoading} isLoading={isLoading}>
+          <Send size={20} />
+        </Button>
+      )}
     </form>
   )
 }
@@ -61,6 +61,8 @@ export const HistoryPanel: React.FC<HistoryPanelProps> = ({
                           ? 'badge-success'
                           : generation.status === 'failed'
                           ? 'badge-danger'
+                          : generation.status === 'cancelled'
+                          ? 'badge-primary'
                           : 'badge-warning'
                       }`}
                     >
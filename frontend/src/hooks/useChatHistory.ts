@@ -5,6 +5,7 @@ import type { ChatMessage } from '@/types'
 interface ChatHistoryResponse {
   messages: ChatMessage[]
   total: number
+  next_cursor?: string | null
 }
 
 export const useChatHistory = (projectId: string | undefined) => {
@@ -1,6 +1,37 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import api from '@/lib/api'
-import type { Generation } from '@/types'
+import type { Generation, GenerationManifest } from '@/types'
+
+// File contents by content hash, shared by every version that contains them.
+// Map order doubles as recency: least recently used files go first once the
+// cached contents exceed FILE_CACHE_MAX_CHARS.
+const FILE_CACHE_MAX_CHARS = 8 * 1024 * 1024
+const fileContentCache = new Map<string, string>()
+let fileContentCacheChars = 0
+
+const getCachedFile = (hash: string): string | undefined => {
+  const content = fileContentCache.get(hash)
+  if (content !== undefined) {
+    fileContentCache.delete(hash)
+    fileContentCache.set(hash, content)
+  }
+  return content
+}
+
+const cacheFile = (hash: string, content: string) => {
+  if (fileContentCache.has(hash) || content.length > FILE_CACHE_MAX_CHARS) return
+  fileContentCache.set(hash, content)
+  fileContentCacheChars += content.length
+  for (const [oldest, oldContent] of fileContentCache) {
+    if (fileContentCacheChars <= FILE_CACHE_MAX_CHARS) break
+    fileContentCache.delete(oldest)
+    fileContentCacheChars -= oldContent.length
+  }
+}
+
+// URL of one file; each path segment is encoded, the separators are kept
+const fileUrl = (generationId: string, path: string) =>
+  `/generations/${generationId}/files/${path.split('/').map(encodeURIComponent).join('/')}`
 
 export const useGenerations = (projectId: string | undefined) => {
   return useQuery({
@@ -38,3 +69,55 @@ export const useDeleteGeneration = () => {
     },
   })
 }
+
+export const useCancelGeneration = () => {
+  const queryClient = useQueryClient()
+
+  return useMutation({
+    mutationFn: async (id: string) => {
+      const response = await api.post<Generation>(`/generations/${id}/cancel`)
+      return response.data
+    },
+    onSuccess: () => {
+      queryClient.invalidateQueries({ queryKey: ['generations'] })
+    },
+  })
+}
+
+export const useGenerationManifest = (generationId: string | undefined) => {
+  return useQuery({
+    queryKey: ['generation-manifest', generationId],
+    queryFn: async () => {
+      if (!generationId) return null
+      const response = await api.get<GenerationManifest>(`/generations/${generationId}/manifest`)
+      return response.data
+    },
+    enabled: !!generationId,
+  })
+}
+
+// Files of a version, downloading only those whose hash no earlier version had
+export const useGenerationFiles = (generationId: string | undefined) => {
+  const { data: manifest } = useGenerationManifest(generationId)
+
+  return useQuery({
+    queryKey: ['generation-files', generationId],
+    queryFn: async (): Promise<Record<string, string>> => {
+      if (!manifest) return {}
+      const contents = await Promise.all(
+        manifest.files.map(async (file) => {
+          const cached = getCachedFile(file.hash)
+          if (cached !== undefined) return cached
+          const response = await api.get<string>(fileUrl(manifest.generation_id, file.path), {
+            responseType: 'text',
+            transformResponse: (data) => data,
+          })
+          cacheFile(file.hash, response.data)
+          return response.data
+        })
+      )
+      return Object.fromEntries(manifest.files.map((file, index) => [file.path, contents[index]]))
+    },
+    enabled: !!manifest,
+  })
+}
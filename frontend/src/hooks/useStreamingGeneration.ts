@@ -1,5 +1,6 @@
 import { useState, useCallback } from 'react'
 import { useQueryClient } from '@tanstack/react-query'
+import { useCancelGeneration } from '@/hooks/useGenerations'
 import type { GenerateHTMLInput, StreamEvent } from '@/types'
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api/v1'
@@ -10,6 +11,7 @@ export const useStreamingGeneration = () => {
   const [generationId, setGenerationId] = useState<string | null>(null)
   const [error, setError] = useState<string | null>(null)
   const queryClient = useQueryClient()
+  const { mutateAsync: cancelGeneration, isPending: isCancelling } = useCancelGeneration()
 
   const generateHTML = useCallback(
     async (
@@ -78,6 +80,16 @@ export const useStreamingGeneration = () => {
                     }
                     break
 
+                  case 'snapshot':
+                    // Generation already finished; full output in one event
+                    setStreamedContent(event.html_content || '')
+                    break
+
+                  case 'reset':
+                    // Generation was retried; restart accumulation
+                    setStreamedContent('')
+                    break
+
                   case 'complete':
                     if (event.generation_id) {
                       // Invalidate queries to refresh data
@@ -87,6 +99,10 @@ export const useStreamingGeneration = () => {
                     }
                     break
 
+                  case 'cancelled':
+                    queryClient.invalidateQueries({ queryKey: ['generations'] })
+                    break
+
                   case 'error':
                     setError(event.message || 'An error occurred')
                     break
@@ -108,6 +124,13 @@ export const useStreamingGeneration = () => {
     [queryClient]
   )
 
+  // Stops the model on the server; the stream then ends with a 'cancelled' event
+  const cancel = useCallback(async () => {
+    if (generationId) {
+      await cancelGeneration(generationId)
+    }
+  }, [generationId, cancelGeneration])
+
   const reset = useCallback(() => {
     setStreamedContent('')
     setGenerationId(null)
@@ -121,6 +144,8 @@ export const useStreamingGeneration = () => {
     streamedContent,
     generationId,
     error,
+    cancel,
+    isCancelling,
     reset,
   }
 }
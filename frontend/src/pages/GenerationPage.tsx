@@ -9,18 +9,29 @@ import { ChatHistory } from '@/components/generation/ChatHistory'
 import { HistoryPanel } from '@/components/generation/HistoryPanel'
 import { Spinner } from '@/components/shared/Spinner'
 import { useProject } from '@/hooks/useProjects'
+import { useGenerationFiles } from '@/hooks/useGenerations'
 import { useStreamingGeneration } from '@/hooks/useStreamingGeneration'
 import { useUIStore } from '@/stores/uiStore'
 import type { Generation } from '@/types'
 
+// A version's files in the form PreviewPane reads: raw HTML, or {"files": ...} JSON
+const toPreviewContent = (files: Record<string, string>) => {
+  const paths = Object.keys(files)
+  return paths.length === 1 && paths[0] === 'index.html' ? files['index.html'] : JSON.stringify({ files })
+}
+
 export const GenerationPage: React.FC = () => {
   const { projectId } = useParams<{ projectId: string }>()
   const navigate = useNavigate()
   const { data: project, isLoading: projectLoading } = useProject(projectId)
-  const { generateHTML, isStreaming, streamedContent, error } = useStreamingGeneration()
+  const { generateHTML, isStreaming, streamedContent, generationId, error, cancel, isCancelling } =
+    useStreamingGeneration()
 
   const [currentHTML, setCurrentHTML] = useState('')
   const [selectedGenerationId, setSelectedGenerationId] = useState<string | null>(null)
+  // Version picked from the history; its files are fetched, reusing those seen before
+  const [historyGenerationId, setHistoryGenerationId] = useState<string | undefined>(undefined)
+  const { data: historyFiles } = useGenerationFiles(historyGenerationId)
 
   const { historyPanelOpen, toggleHistoryPanel } = useUIStore()
 
@@ -30,9 +41,16 @@ export const GenerationPage: React.FC = () => {
     }
   }, [streamedContent])
 
+  useEffect(() => {
+    if (historyFiles) {
+      setCurrentHTML(toPreviewContent(historyFiles))
+    }
+  }, [historyFiles])
+
   const handleGenerate = async (prompt: string) => {
     if (!projectId) return
 
+    setHistoryGenerationId(undefined)
     await generateHTML(
       {
         project_id: projectId,
@@ -45,9 +63,19 @@ export const GenerationPage: React.FC = () => {
     )
   }
 
+  const handleCancel = async () => {
+    try {
+      await cancel()
+    } catch (err) {
+      // Usually finished just before the request arrived
+      console.error('Failed to cancel generation:', err)
+    }
+  }
+
   const handleSelectGeneration = (generation: Generation) => {
-    if (generation.html_content) {
-      setCurrentHTML(generation.html_content)
+    // Listings carry no content, and only completed versions have files
+    if (generation.status === 'completed' && !isStreaming) {
+      setHistoryGenerationId(generation.id)
       setSelectedGenerationId(generation.id)
     }
   }
@@ -140,6 +168,8 @@ export const GenerationPage: React.FC = () => {
                 onSubmit={handleGenerate}
                 isLoading={isStreaming}
                 placeholder="Describe what you want to create..."
+                onCancel={generationId ? handleCancel : undefined}
+                isCancelling={isCancelling}
               />
               <AnimatePresence>
                 {error && (
@@ -5,18 +5,33 @@ export interface Project {
   created_at: string
   updated_at: string
   generation_count?: number
+  latest_version?: number | null
+  latest_generation_id?: string | null
+  last_activity_at?: string | null
 }
 
 export interface Generation {
   id: string
   project_id: string
   html_content?: string
-  status: 'generating' | 'completed' | 'failed'
+  status: 'generating' | 'completed' | 'failed' | 'cancelled'
   version: number
   created_at: string
   preview?: string
 }
 
+export interface GenerationFileEntry {
+  path: string
+  size: number
+  hash: string
+}
+
+export interface GenerationManifest {
+  generation_id: string
+  version: number
+  files: GenerationFileEntry[]
+}
+
 export interface ChatMessage {
   id: string
   project_id: string
@@ -39,12 +54,27 @@ export interface UpdateProjectInput {
 export interface GenerateHTMLInput {
   project_id: string
   user_prompt: string
+  full_regeneration?: boolean
 }
 
 export interface StreamEvent {
-  type: 'generation_id' | 'chunk' | 'complete' | 'error'
+  type:
+    | 'generation_id'
+    | 'chunk'
+    | 'file_start'
+    | 'file_delta'
+    | 'file_complete'
+    | 'file_deleted'
+    | 'snapshot'
+    | 'reset'
+    | 'complete'
+    | 'cancelled'
+    | 'error'
   id?: string
   content?: string
+  html_content?: string
+  path?: string
+  size?: number
   generation_id?: string
   message?: string
 }